@@ -0,0 +1,69 @@
+"""Wall time of `python -m cli totals`, and what it imports, against a budget.
+
+Runs the command line interface in fresh interpreters on a scratch
+database, timing each run end to end and collecting the modules it had
+imported when it exited. Exits non-zero when the median exceeds --budget
+or any of FORBIDDEN was imported, so a GUI or chart library reaching
+cli.py through one of its imports fails loudly.
+
+Usage: python benchmarks/bench_cli.py [--runs 9] [--budget 200]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Nothing the CLI runs needs these; openpyxl/pyarrow are loaded by export/import only when asked for.
+FORBIDDEN = ("PySide6", "shiboken6", "matplotlib", "numpy", "pandas", "openpyxl", "pyarrow")
+
+# Runs cli as `python -m cli` would, then reports the imported modules on stderr.
+CHILD = r"""
+import atexit, json, runpy, sys
+atexit.register(lambda: print(json.dumps(sorted({m.split(".")[0] for m in sys.modules})), file=sys.stderr))
+sys.argv[0] = "cli"
+runpy.run_module("cli", run_name="__main__", alter_sys=True)
+"""
+
+
+def run_once(db_path: str) -> dict:
+    env = dict(os.environ, EXPENSES_DB=db_path, EXPENSES_LOCAL_DB=db_path + ".local")
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD, "totals", "--period", "all", "--db", db_path],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    ms = (time.perf_counter() - t0) * 1000
+    json.loads(proc.stdout)  # the report itself must be valid
+    modules = json.loads(proc.stderr.strip().splitlines()[-1])
+    return {"ms": ms, "forbidden": [m for m in FORBIDDEN if m in modules]}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--runs", type=int, default=9)
+    ap.add_argument("--budget", type=float, default=200, help="milliseconds per run (median)")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cli.db")
+        run_once(db_path)  # creates and migrates the scratch database
+        reports = [run_once(db_path) for _ in range(args.runs)]
+
+    times = sorted(r["ms"] for r in reports)
+    median = times[len(times) // 2]
+    forbidden = sorted({m for r in reports for m in r["forbidden"]})
+    print(f"python -m cli totals: median {median:.0f} ms, min {times[0]:.0f} ms, max {times[-1]:.0f} ms "
+          f"(budget {args.budget:.0f} ms)")
+    print(f"forbidden modules imported: {', '.join(forbidden) or 'none'}")
+    if forbidden or median > args.budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Per-row commits versus one batched commit for entering expenses.
+
+Point --dir at the synced folder (e.g. the Google Drive backup directory) to
+see the fsync cost there; the default is a local temporary directory.
+
+Usage: python benchmarks/bench_commits.py [--rows 500] [--dir PATH]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db import Database  # noqa: E402
+
+
+def sample_rows(n: int):
+    rnd = random.Random(7)
+    today = date.today()
+    cats = ["Food", "Rent", "Transport", "Fun", "Health"]
+    return [
+        (rnd.choice(cats), round(rnd.uniform(1, 80), 2), "receipt line", today - timedelta(days=rnd.randrange(30)))
+        for _ in range(n)
+    ]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, default=500)
+    ap.add_argument("--dir", help="directory for the scratch database")
+    args = ap.parse_args()
+
+    rows = sample_rows(args.rows)
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        for name in {r[0] for r in rows}:
+            db.add_category(name)
+
+        def per_row():
+            for cat, amount, note, d in rows:
+                db.add_expense(cat, amount, note, d)
+
+        def in_transaction():
+            with db.transaction():
+                for cat, amount, note, d in rows:
+                    db.add_expense(cat, amount, note, d)
+
+        def bulk():
+            db.add_expenses_bulk(rows)
+
+        print(f"{args.rows} expenses into {tmp}")
+        base = None
+        for label, fn in (("per-row commits", per_row), ("transaction()", in_transaction),
+                          ("add_expenses_bulk", bulk)):
+            t0 = time.perf_counter()
+            fn()
+            ms = (time.perf_counter() - t0) * 1000
+            base = base or ms
+            print(f"  {label:<18} {ms:9.1f} ms  {ms / args.rows:7.3f} ms/row  ({base / ms:5.1f}x)")
+        db.conn.close()
+
+
+if __name__ == "__main__":
+    main()
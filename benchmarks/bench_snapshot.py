@@ -0,0 +1,76 @@
+"""Compare Dashboard's old three-query refresh with Database.dashboard_snapshot.
+
+Usage: python benchmarks/bench_snapshot.py [--rows 200000] [--repeat 200]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db import Database  # noqa: E402
+
+
+def build_ledger(db: Database, rows: int, categories: int = 60, days: int = 3 * 365) -> date:
+    rnd = random.Random(42)
+    first = date.today() - timedelta(days=days)
+    for i in range(categories):
+        db.add_category(f"Category {i:03d}")
+    names = [name for (_cid, name) in db.all_categories()]
+    db.add_expenses_bulk(
+        (rnd.choice(names), round(rnd.uniform(1, 200), 2), "", first + timedelta(days=rnd.randrange(days)))
+        for _ in range(rows)
+    )
+    db.add_incomes_bulk(
+        (round(rnd.uniform(100, 3000), 2), "Salary", first + timedelta(days=rnd.randrange(days)))
+        for _ in range(rows // 50)
+    )
+    return first
+
+
+def timed(fn, repeat: int) -> float:
+    """Median wall time of fn() in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # No result cache: repeated calls would otherwise time dict lookups, not SQL.
+        db = Database(os.path.join(tmp, "bench.db"), cache_size=0)
+        build_ledger(db, args.rows)
+        end = date.today()
+        ranges = {
+            "month": (end.replace(day=1), end),
+            "year": (end - timedelta(days=365), end),
+        }
+        print(f"{args.rows:,} expenses, median of {args.repeat} runs")
+        for label, (s, e) in ranges.items():
+            def three_calls():
+                db.total_incomes(s, e)
+                db.total_expenses(s, e)
+                db.sum_by_category(s, e)
+
+            old = timed(three_calls, args.repeat)
+            new = timed(lambda: db.dashboard_snapshot(s, e), args.repeat)
+            print(f"  {label:<6} three calls {old:7.3f} ms   snapshot {new:7.3f} ms   ({old / new:4.2f}x)")
+        db.conn.close()
+
+
+if __name__ == "__main__":
+    main()
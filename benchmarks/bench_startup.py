@@ -0,0 +1,95 @@
+"""Time from process start to the Dashboard's first paint, against a budget.
+
+Launches a fresh interpreter (offscreen unless --show) that builds the
+Dashboard on a scratch database and reports when the window first paints
+and which heavy modules were imported by then. Exits non-zero when the
+median exceeds --budget or any of HEAVY is already loaded, so a chart or
+export library creeping back onto the startup path fails loudly.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--budget 1500] [--show]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Only ever imported on demand (charts, export/import of spreadsheets).
+HEAVY = ("matplotlib", "numpy", "pandas", "openpyxl", "pyarrow")
+
+CHILD = r"""
+import json, sys, time
+HEAVY = %r
+import main
+from PySide6.QtCore import QEvent, QObject, QTimer
+from PySide6.QtWidgets import QApplication
+
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            obj.removeEventFilter(self)
+            print(json.dumps({
+                "painted": time.perf_counter(),
+                "heavy": sorted(m for m in HEAVY if m in sys.modules),
+            }), flush=True)
+            QTimer.singleShot(0, lambda: (obj.close(), app.quit()))
+        return False
+
+
+app = QApplication(sys.argv[:1])
+w = main.Dashboard()
+probe = FirstPaint()
+w.installEventFilter(probe)
+w.show()
+app.exec()
+"""
+
+
+def run_once(db_path: str, show: bool) -> dict:
+    env = dict(os.environ)
+    if not show:
+        env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    # Working copy included, as in real use: it sits next to the scratch database.
+    env.update(EXPENSES_DB=db_path, EXPENSES_LOCAL_DB=db_path + ".local")
+    # perf_counter is the system-wide monotonic clock, so the child's reading
+    # is comparable with ours taken just before the spawn.
+    t0 = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD % (HEAVY,)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    report = json.loads(out.strip().splitlines()[-1])
+    report["ms"] = (report["painted"] - t0) * 1000
+    return report
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--budget", type=float, default=1500, help="milliseconds to first paint (median)")
+    ap.add_argument("--show", action="store_true", help="use the real platform instead of offscreen")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "startup.db")
+        run_once(db_path, args.show)  # creates and migrates the scratch database
+        reports = [run_once(db_path, args.show) for _ in range(args.runs)]
+
+    times = sorted(r["ms"] for r in reports)
+    median = times[len(times) // 2]
+    heavy = sorted({m for r in reports for m in r["heavy"]})
+    print(f"first paint: median {median:.0f} ms, min {times[0]:.0f} ms, max {times[-1]:.0f} ms "
+          f"(budget {args.budget:.0f} ms)")
+    print(f"heavy modules before first paint: {', '.join(heavy) or 'none'}")
+    if heavy or median > args.budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Storage format v4 (integer cents / day numbers, STRICT) against the v3 format.
+
+Builds a synthetic ledger in the old REAL/TEXT layout, copies it and lets
+Database migrate the copy, then compares file size (after VACUUM) and the
+speed of aggregating the base tables directly, bypassing the rollups.
+
+Usage: python benchmarks/bench_storage.py [--rows 1000000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db import Database, _day  # noqa: E402
+
+# The v3 layout as the migrations left it (minus the rollups, which v4 rebuilds).
+LEGACY_SCHEMA = """
+CREATE TABLE categories (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE NOT NULL,
+    created_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+CREATE TABLE expenses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    category_id INTEGER NOT NULL,
+    amount REAL NOT NULL CHECK(amount >= 0),
+    note TEXT,
+    date TEXT NOT NULL,
+    FOREIGN KEY(category_id) REFERENCES categories(id) ON DELETE CASCADE
+);
+CREATE TABLE incomes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    amount REAL NOT NULL CHECK(amount >= 0),
+    source TEXT,
+    date TEXT NOT NULL
+);
+CREATE INDEX idx_expenses_date ON expenses(date);
+CREATE INDEX idx_expenses_category_date ON expenses(category_id, date);
+CREATE INDEX idx_incomes_date ON incomes(date);
+CREATE INDEX idx_expenses_dedup ON expenses(date, amount, note);
+PRAGMA user_version=3;
+"""
+
+# label -> (v3 query, v4 query); both take (start, end) in their own format.
+QUERIES = {
+    "sum by category, year": (
+        "SELECT category_id, SUM(amount) FROM expenses WHERE date BETWEEN ? AND ? GROUP BY category_id",
+        "SELECT category_id, SUM(amount_cents) FROM expenses WHERE day BETWEEN ? AND ? GROUP BY category_id",
+    ),
+    "daily totals, year": (
+        "SELECT date, SUM(amount) FROM expenses WHERE date BETWEEN ? AND ? GROUP BY date",
+        "SELECT day, SUM(amount_cents) FROM expenses WHERE day BETWEEN ? AND ? GROUP BY day",
+    ),
+    "grand total, all": (
+        "SELECT SUM(amount) FROM expenses WHERE date BETWEEN ? AND ?",
+        "SELECT SUM(amount_cents) FROM expenses WHERE day BETWEEN ? AND ?",
+    ),
+}
+
+
+def build_legacy(path: str, rows: int, categories: int = 60, days: int = 5 * 365) -> date:
+    rnd = random.Random(42)
+    first = date(2020, 1, 1)
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.executemany("INSERT INTO categories(name) VALUES (?)", ((f"Category {i:03d}",) for i in range(categories)))
+    notes = ["", "groceries", "card payment", "monthly"]
+    conn.executemany(
+        "INSERT INTO expenses(category_id, amount, note, date) VALUES (?,?,?,?)",
+        (
+            (rnd.randrange(1, categories + 1), round(rnd.uniform(0.5, 250), 2), rnd.choice(notes),
+             (first + timedelta(days=rnd.randrange(days))).isoformat())
+            for _ in range(rows)
+        ),
+    )
+    conn.executemany(
+        "INSERT INTO incomes(amount, source, date) VALUES (?,?,?)",
+        (
+            (round(rnd.uniform(100, 3000), 2), "Salary", (first + timedelta(days=rnd.randrange(days))).isoformat())
+            for _ in range(rows // 50)
+        ),
+    )
+    conn.commit()
+    conn.close()
+    return first
+
+
+def timed(conn: sqlite3.Connection, sql: str, params: tuple, repeat: int) -> float:
+    """Median wall time in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def vacuumed_size(path: str) -> int:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.execute("VACUUM")
+    conn.close()
+    return os.path.getsize(path)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        old_path, new_path = os.path.join(tmp, "v3.db"), os.path.join(tmp, "v4.db")
+        t0 = time.perf_counter()
+        first = build_legacy(old_path, args.rows)
+        print(f"{args.rows:,} expenses built in {time.perf_counter() - t0:.1f} s")
+        shutil.copyfile(old_path, new_path)
+
+        t0 = time.perf_counter()
+        Database(new_path).conn.close()
+        print(f"migration to v4: {time.perf_counter() - t0:.1f} s")
+
+        old_size, new_size = vacuumed_size(old_path), vacuumed_size(new_path)
+        print(f"file size   v3 {old_size / 2**20:8.1f} MiB   v4 {new_size / 2**20:8.1f} MiB   "
+              f"({new_size / old_size:4.0%})")
+
+        old, new = sqlite3.connect(old_path), sqlite3.connect(new_path)
+        year = (date(2023, 1, 1), date(2023, 12, 31))
+        for label, (old_sql, new_sql) in QUERIES.items():
+            s, e = year if "year" in label else (first, date.max)
+            t_old = timed(old, old_sql, (s.isoformat(), e.isoformat()), args.repeat)
+            t_new = timed(new, new_sql, (_day(s), _day(e)), args.repeat)
+            print(f"  {label:<22} v3 {t_old:8.1f} ms   v4 {t_new:8.1f} ms   ({t_old / t_new:4.2f}x)")
+
+        drift = old.execute("SELECT SUM(amount) FROM expenses").fetchone()[0]
+        exact = new.execute("SELECT SUM(amount_cents) FROM expenses").fetchone()[0]
+        print(f"float sum drift over all rows: {drift - exact / 100:+.9f}")
+        old.close()
+        new.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Deterministic synthetic ledgers for the benchmarks.
+
+The same (expenses, categories, years, seed) always produces the same
+database. The shape follows a real personal ledger rather than uniform
+noise: category popularity is Zipf-like (a few categories carry most rows),
+activity grows towards the present, bills cluster on the first of the
+month, amounts are log-normal, and there is a monthly salary plus irregular
+other income.
+
+Usage: python benchmarks/ledger.py out.db [--expenses 1000000] [--categories 300] [--years 8] [--seed 0]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from itertools import accumulate
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db import Database  # noqa: E402
+
+# Benchmark sizes by name.
+SIZES = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+
+# Fixed, so a ledger built today matches one built next year.
+LAST_DAY = date(2025, 12, 31)
+CHUNK = 50_000
+
+_BASE_NAMES = (
+    "Groceries", "Rent", "Utilities", "Transport", "Fuel", "Restaurants", "Coffee", "Health", "Pharmacy",
+    "Insurance", "Phone", "Internet", "Clothing", "Gifts", "Travel", "Books", "Subscriptions", "Sports",
+    "Household", "Repairs", "Education", "Kids", "Pets", "Taxes", "Fees", "Charity", "Hobbies", "Electronics",
+)
+_NOTES = ("", "", "", "card", "cash", "online", "monthly", "weekend", "with friends", "refund pending")
+
+
+def category_names(n: int) -> List[str]:
+    names = list(_BASE_NAMES[:n])
+    i = 0
+    while len(names) < n:
+        names.append(f"{_BASE_NAMES[i % len(_BASE_NAMES)]} {i // len(_BASE_NAMES) + 2}")
+        i += 1
+    return names
+
+
+def expense_rows(n: int, categories: List[str], years: int, seed: int) -> Iterator[List[Tuple[str, float, str, date]]]:
+    """Yield (category, amount, note, date) rows in chunks of CHUNK."""
+    rnd = random.Random(seed)
+    days = years * 365
+    first = LAST_DAY - timedelta(days=days - 1)
+    # Zipf-ish popularity: the k-th category is ~k^1.1 times rarer than the first.
+    cum_weights = list(accumulate(1 / (k ** 1.1) for k in range(1, len(categories) + 1)))
+    done = 0
+    while done < n:
+        size = min(CHUNK, n - done)
+        cats = rnd.choices(categories, cum_weights=cum_weights, k=size)
+        chunk = []
+        for cat in cats:
+            # u ** 1.8 leans towards 0, so offsets lean towards LAST_DAY.
+            d = LAST_DAY - timedelta(days=int(days * rnd.random() ** 1.8))
+            if rnd.random() < 0.08:
+                d = d.replace(day=1)
+            amount = round(min(rnd.lognormvariate(3, 1.1), 20_000), 2)
+            note = rnd.choice(_NOTES) if rnd.random() < 0.9 else f"ref {rnd.randrange(10**6):06d}"
+            chunk.append((cat, amount, note, max(d, first)))
+        done += size
+        yield chunk
+
+
+def income_rows(n_expenses: int, years: int, seed: int) -> List[Tuple[float, str, date]]:
+    rnd = random.Random(seed + 1)
+    first = LAST_DAY - timedelta(days=years * 365 - 1)
+    rows = []
+    month = date(first.year, first.month, 1)
+    while month <= LAST_DAY:
+        rows.append((round(rnd.uniform(2800, 3200), 2), "Salary", month))
+        month = (month + timedelta(days=32)).replace(day=1)
+    for _ in range(max(n_expenses // 100, 1)):
+        d = first + timedelta(days=rnd.randrange(years * 365))
+        rows.append((round(rnd.lognormvariate(4, 1.2), 2), rnd.choice(("Gift", "Refund", "Side job", "")), d))
+    return rows
+
+
+def build(path: str, expenses: int, categories: int = 300, years: int = 8, seed: int = 0) -> None:
+    """Create the ledger at path (which must not exist yet)."""
+    db = Database(path)
+    try:
+        names = category_names(categories)
+        with db.transaction():
+            for name in names:
+                db.add_category(name)
+        for chunk in expense_rows(expenses, names, years, seed):
+            db.add_expenses_bulk(chunk)
+        db.add_incomes_bulk(income_rows(expenses, years, seed))
+    finally:
+        db.conn.close()
+
+
+def cached(expenses: int, cache_dir: Optional[str] = None, **kwargs) -> str:
+    """Path of the ledger for these parameters, building it on first use."""
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ledgers")
+    os.makedirs(cache_dir, exist_ok=True)
+    tag = "-".join(f"{k}{v}" for k, v in sorted(kwargs.items()))
+    path = os.path.join(cache_dir, f"ledger-{expenses}{'-' + tag if tag else ''}.db")
+    if not os.path.exists(path):
+        tmp = path + ".partial"
+        for leftover in (tmp, tmp + "-wal", tmp + "-shm"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        build(tmp, expenses, **kwargs)
+        os.replace(tmp, path)
+    return path
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("file")
+    ap.add_argument("--expenses", type=int, default=1_000_000)
+    ap.add_argument("--categories", type=int, default=300)
+    ap.add_argument("--years", type=int, default=8)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    if os.path.exists(args.file):
+        ap.error(f"{args.file} already exists")
+    t0 = time.perf_counter()
+    build(args.file, args.expenses, args.categories, args.years, args.seed)
+    print(f"{args.expenses:,} expenses in {time.perf_counter() - t0:.1f} s -> {args.file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+"""Benchmark suite: every public Database method plus the Dashboard refresh path.
+
+Each size runs against a private copy of a deterministic ledger from
+ledger.py (built once, cached in benchmarks/.ledgers). Database methods are
+timed with the result cache off, so every call does its real work; the
+Dashboard is timed in a child process under QT_QPA_PLATFORM=offscreen.
+Results go to a JSON file; given --baseline, any case whose median is more
+than --threshold slower fails the run.
+
+Usage:
+    python benchmarks/suite.py [--sizes 10k,100k] [--out benchmark-results.json]
+                               [--baseline FILE] [--threshold 0.25] [--save-baseline FILE]
+                               [--no-dashboard]
+"""
+import argparse
+import inspect
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import ledger  # noqa: E402
+from db import Database, Filters  # noqa: E402
+
+MONTH = (date(2025, 12, 1), ledger.LAST_DAY)
+YEAR = (date(2025, 1, 1), ledger.LAST_DAY)
+EVERYTHING = (date(2000, 1, 1), ledger.LAST_DAY)
+ARCHIVED = 2019
+ARCHIVED_YEAR = (date(ARCHIVED, 1, 1), date(ARCHIVED, 12, 31))
+
+# Slowdowns smaller than this are noise whatever the ratio.
+NOISE_FLOOR_MS = 0.1
+
+
+def _consume(batches) -> int:
+    return sum(len(b) for b in batches)
+
+
+# name -> [(variant, fn(db, ctx))]; the name is the Database method timed.
+READS: Dict[str, List[tuple]] = {
+    "all_categories": [("", lambda db, c: db.all_categories())],
+    "cat_id": [("", lambda db, c: db.cat_id(c.category))],
+    "category_name": [("", lambda db, c: db.category_name(c.category_id))],
+    "data_version": [("", lambda db, c: db.data_version())],
+    "sum_by_category": [
+        ("month", lambda db, c: db.sum_by_category(*MONTH)),
+        ("year", lambda db, c: db.sum_by_category(*YEAR)),
+    ],
+    "expenses_for_category": [("year", lambda db, c: db.expenses_for_category(c.category, *YEAR))],
+    "expenses_for_category_page": [
+        ("year, first page", lambda db, c: db.expenses_for_category_page(c.category, *YEAR)),
+        ("year, next page", lambda db, c: db.expenses_for_category_page(c.category, *YEAR, c.category_key)),
+    ],
+    "expenses_in_range": [("month", lambda db, c: db.expenses_in_range(*MONTH))],
+    "expenses_in_range_page": [
+        ("year, first page", lambda db, c: db.expenses_in_range_page(*YEAR)),
+        ("year, next page", lambda db, c: db.expenses_in_range_page(*YEAR, c.expense_key)),
+    ],
+    "iter_expenses": [("year", lambda db, c: _consume(db.iter_expenses(*YEAR)))],
+    "expenses_daily_by_category": [("year", lambda db, c: db.expenses_daily_by_category(*YEAR))],
+    "count_expenses_in_category": [("", lambda db, c: db.count_expenses_in_category(c.category))],
+    "incomes_in_range": [("year", lambda db, c: db.incomes_in_range(*YEAR))],
+    "incomes_in_range_page": [("year, first page", lambda db, c: db.incomes_in_range_page(*YEAR))],
+    "iter_incomes": [("all", lambda db, c: _consume(db.iter_incomes(*EVERYTHING)))],
+    "search": [
+        ("common word", lambda db, c: db.search("card")),
+        ("category prefix", lambda db, c: db.search("groc")),
+        ("two words, year", lambda db, c: db.search("ref 12", *YEAR)),
+    ],
+    "aggregate": [
+        ("category, year", lambda db, c: db.aggregate("expenses", *YEAR, ("category",))),
+        ("day x category, year", lambda db, c: db.aggregate("expenses", *YEAR, ("day", "category"))),
+        ("month, all", lambda db, c: db.aggregate("expenses", *EVERYTHING, ("month",))),
+        ("week max, all", lambda db, c: db.aggregate("expenses", *EVERYTHING, ("week",), "max")),
+        ("category, note filter, year",
+         lambda db, c: db.aggregate("expenses", *YEAR, ("category",), "sum", Filters(text="card"))),
+        ("source, all", lambda db, c: db.aggregate("incomes", *EVERYTHING, ("source",))),
+    ],
+    "total_expenses": [("year", lambda db, c: db.total_expenses(*YEAR))],
+    "total_incomes": [("year", lambda db, c: db.total_incomes(*YEAR))],
+    "expenses_summary": [
+        ("year", lambda db, c: db.expenses_summary(*YEAR)),
+        ("year, category", lambda db, c: db.expenses_summary(*YEAR, c.category)),
+    ],
+    "incomes_summary": [("year", lambda db, c: db.incomes_summary(*YEAR))],
+    "dashboard_snapshot": [
+        ("month", lambda db, c: db.dashboard_snapshot(*MONTH)),
+        ("year", lambda db, c: db.dashboard_snapshot(*YEAR)),
+        ("all", lambda db, c: db.dashboard_snapshot(*EVERYTHING)),
+    ],
+}
+
+
+# Reads that the totals index answers; timed again with it enabled.
+INDEXED = ("total_expenses", "total_incomes", "sum_by_category", "dashboard_snapshot")
+# (name, variant, fn(db, ctx)) timed while ARCHIVED is archived: the
+# current period should not notice, the archived year reads its own file.
+WITH_ARCHIVE = [
+    ("expenses_in_range", "month", lambda db, c: db.expenses_in_range(*MONTH)),
+    ("expenses_in_range", "archived year", lambda db, c: db.expenses_in_range(*ARCHIVED_YEAR)),
+    ("expenses_in_range_page", "all, first page", lambda db, c: db.expenses_in_range_page(*EVERYTHING)),
+    ("iter_expenses", "all", lambda db, c: _consume(db.iter_expenses(*EVERYTHING))),
+    ("search", "common word", lambda db, c: db.search("card")),
+    ("aggregate", "week max, all", lambda db, c: db.aggregate("expenses", *EVERYTHING, ("week",), "max")),
+    ("dashboard_snapshot", "month", lambda db, c: db.dashboard_snapshot(*MONTH)),
+]
+TIMED_ELSEWHERE = {"enable_totals_index", "verify_totals_index", "archive_year", "unarchive_year"}
+# Switches and accessors with nothing worth timing.
+NOT_QUERIES = {"enable_tracing", "disable_tracing", "disable_totals_index", "totals_index", "archived_years",
+               "subscribe", "unsubscribe"}
+
+
+def _bulk_expenses(i: int, n: int = 1000):
+    return [("Groceries", 1 + k / 100, f"bench {i} {k}", YEAR[1] - timedelta(days=k % 365)) for k in range(n)]
+
+
+# name -> (variant, fn(db, ctx, run)). Run in this order a fixed number of
+# times each; later cases clean up after earlier ones where they can.
+WRITES: Dict[str, tuple] = {
+    "add_category": ("", lambda db, c, i: db.add_category(f"Bench {i}")),
+    "rename_category": ("", lambda db, c, i: db.rename_category(f"Bench {i}", f"Bench renamed {i}")),
+    "delete_category": ("", lambda db, c, i: db.delete_category(f"Bench renamed {i}")),
+    "add_expense": ("", lambda db, c, i: db.add_expense(c.category, 12.34, "bench", YEAR[1])),
+    "update_expense": ("", lambda db, c, i: db.update_expense(c.expense_id, c.category, 1 + i, "bench", YEAR[1])),
+    "delete_expense": ("", lambda db, c, i: db.delete_expense(c.bench_expenses[i])),
+    "add_expenses_bulk": ("1000 rows", lambda db, c, i: db.add_expenses_bulk(_bulk_expenses(i))),
+    "import_expenses": (
+        "1000 rows",
+        lambda db, c, i: db.import_expenses([[(d, cat, a, "import" + n) for cat, a, n, d in _bulk_expenses(i)]]),
+    ),
+    "add_income": ("", lambda db, c, i: db.add_income(45.67, "bench", YEAR[1])),
+    "update_income": ("", lambda db, c, i: db.update_income(c.income_id, 100 + i, "bench", YEAR[1])),
+    "delete_income": ("", lambda db, c, i: db.delete_income(c.bench_incomes[i])),
+    "add_incomes_bulk": ("1000 rows", lambda db, c, i: db.add_incomes_bulk([(1 + k, "bench", YEAR[1]) for k in range(1000)])),
+    "transaction": ("10 add_expense", lambda db, c, i: _ten_in_transaction(db, c)),
+    "rollback": ("after add_expense", lambda db, c, i: _write_then_rollback(db, c)),
+}
+
+
+def _ten_in_transaction(db: Database, c) -> None:
+    with db.transaction():
+        for _ in range(10):
+            db.add_expense(c.category, 1.0, "bench tx", YEAR[1])
+
+
+class _Abort(Exception):
+    pass
+
+
+def _write_then_rollback(db: Database, c) -> None:
+    """A failed transaction() block, which ends in Database.rollback()."""
+    try:
+        with db.transaction():
+            db.add_expense(c.category, 1.0, "bench rollback", YEAR[1])
+            raise _Abort
+    except _Abort:
+        pass
+
+
+def measure(fn: Callable[[], object], min_runs: int = 3, max_runs: int = 50, budget_s: float = 0.5) -> dict:
+    """Median and min wall time in milliseconds over adaptive repeats."""
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < min_runs or (len(samples) < max_runs and time.perf_counter() - started < budget_s):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return _summary(samples)
+
+
+def _summary(samples: List[float]) -> dict:
+    samples = sorted(samples)
+    return {"median_ms": round(samples[len(samples) // 2], 4), "min_ms": round(samples[0], 4), "runs": len(samples)}
+
+
+def _case(name: str, variant: str) -> str:
+    return f"{name} [{variant}]" if variant else name
+
+
+def bench_database(path: str, write_runs: int) -> Dict[str, dict]:
+    results: Dict[str, dict] = {}
+    db = Database(path, cache_size=0)
+    try:
+        c = SimpleNamespace(category="Groceries")
+        c.category_id = db.cat_id(c.category)
+        first = db.expenses_in_range_page(*YEAR)
+        c.expense_key = (first[-1][1], first[-1][0])
+        c.expense_id = first[0][0]
+        first = db.expenses_for_category_page(c.category, *YEAR)
+        c.category_key = (first[-1][1], first[-1][0])
+        c.income_id = db.incomes_in_range_page(*YEAR)[0][0]
+
+        for name, variants in READS.items():
+            for variant, fn in variants:
+                results[_case(name, variant)] = measure(lambda: fn(db, c))
+        cached = Database(path)
+        cached.dashboard_snapshot(*YEAR)
+        results["dashboard_snapshot [year, cached]"] = measure(lambda: cached.dashboard_snapshot(*YEAR))
+        cached.conn.close()
+
+        indexed = Database(path, cache_size=0)
+        results["enable_totals_index [build]"] = measure(indexed.enable_totals_index, max_runs=5)
+        for name in INDEXED:
+            for variant, fn in READS[name]:
+                results[_case(name, f"{variant}, totals index")] = measure(lambda: fn(indexed, c))
+        results["verify_totals_index"] = measure(indexed.verify_totals_index, min_runs=1, max_runs=3)
+        indexed.conn.close()
+
+        for name, (variant, fn) in WRITES.items():
+            if name == "delete_expense":
+                c.bench_expenses = [r[0] for r in db.conn.execute(
+                    "SELECT id FROM expenses WHERE note = 'bench' ORDER BY id")]
+            elif name == "delete_income":
+                c.bench_incomes = [r[0] for r in db.conn.execute(
+                    "SELECT id FROM incomes WHERE source = 'bench' ORDER BY id")]
+            samples = []
+            for i in range(write_runs):
+                t0 = time.perf_counter()
+                fn(db, c, i)
+                samples.append((time.perf_counter() - t0) * 1000)
+            results[_case(name, variant)] = _summary(samples)
+
+        t0 = time.perf_counter()
+        db.archive_year(ARCHIVED)
+        results["archive_year [one year]"] = _summary([(time.perf_counter() - t0) * 1000])
+        for name, variant, fn in WITH_ARCHIVE:
+            results[_case(name, f"{variant}, {ARCHIVED} archived")] = measure(lambda: fn(db, c))
+        t0 = time.perf_counter()
+        db.unarchive_year(ARCHIVED)
+        results["unarchive_year [one year]"] = _summary([(time.perf_counter() - t0) * 1000])
+    finally:
+        db.conn.close()
+    return results
+
+
+def untimed_methods() -> List[str]:
+    public = {n for n, _m in inspect.getmembers(Database, inspect.isfunction) if not n.startswith("_")}
+    return sorted(public - set(READS) - set(WRITES) - TIMED_ELSEWHERE - NOT_QUERIES)
+
+
+def dashboard_child(path: str, runs: int) -> None:
+    """Runs in a subprocess: time Dashboard.refresh and _populate_cards, print JSON."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    import main
+    from PySide6.QtCore import QDate, QEventLoop, QTimer
+    from PySide6.QtWidgets import QApplication
+
+    app = QApplication(sys.argv[:1])
+    w = main.Dashboard()
+
+    def wait_for_refresh(trigger: Optional[Callable[[], None]] = None) -> None:
+        loop = QEventLoop()
+        w.refreshed.connect(loop.quit)
+        QTimer.singleShot(120_000, loop.quit)
+        if trigger is not None:
+            trigger()
+        loop.exec()
+        w.refreshed.disconnect(loop.quit)
+
+    def set_range(start: date, end: date) -> None:
+        w.start.setDate(QDate(start.year, start.month, start.day))
+        w.end.setDate(QDate(end.year, end.month, end.day))
+
+    wait_for_refresh()  # the one started by __init__
+    w.show()
+    set_range(*YEAR)
+    wait_for_refresh(w.refresh)
+
+    results = {}
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        wait_for_refresh(w.refresh)
+        samples.append((time.perf_counter() - t0) * 1000)
+    results["Dashboard.refresh [same range]"] = _summary(samples)
+
+    samples = []
+    for i in range(runs):
+        set_range(YEAR[0] - timedelta(days=i + 1), YEAR[1])
+        t0 = time.perf_counter()
+        wait_for_refresh(w.refresh)
+        samples.append((time.perf_counter() - t0) * 1000)
+    results["Dashboard.refresh [new range]"] = _summary(samples)
+
+    reader = Database(path)
+    snaps = [reader.dashboard_snapshot(*MONTH), reader.dashboard_snapshot(*YEAR)]
+    reader.conn.close()
+    samples = []
+    for i in range(runs):
+        t0 = time.perf_counter()
+        w._populate_cards(snaps[i % 2])
+        app.processEvents()
+        samples.append((time.perf_counter() - t0) * 1000)
+    results["Dashboard._populate_cards [month/year alternating]"] = _summary(samples)
+
+    w.close()
+    print(json.dumps(results))
+
+
+def bench_dashboard(path: str, runs: int) -> Dict[str, dict]:
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    # The Dashboard opens DB_FILE itself, without a working copy in between.
+    env.update(EXPENSES_DB=path, EXPENSES_WORKING_COPY="0")
+    proc = subprocess.run(
+        [sys.executable, __file__, "--dashboard-child", path, "--runs", str(runs)],
+        env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        tail = proc.stderr.strip().splitlines()[-1:] or ["no output"]
+        print(f"  dashboard skipped: {tail[0]}")
+        return {}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(current: dict, baseline: dict, threshold: float, floor_ms: float = NOISE_FLOOR_MS) -> List[str]:
+    """Print current against baseline; return the regressed cases."""
+    regressions = []
+    for size, cases in current["results"].items():
+        base_cases = baseline.get("results", {}).get(size, {})
+        for name, res in cases.items():
+            base = base_cases.get(name)
+            if base is None:
+                continue
+            now, then = res["median_ms"], base["median_ms"]
+            ratio = now / then if then else float("inf")
+            flag = ""
+            if ratio > 1 + threshold and now - then > floor_ms:
+                flag = "  REGRESSION"
+                regressions.append(f"{size} {name}")
+            print(f"  {size:>5} {name:<58} {then:10.3f} -> {now:10.3f} ms  {ratio:5.2f}x{flag}")
+    return regressions
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", default="10k,100k", help=f"comma-separated, from {', '.join(ledger.SIZES)}")
+    ap.add_argument("--out", default="benchmark-results.json")
+    ap.add_argument("--baseline", help="results file to compare against")
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    ap.add_argument("--noise-floor", type=float, default=NOISE_FLOOR_MS,
+                    help="ignore slowdowns below this many ms")
+    ap.add_argument("--save-baseline", metavar="FILE", help="also write the results here")
+    ap.add_argument("--write-runs", type=int, default=20)
+    ap.add_argument("--runs", type=int, default=10, help="Dashboard repetitions")
+    ap.add_argument("--no-dashboard", action="store_true")
+    ap.add_argument("--ledger-dir", help="where built ledgers are cached")
+    ap.add_argument("--dashboard-child", metavar="DB", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.dashboard_child:
+        dashboard_child(args.dashboard_child, args.runs)
+        return
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    unknown = [s for s in sizes if s not in ledger.SIZES]
+    if unknown:
+        ap.error(f"unknown size(s): {', '.join(unknown)}")
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "untimed": untimed_methods(),
+        },
+        "results": {},
+    }
+    for size in sizes:
+        t0 = time.perf_counter()
+        source = ledger.cached(ledger.SIZES[size], args.ledger_dir)
+        print(f"{size}: ledger ready in {time.perf_counter() - t0:.1f} s")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ledger.db")
+            shutil.copyfile(source, path)
+            results = bench_database(path, args.write_runs)
+            if not args.no_dashboard:
+                results.update(bench_dashboard(path, args.runs))
+        report["results"][size] = results
+        for name, res in results.items():
+            print(f"  {name:<58} {res['median_ms']:10.3f} ms  (min {res['min_ms']:.3f}, {res['runs']} runs)")
+
+    if report["meta"]["untimed"]:
+        print(f"untimed public methods: {', '.join(report['meta']['untimed'])}")
+    for path in filter(None, (args.out, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+    print(f"results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        print(f"against {args.baseline} (threshold {args.threshold:.0%}):")
+        regressions = compare(report, baseline, args.threshold, args.noise_floor)
+        if regressions:
+            print(f"{len(regressions)} regression(s)")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
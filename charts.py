@@ -0,0 +1,279 @@
+"""Matplotlib chart dialogs.
+
+Imported on demand (see Dashboard._warm_up_charts): matplotlib is by far the
+heaviest import in the app and most sessions never open a chart, so nothing
+on the startup path may import this module.
+
+Dialogs are owned by a ChartCache and reused: each keeps its Figure and
+canvas for the whole session, and a redraw with the same labels only moves
+the existing artists instead of clearing and rebuilding the axes.
+"""
+import math
+from datetime import date
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PySide6.QtWidgets import QDialog, QVBoxLayout
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
+
+# Matches the ax.pie() call in ChartDialog._plot.
+_PIE_START, _PIE_LABEL_R, _PIE_PCT_R = 90, 1.1, 0.6
+
+# Daily chart level of detail: at most this many bars (days are merged into
+# weeks, months, quarters or years to fit) and this many categories before the
+# smallest are folded into "Other".
+MAX_BARS = 60
+TOP_CATEGORIES = 10
+# Tick labels shown on the x axis at most; the rest are left unlabelled.
+_MAX_TICK_LABELS = 20
+
+_BUCKET_TITLES = {"day": "Daily", "week": "Weekly", "month": "Monthly", "quarter": "Quarterly", "year": "Yearly"}
+
+
+def _bucket(days: np.ndarray, matrix: np.ndarray, max_bars: int) -> Tuple[str, List[str], np.ndarray]:
+    """Merge day columns into the finest of day/week/month/quarter/year that fits max_bars.
+
+    Should even the years not fit, runs of consecutive years share a
+    column, labelled by the first.
+    """
+    if days.size <= max_bars:
+        return "day", [str(d) for d in days], matrix
+    months = days.astype("datetime64[M]")
+    month_no = months.astype(np.int64)  # months since 1970-01
+    candidates = (
+        # 1970-01-05 (epoch day 4) was a Monday.
+        ("week", (days.astype(np.int64) - 4) // 7, lambda i: str(days[i])),
+        ("month", month_no, lambda i: str(months[i])),
+        ("quarter", month_no // 3, lambda i: f"{1970 + month_no[i] // 12} Q{month_no[i] % 12 // 3 + 1}"),
+        ("year", month_no // 12, lambda i: str(1970 + month_no[i] // 12)),
+    )
+    for unit, keys, label in candidates:
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        if starts.size <= max_bars:
+            break
+    else:
+        starts = starts[::math.ceil(starts.size / max_bars)]
+    return unit, [label(i) for i in starts], np.add.reduceat(matrix, starts, axis=1)
+
+
+def daily_pivot(rows: Sequence[Tuple[str, str, float]], start: date, end: date,
+                max_bars: int = MAX_BARS, top_n: int = TOP_CATEGORIES) -> Tuple[str, List[str], List[str], np.ndarray]:
+    """Pivot expenses_daily_by_category rows into a category x period matrix.
+
+    Every day from start to end gets a column, zero when nothing was spent,
+    before the columns are merged to at most max_bars periods. Categories
+    are ordered by total, largest first, and those past top_n are summed
+    into a trailing "Other" row. Returns (unit, period labels, category
+    names, matrix) where unit is "day", "week", "month", "quarter" or "year".
+    """
+    first = np.datetime64(start, "D")
+    days = np.arange(first, np.datetime64(end, "D") + 1)
+    if not rows or not days.size:
+        return "day", [], [], np.zeros((0, 0))
+    day_col, cat_col, total_col = zip(*rows)
+    names, cat_idx = np.unique(np.array(cat_col, dtype=str), return_inverse=True)
+    day_idx = (np.array(day_col, dtype="datetime64[D]") - first).astype(np.int64)
+    matrix = np.zeros((names.size, days.size))
+    np.add.at(matrix, (cat_idx, day_idx), np.array(total_col, dtype=float))
+
+    unit, labels, matrix = _bucket(days, matrix, max_bars)
+
+    order = np.argsort(-matrix.sum(axis=1), kind="stable")
+    names, matrix = names[order].tolist(), matrix[order]
+    if len(names) > top_n:
+        rest = matrix[top_n:].sum(axis=0)
+        names, matrix = names[:top_n], matrix[:top_n]
+        if "Other" in names:  # a real "Other" category joins the folded row
+            i = names.index("Other")
+            rest += matrix[i]
+            names, matrix = names[:i] + names[i + 1:], np.delete(matrix, i, axis=0)
+        names.append("Other")
+        matrix = np.vstack([matrix, rest])
+    return unit, labels, names, matrix
+
+
+class _FigureDialog(QDialog):
+    """Dialog around one Figure/canvas pair that lives as long as the dialog."""
+    def __init__(self, figsize: Tuple[float, float], parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        self.fig = Figure(figsize=figsize)
+        self.canvas = FigureCanvas(self.fig)
+        layout.addWidget(self.canvas)
+        self.ax = self.fig.add_subplot(111)
+
+    def _no_data(self) -> None:
+        self.ax.clear()
+        self.ax.text(0.5, 0.5, "No data in range", ha="center", va="center")
+
+    def release(self) -> None:
+        """Free the figure now rather than whenever the GC gets to it."""
+        self.fig.clear()
+        self.canvas.close()
+        self.deleteLater()
+
+
+class ChartDialog(_FigureDialog):
+    """Simple Matplotlib dialog for pie/bar charts."""
+    def __init__(self, chart: str = "pie", parent=None):
+        super().__init__((6, 4), parent)
+        self.chart = chart
+        self._labels: Optional[list] = None  # labels of the artists on screen
+        self._artists: tuple = ()
+
+    def set_data(self, title: str, labels: list[str], values: list[float]) -> None:
+        self.setWindowTitle(title)
+        if not values or sum(values) == 0:
+            self._no_data()
+            self._labels = None
+        elif labels == self._labels:
+            self._update(values)
+        else:
+            self._plot(labels, values)
+            self._labels = list(labels)
+        self.fig.tight_layout()
+        self.canvas.draw_idle()
+
+    def _plot(self, labels: list[str], values: list[float]):
+        self.ax.clear()
+        if self.chart == "pie":
+            self._artists = self.ax.pie(values, labels=labels, autopct="%1.1f%%", startangle=_PIE_START)
+            self.ax.axis("equal")
+        else:  # bar
+            bars = self.ax.bar(labels, values)
+            self.ax.set_ylabel("Amount")
+            self.ax.set_xticks(range(len(labels)))
+            self.ax.set_xticklabels(labels, rotation=45, ha="right")
+            # optional value labels on top of bars
+            texts = [
+                self.ax.text(b.get_x() + b.get_width()/2, b.get_height(), f"{b.get_height():,.0f}",
+                             ha="center", va="bottom")
+                for b in bars
+            ]
+            self._artists = (bars, texts)
+
+    def _update(self, values: list[float]) -> None:
+        if self.chart == "pie":
+            wedges, texts, pcts = self._artists
+            total = float(sum(values))
+            theta = _PIE_START
+            for wedge, text, pct, v in zip(wedges, texts, pcts, values):
+                frac = v / total
+                wedge.set_theta1(theta)
+                wedge.set_theta2(theta + 360 * frac)
+                mid = math.radians(theta + 180 * frac)
+                x, y = math.cos(mid), math.sin(mid)
+                text.set_position((_PIE_LABEL_R * x, _PIE_LABEL_R * y))
+                text.set_horizontalalignment("left" if x > 0 else "right")
+                pct.set_position((_PIE_PCT_R * x, _PIE_PCT_R * y))
+                pct.set_text(f"{100 * frac:.1f}%")
+                theta += 360 * frac
+        else:
+            bars, texts = self._artists
+            for bar, text, v in zip(bars, texts, values):
+                bar.set_height(v)
+                text.set_y(v)
+                text.set_text(f"{v:,.0f}")
+            self.ax.relim()
+            self.ax.autoscale_view()
+
+
+class DailyExpensesChartDialog(_FigureDialog):
+    """Stacked bar char: expenses per categroy and period in the selected range.
+
+    Rows are pivoted with daily_pivot, so however long the range or however
+    many categories, at most max_bars stacks of top_n + 1 segments are drawn.
+    """
+    def __init__(self, parent=None, max_bars: int = MAX_BARS, top_n: int = TOP_CATEGORIES):
+        super().__init__((7, 4), parent)
+        self.max_bars = max_bars
+        self.top_n = top_n
+        self.setWindowTitle("Daily Expenses by Category")
+        self._shape: Optional[tuple] = None  # (periods, categories) on screen
+        self._containers: list = []
+
+    def set_data(self, rows: Sequence[Tuple[str, str, float]], start: date, end: date) -> None:
+        ax = self.ax
+        unit, labels, names, matrix = daily_pivot(rows, start, end, self.max_bars, self.top_n)
+        self.setWindowTitle(f"{_BUCKET_TITLES[unit]} Expenses by Category")
+        # Row i of bottoms is where category i's segment starts: the running
+        # total of the categories stacked below it.
+        bottoms = np.cumsum(matrix, axis=0) - matrix
+        shape = (labels, names)
+        if not names:
+            self._no_data()
+            self._shape = None
+        elif shape == self._shape:
+            for container, vals, base in zip(self._containers, matrix, bottoms):
+                for rect, v, b in zip(container, vals, base):
+                    rect.set_y(b)
+                    rect.set_height(v)
+            ax.relim()
+            ax.autoscale_view()
+        else:
+            ax.clear()
+            x = np.arange(len(labels))
+            self._containers = [
+                ax.bar(x, vals, bottom=base, label=cat) for cat, vals, base in zip(names, matrix, bottoms)
+            ]
+            step = -(-len(labels) // _MAX_TICK_LABELS)
+            ax.set_xticks(x[::step])
+            ax.set_xticklabels(labels[::step], rotation=45, ha="right")
+            ax.set_ylabel("Amount")
+            ax.legend(loc="upper right", fontsize=8)
+            self._shape = shape
+
+        self.fig.tight_layout()
+        self.canvas.draw_idle()
+
+
+class ChartCache:
+    """One reusable chart dialog per kind, remembering what it last drew.
+
+    A chart is identified by (dataset, kind, start, end) plus the
+    Database.data_version() its rows were read at. Re-opening a chart whose
+    key and version both match what its dialog already shows skips the query
+    and the redraw and just shows the dialog again.
+    """
+    def __init__(self, parent=None):
+        self.parent = parent
+        self._dialogs: Dict[str, _FigureDialog] = {}
+        self._drawn: Dict[str, Tuple[Hashable, int]] = {}  # kind -> (key, data version)
+
+    def version(self, key: tuple) -> Optional[int]:
+        """Data version of the render on screen for key, or None if it shows something else."""
+        drawn = self._drawn.get(key[1])
+        return drawn[1] if drawn is not None and drawn[0] == key else None
+
+    def visible_key(self) -> Optional[tuple]:
+        """Key of the chart in the dialog open on screen, if any."""
+        for kind, dlg in self._dialogs.items():
+            if dlg.isVisible() and kind in self._drawn:
+                return self._drawn[kind][0]
+        return None
+
+    def show(self, key: tuple, version: int, draw: Callable[[_FigureDialog], None], modal: bool = True) -> None:
+        """Run draw(dialog) unless the (key, version) render is current, then show it.
+
+        With modal=False the dialog is only redrawn, not shown; used for the
+        one already open.
+        """
+        kind = key[1]
+        dlg = self._dialogs.get(kind)
+        if dlg is None:
+            dlg = DailyExpensesChartDialog(self.parent) if kind == "daily" else ChartDialog(kind, self.parent)
+            self._dialogs[kind] = dlg
+        if self._drawn.get(kind) != (key, version):
+            self._drawn.pop(kind, None)
+            draw(dlg)
+            self._drawn[kind] = (key, version)
+        if modal:
+            dlg.exec()
+
+    def release(self) -> None:
+        """Dispose of every figure and dialog."""
+        for dlg in self._dialogs.values():
+            dlg.release()
+        self._dialogs.clear()
+        self._drawn.clear()
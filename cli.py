@@ -0,0 +1,255 @@
+"""Command line interface for reports and batch jobs, without the GUI.
+
+Runs straight on db.Database and never imports Qt, matplotlib or any other
+GUI or chart library, so it starts quickly and works from cron or over
+SSH. tests/test_cli.py guards the import footprint, benchmarks/bench_cli.py
+the start-up time.
+
+    python -m cli totals [--period month | --start D --end D]
+    python -m cli categories --period year --output csv
+    python -m cli list expenses --start 2024-01-01 --end 2024-01-31 [--category Food]
+    python -m cli import statement.csv --date Date --amount Amount --note Description
+    python -m cli export expenses ledger.xlsx [--start D] [--end D]
+    python -m cli archives | archive 2019 | unarchive 2019 | vacuum | check
+
+Reports print JSON (default) or CSV to stdout: an object (CSV: one row)
+for single results, an array (CSV: one row each) for lists. Listings are
+streamed, so `list` over the whole ledger runs in constant memory. Every
+command takes --db (default: the working copy of DB_FILE, like the GUI).
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+from dataclasses import asdict
+from datetime import date, timedelta
+from typing import Iterable, List, Optional, Sequence, TextIO, Tuple
+
+import exporter
+import importer
+import working_copy
+from db import Database, DB_FILE
+
+OUTPUTS = ("json", "csv")
+PERIODS = ("day", "yesterday", "week", "month", "year", "all")
+
+
+def period_range(period: str, today: Optional[date] = None) -> Tuple[date, date]:
+    """(start, end) of a named period ending today; "week" is the last 7 days, as on the dashboard."""
+    today = today or date.today()
+    if period == "day":
+        return today, today
+    if period == "yesterday":
+        return today - timedelta(days=1), today - timedelta(days=1)
+    if period == "week":
+        return today - timedelta(days=6), today
+    if period == "month":
+        return today.replace(day=1), today
+    if period == "year":
+        return today.replace(month=1, day=1), today
+    if period == "all":
+        return date.min, date.max
+    raise ValueError(f"Unknown period '{period}'")
+
+
+def _range(args: argparse.Namespace) -> Tuple[date, date]:
+    """--start/--end where given, the --period bounds otherwise."""
+    start, end = period_range(args.period)
+    start, end = args.start or start, args.end or end
+    return (end, start) if start > end else (start, end)
+
+
+# ---- output ----
+def _emit(columns: Sequence[str], rows: Iterable[Sequence], output: str, out: TextIO, single: bool = False) -> None:
+    """Write rows as JSON (objects keyed by column) or CSV, one row at a time."""
+    if output == "csv":
+        w = csv.writer(out, lineterminator="\n")
+        w.writerow(columns)
+        w.writerows(rows)
+        return
+    if single:
+        for row in rows:
+            json.dump(dict(zip(columns, row)), out)
+            out.write("\n")
+        return
+    out.write("[")
+    sep = "\n"
+    for row in rows:
+        out.write(sep)
+        json.dump(dict(zip(columns, row)), out)
+        sep = ",\n"
+    out.write("\n]\n" if sep != "\n" else "]\n")
+
+
+def _emit_record(record: dict, output: str, out: TextIO) -> None:
+    _emit(list(record), [list(record.values())], output, out, single=True)
+
+
+# ---- commands ----
+def cmd_totals(db: Database, args: argparse.Namespace, out: TextIO) -> int:
+    start, end = _range(args)
+    expenses, expenses_total = db.expenses_summary(start, end)
+    incomes, incomes_total = db.incomes_summary(start, end)
+    _emit_record({
+        "start": _iso(start), "end": _iso(end),
+        "incomes": incomes, "income_total": incomes_total,
+        "expenses": expenses, "expense_total": expenses_total,
+        "balance": round(incomes_total - expenses_total, 2),
+    }, args.output, out)
+    return 0
+
+
+def cmd_categories(db: Database, args: argparse.Namespace, out: TextIO) -> int:
+    start, end = _range(args)
+    counts = db.aggregate("expenses", start, end, ("category",), "count")
+    count_of = dict(zip(counts.keys[0], counts.values))
+    rows = [(name, count_of.get(name, 0), total) for name, total in db.sum_by_category(start, end)]
+    if not args.empty:
+        rows = [r for r in rows if r[1]]
+    _emit(("category", "count", "total"), rows, args.output, out)
+    return 0
+
+
+def cmd_list(db: Database, args: argparse.Namespace, out: TextIO) -> int:
+    start, end = _range(args)
+    if args.dataset == "expenses":
+        batches = db.iter_expenses(start, end)
+        if args.category is not None:
+            wanted = args.category.strip()
+            batches = ([r for r in rows if r[3] == wanted] for rows in batches)
+    else:
+        if args.category is not None:
+            raise ValueError("Incomes have no category")
+        batches = db.iter_incomes(start, end)
+    _emit(exporter.COLUMNS[args.dataset], (row for rows in batches for row in rows), args.output, out)
+    return 0
+
+
+def cmd_import(db: Database, args: argparse.Namespace, out: TextIO) -> int:
+    res = importer.import_file(db, args.file, importer.mapping_from(args), args.chunk_size, args.sheet)
+    _emit_record(asdict(res), args.output, out)
+    return 0
+
+
+def cmd_export(db: Database, args: argparse.Namespace, out: TextIO) -> int:
+    def report(done: int, total: int) -> None:
+        print(f"\r{done:,}/{total:,} rows", end="", file=sys.stderr, flush=True)
+
+    n = exporter.export(db, args.dataset, args.file, args.start, args.end, args.format, report)
+    print(file=sys.stderr)
+    _emit_record({"dataset": args.dataset, "file": args.file, "rows": n}, args.output, out)
+    return 0
+
+
+def cmd_archives(db: Database, args: argparse.Namespace, out: TextIO) -> int:
+    infos = db.archived_years()
+    columns = ("year", "file", "expenses", "expenses_total", "incomes", "incomes_total")
+    _emit(columns, ([getattr(a, c) for c in columns] for a in infos), args.output, out)
+    return 0
+
+
+def cmd_archive(db: Database, args: argparse.Namespace, out: TextIO) -> int:
+    _emit_record(asdict(db.archive_year(args.year)), args.output, out)
+    return 0
+
+
+def cmd_unarchive(db: Database, args: argparse.Namespace, out: TextIO) -> int:
+    db.unarchive_year(args.year)
+    _emit_record({"year": args.year, "unarchived": True}, args.output, out)
+    return 0
+
+
+def cmd_vacuum(db: Database, args: argparse.Namespace, out: TextIO) -> int:
+    """Checkpoint the WAL, rebuild the main file compactly and refresh planner statistics."""
+    path = db.conn.execute("PRAGMA database_list").fetchone()[2]
+    before = os.path.getsize(path)
+    db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    db.conn.execute("VACUUM")
+    db.conn.execute("PRAGMA optimize")
+    _emit_record({"file": path, "bytes_before": before, "bytes_after": os.path.getsize(path)}, args.output, out)
+    return 0
+
+
+def cmd_check(db: Database, args: argparse.Namespace, out: TextIO) -> int:
+    """SQLite's integrity check, the FTS indexes against their tables, and the rollups against the rows."""
+    results = [("integrity", "; ".join(r for (r,) in db.conn.execute("PRAGMA integrity_check")))]
+    for table in ("expenses_fts", "incomes_fts"):
+        try:
+            db.conn.execute(f"INSERT INTO {table}({table}) VALUES ('integrity-check')")
+            results.append((table, "ok"))
+        except sqlite3.DatabaseError as exc:  # the index disagrees with its table
+            results.append((table, str(exc)))
+    db.enable_totals_index()
+    mismatches = db.verify_totals_index()
+    db.disable_totals_index()
+    results.append(("totals", "; ".join(mismatches) or "ok"))
+    _emit(("check", "result"), results, args.output, out)
+    return 0 if all(r == "ok" for _c, r in results) else 1
+
+
+def _iso(d: date) -> Optional[str]:
+    return None if d in (date.min, date.max) else d.isoformat()
+
+
+# ---- argument parsing ----
+def build_parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", default=None, help="database file (default: the working copy of DB_FILE)")
+    common.add_argument("--output", choices=OUTPUTS, default="json", help="report format (default: json)")
+
+    ranged = argparse.ArgumentParser(add_help=False)
+    ranged.add_argument("--period", choices=PERIODS, default="month",
+                        help="named range ending today (default: month); --start/--end override its bounds")
+    ranged.add_argument("--start", type=date.fromisoformat, help="YYYY-MM-DD")
+    ranged.add_argument("--end", type=date.fromisoformat, help="YYYY-MM-DD")
+
+    ap = argparse.ArgumentParser(prog="python -m cli", description=__doc__.splitlines()[0])
+    sub = ap.add_subparsers(dest="command", required=True, metavar="command")
+
+    p = sub.add_parser("totals", parents=[common, ranged], help="income, expense and balance totals")
+    p.set_defaults(run=cmd_totals)
+    p = sub.add_parser("categories", parents=[common, ranged], help="expense count and total per category")
+    p.add_argument("--empty", action="store_true", help="include categories with no expenses in range")
+    p.set_defaults(run=cmd_categories)
+    p = sub.add_parser("list", parents=[common, ranged], help="stream expenses or incomes, oldest first")
+    p.add_argument("dataset", choices=sorted(exporter.COLUMNS))
+    p.add_argument("--category", help="only this expense category")
+    p.set_defaults(run=cmd_list)
+
+    p = sub.add_parser("import", parents=[common], help="import a CSV/XLSX bank statement as expenses")
+    importer.add_arguments(p)
+    p.set_defaults(run=cmd_import)
+    p = sub.add_parser("export", parents=[common], help="write expenses or incomes to CSV, XLSX or Parquet")
+    exporter.add_arguments(p)
+    p.set_defaults(run=cmd_export)
+
+    p = sub.add_parser("archives", parents=[common], help="list archived years")
+    p.set_defaults(run=cmd_archives)
+    for name, run, what in (("archive", cmd_archive, "move a finished year into its own archive file"),
+                            ("unarchive", cmd_unarchive, "move an archived year back")):
+        p = sub.add_parser(name, parents=[common], help=what)
+        p.add_argument("year", type=int)
+        p.set_defaults(run=run)
+    p = sub.add_parser("vacuum", parents=[common], help="checkpoint and compact the database file")
+    p.set_defaults(run=cmd_vacuum)
+    p = sub.add_parser("check", parents=[common], help="integrity, search index and rollup checks")
+    p.set_defaults(run=cmd_check)
+    return ap
+
+
+def main(argv: Optional[List[str]] = None, out: TextIO = sys.stdout) -> int:
+    args = build_parser().parse_args(argv)
+    db = Database(args.db or working_copy.resolve(DB_FILE))
+    try:
+        return args.run(db, args, out)
+    except (ValueError, FileNotFoundError, RuntimeError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+    finally:
+        db.conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
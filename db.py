@@ -1,210 +1,1916 @@
+import functools
+import operator
+import os
+import re
 import sqlite3
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
 from datetime import date
-from typing import List, Tuple, Optional
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from totals_index import TotalsIndex
+from tracing import Tracer, process_tracer
+
+# The synced database; EXPENSES_DB points the app and the CLIs elsewhere.
+DB_FILE = os.environ.get("EXPENSES_DB") or "C:\\Users\\mhmts\\Documents\\Google Drive Backups\\expenses.db"
+
+# Bumped whenever an _upgrade_to_vN step is added; stored in PRAGMA user_version.
+SCHEMA_VERSION = 6
+
+# Rows per page for the *_page listing methods.
+PAGE_SIZE = 200
+
+# (date, id) of the last row of the previous page; None requests the first page.
+PageKey = Optional[Tuple[str, int]]
+
+# Rows per fetchmany() batch for the iter_* streaming methods.
+STREAM_BATCH = 10_000
+
+# Rows returned by search(), and the newest matches per table it ranks them
+# from: scoring every hit of a common word would cost a full doclist pass.
+SEARCH_LIMIT = 200
+SEARCH_WINDOW = 1000
+
+# Entries kept by the read-result cache (see _cached); 0 disables it.
+RESULT_CACHE_SIZE = 256
+
+# Archives (see Database.archive_year) attached at once; SQLite allows 10.
+ARCHIVES_ATTACHED = 8
+
+# Tokenizer options of every FTS5 index, in the main database and in archives.
+_FTS_OPTIONS = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+# Storage format (schema v4): amounts are INTEGER cents and dates INTEGER
+# days since 1970-01-01. _day/_cents convert arguments on the way in; rows
+# handed back keep their 'YYYY-MM-DD' string and float shape, produced in
+# SQL by the _day_text/_amount expressions.
+_EPOCH = date(1970, 1, 1).toordinal()
+_JULIAN_EPOCH = 2440587.5  # julianday('1970-01-01')
+
+
+def _day(d: date) -> int:
+    return d.toordinal() - _EPOCH
+
+
+def _year(day: int) -> int:
+    return date.fromordinal(day + _EPOCH).year
+
+
+def _date(day: int) -> date:
+    return date.fromordinal(day + _EPOCH)
+
+
+def _cents(amount: float) -> int:
+    return int(round(float(amount) * 100))
+
+
+def _day_text(alias: str = "") -> str:
+    return f"date({_JULIAN_EPOCH} + {alias}day)"
+
+
+def _amount(alias: str = "") -> str:
+    return f"{alias}amount_cents / 100.0"
+
+
+def _fts_query(text: str) -> str:
+    """FTS5 query matching rows that contain every word of text as a prefix.
+
+    Words are quoted, so FTS5 syntax in user input (AND, NEAR, column:,
+    quotes) is searched for literally instead of being interpreted. Single
+    characters only match whole words: as a prefix they would merge the
+    doclists of a good part of the vocabulary.
+    """
+    return " ".join(f'"{w}"*' if len(w) > 1 else f'"{w}"' for w in re.findall(r"\w+", text))
+
+
+@dataclass(frozen=True)
+class DashboardSnapshot:
+    """Everything the dashboard shows for one period, read in one transaction."""
+    start: date
+    end: date
+    total_income: float
+    total_expenses: float
+    categories: Tuple[Tuple[str, float], ...]  # (name, total), ordered by name
+
+    @property
+    def balance(self) -> float:
+        return self.total_income - self.total_expenses
+
+    def apply(self, change: "Change") -> Optional["DashboardSnapshot"]:
+        """This snapshot with a change event folded in, or None if it must be read again.
+
+        Amounts are summed in cents, so any number of edits lands on the
+        same totals a fresh read would give.
+        """
+        income, expenses = _cents(self.total_income), _cents(self.total_expenses)
+        totals = {name: _cents(total) for name, total in self.categories}
+        if isinstance(change, EXPENSE_CHANGES):
+            for row, sign in ((change.before, -1), (change.after, 1)):
+                if row is not None and self.start <= row.day <= self.end:
+                    if row.category not in totals:
+                        return None
+                    totals[row.category] += sign * _cents(row.amount)
+                    expenses += sign * _cents(row.amount)
+        elif isinstance(change, INCOME_CHANGES):
+            for row, sign in ((change.before, -1), (change.after, 1)):
+                if row is not None and self.start <= row.day <= self.end:
+                    income += sign * _cents(row.amount)
+        elif isinstance(change, CategoryAdded):
+            totals.setdefault(change.name, 0)
+        elif isinstance(change, CategoryRenamed):
+            if change.old not in totals or change.new in totals:
+                return None
+            totals[change.new] = totals.pop(change.old)
+        elif isinstance(change, CategoryDeleted):
+            expenses -= totals.pop(change.name, 0)
+        else:
+            return None
+        return DashboardSnapshot(self.start, self.end, income / 100, expenses / 100,
+                                 tuple((name, totals[name] / 100) for name in sorted(totals)))
+
+
+@dataclass(frozen=True)
+class ArchiveInfo:
+    """One archived year and its totals, as recorded in the main database."""
+    year: int
+    file: str  # archive file name, in the main database's directory
+    expenses: int
+    expenses_total: float
+    incomes: int
+    incomes_total: float
+
+
+# ---- change events, see Database.subscribe ----
+@dataclass(frozen=True)
+class Expense:
+    id: int
+    day: date
+    category: str
+    amount: float
+    note: str
+
+
+@dataclass(frozen=True)
+class Income:
+    id: int
+    day: date
+    amount: float
+    source: str
+
+
+@dataclass(frozen=True)
+class RowChange:
+    """One row written through Database: before is None for an insert, after for a delete."""
+    before: Optional[object]
+    after: Optional[object]
+
+
+class ExpenseInserted(RowChange):
+    """after is the new Expense."""
+
+
+class ExpenseUpdated(RowChange):
+    """before and after are the Expense on either side of the update."""
+
+
+class ExpenseDeleted(RowChange):
+    """before is the removed Expense."""
+
+
+class IncomeInserted(RowChange):
+    """after is the new Income."""
+
+
+class IncomeUpdated(RowChange):
+    """before and after are the Income on either side of the update."""
+
+
+class IncomeDeleted(RowChange):
+    """before is the removed Income."""
+
+
+@dataclass(frozen=True)
+class CategoryAdded:
+    id: int
+    name: str
+
+
+@dataclass(frozen=True)
+class CategoryRenamed:
+    id: int
+    old: str
+    new: str
+
+
+@dataclass(frozen=True)
+class CategoryDeleted:
+    """The category and every expense in it are gone."""
+    id: int
+    name: str
+
+
+@dataclass(frozen=True)
+class TablesChanged:
+    """Too many rows changed to describe one by one (imports, bulk inserts,
+    archiving, another process's commit); views of these tables should reload."""
+    tables: Tuple[str, ...]
+
+
+Change = Union[RowChange, CategoryAdded, CategoryRenamed, CategoryDeleted, TablesChanged]
+EXPENSE_CHANGES = (ExpenseInserted, ExpenseUpdated, ExpenseDeleted)
+INCOME_CHANGES = (IncomeInserted, IncomeUpdated, IncomeDeleted)
+
+
+# Database.aggregate vocabulary.
+GROUPS = ("day", "week", "month", "quarter", "year", "category", "source")
+MEASURES = ("sum", "count", "avg", "min", "max")
+
+# Period keys over the integer day column {d}. day and week keys are day
+# numbers (a week is keyed by its Monday; epoch day 4 was a Monday) returned
+# as 'YYYY-MM-DD'; the others are labels that already sort chronologically:
+# '2024-03', '2024-Q1', '2024'.
+_PERIODS = {
+    "day": "{d}",
+    "week": "{d} - (({d} + 3) % 7 + 7) % 7",
+    "month": "strftime('%Y-%m', {j} + {d})",
+    "quarter": "strftime('%Y-Q', {j} + {d}) || ((CAST(strftime('%m', {j} + {d}) AS INTEGER) + 2) / 3)",
+    "year": "strftime('%Y', {j} + {d})",
+}
+
+
+@dataclass(frozen=True)
+class Filters:
+    """Optional row filters for Database.aggregate."""
+    category: Optional[str] = None  # expenses only
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    text: Optional[str] = None  # substring of the note (expenses) or source (incomes)
+
+
+@dataclass(frozen=True)
+class Aggregate:
+    """Database.aggregate result as columns: one key column per group_by entry, plus values."""
+    group_by: Tuple[str, ...]
+    keys: Tuple[tuple, ...]
+    values: tuple
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def rows(self) -> Iterator[tuple]:
+        return zip(*self.keys, self.values)
+
+
+@dataclass
+class CacheStats:
+    """Counters of the Database read-result cache."""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0  # entries dropped to stay within the size limit
+    invalidations: int = 0  # times the whole cache was dropped after a write
+    entries: int = 0
+
+
+def _cached(method):
+    """Serve repeated calls of a read method from the result cache.
+
+    Entries are keyed by (method, args) and the whole cache is dropped as
+    soon as data_version() moves, i.e. after any write through this
+    connection or a commit by another one. Lists are handed out as copies so
+    a caller can't alter the cached value; everything else is immutable.
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self._results_limit:
+            return method(self, *args, **kwargs)
+        key = (name, args, tuple(sorted(kwargs.items()))) if kwargs else (name, args)
+        version = self.data_version()
+        stats, results = self.cache_stats, self._results
+        if version != self._results_version:
+            if results:
+                results.clear()
+                stats.invalidations += 1
+            self._results_version = version
+        try:
+            value = results[key]
+        except KeyError:
+            stats.misses += 1
+            value = method(self, *args, **kwargs)
+            results[key] = value
+            if len(results) > self._results_limit:
+                results.popitem(last=False)
+                stats.evictions += 1
+        except TypeError:  # unhashable argument; not worth caching
+            return method(self, *args, **kwargs)
+        else:
+            stats.hits += 1
+            results.move_to_end(key)
+        stats.entries = len(results)
+        return list(value) if isinstance(value, list) else value
+
+    return wrapper
 
-DB_FILE = "C:\\Users\\mhmts\\Documents\\Google Drive Backups\\expenses.db"
 
 class Database:
     """SQLite data access layer for categories, expenses and incomes."""
-    def __init__(self, path: str = DB_FILE) -> None:
+    def __init__(self, path: str = DB_FILE, cache_size: int = RESULT_CACHE_SIZE, totals_index: bool = False) -> None:
         self.conn = sqlite3.connect(path)
         # self.conn.execute("PRAGMA foreign_keys=ON")
         self.conn.execute("PRAGMA journal_mode=WAL")
         self.conn.execute("PRAGMA busy_timeout=5000")
+        self._tx_depth = 0
+        # name <-> id maps for categories, loaded on first use and kept in
+        # step by the category methods; None means "not loaded".
+        self._cat_by_name: Optional[dict] = None
+        self._cat_by_id: dict = {}
+        # See data_version().
+        self._generation = 0
+        self._their_version: Optional[int] = None
+        # LRU of read results, see _cached.
+        self._results: OrderedDict = OrderedDict()
+        self._results_limit = cache_size
+        self._results_version: Optional[int] = None
+        self.cache_stats = CacheStats()
+        # In-memory range totals, see enable_totals_index(); None while
+        # disabled or until rebuilt after a change it could not follow.
+        self._totals_enabled = False
+        self._totals: Optional[TotalsIndex] = None
+        # year -> archive file, loaded on first use and dropped like the
+        # index; attached archives in least recently used order.
+        self._archives: Optional[Dict[int, str]] = None
+        self._attached: OrderedDict = OrderedDict()
+        # Change events (see subscribe()), built only while someone listens
+        # and held back until the write that produced them commits.
+        self._listeners: List[Callable[[Change], None]] = []
+        self._changes: List[Change] = []
         self._migrate()
+        if totals_index:
+            self.enable_totals_index()
+        # Opt-in, see tracing.py; None means untraced and costs nothing.
+        self.tracer: Optional[Tracer] = None
+        tracer = process_tracer()
+        if tracer is not None:
+            self.enable_tracing(tracer)
+
+    @contextmanager
+    def transaction(self):
+        """Group several writes into a single commit.
+
+        Mutating methods called inside the block skip their own commit; the
+        block commits once on success and rolls everything back if it raises.
+        Nested blocks join the outermost one.
+        """
+        if self._tx_depth == 0 and not self.conn.in_transaction:
+            self.conn.execute("BEGIN")
+        self._tx_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._tx_depth -= 1
+            if self._tx_depth == 0:
+                self.rollback()
+            raise
+        self._tx_depth -= 1
+        self._generation += 1
+        if self._tx_depth == 0:
+            self.conn.commit()
+            self._deliver()
+
+    def enable_tracing(self, tracer: Optional[Tracer] = None) -> Tracer:
+        """Record per-method latency and slow statements into tracer (a new one by default)."""
+        self.disable_tracing()
+        self.tracer = tracer or Tracer()
+        self.tracer.attach(self)
+        return self.tracer
+
+    def disable_tracing(self) -> None:
+        if self.tracer is not None:
+            self.tracer.detach(self)
+            self.tracer = None
+
+    def _commit(self) -> None:
+        """Record a write and commit it unless a transaction() block will commit later.
+
+        Every mutating method ends here, so the generation also moves for
+        writes still inside a transaction (reads there already see them).
+        """
+        self._generation += 1
+        if self._tx_depth == 0:
+            if self.conn.in_transaction:
+                self.conn.commit()
+            self._deliver()
+
+    def data_version(self) -> int:
+        """A number that changes whenever the stored data may have changed.
+
+        Writes on this connection bump it directly; PRAGMA data_version,
+        which only moves for *other* connections' commits (say, the importer
+        run from a shell), is folded in on each call.
+        """
+        theirs = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if theirs != self._their_version:
+            if self._their_version is not None:
+                self._publish(lambda: TablesChanged(("categories", "expenses", "incomes")))
+                if self._tx_depth == 0 and not self.conn.in_transaction:
+                    self._deliver()
+            self._their_version = theirs
+            self._generation += 1
+            self._totals = None
+            self._archives = None
+            self._cat_by_name = None
+            self._cat_by_id = {}
+        return self._generation
+
+    def rollback(self) -> None:
+        """Roll back the open transaction and drop cached state it may have touched."""
+        self.conn.rollback()
+        self._changes.clear()
+        self._generation += 1
+        self._cat_by_name = None
+        self._cat_by_id = {}
+        self._totals = None
+        self._archives = None
     
+    def subscribe(self, listener: Callable[[Change], None]) -> None:
+        """Call listener(change) for every write through this Database, once it commits.
+
+        Changes are the event classes above: typed row events with the
+        Expense/Income before and after, category events, and TablesChanged
+        when rows changed wholesale (imports, bulk inserts, or a commit by
+        another connection, noticed at the next read). Listeners run on the
+        thread that made the write.
+        """
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[Change], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _publish(self, change: Callable[[], Change]) -> None:
+        """Queue the change built by change() for delivery at commit, if anyone listens."""
+        if self._listeners:
+            self._changes.append(change())
+
+    def _deliver(self) -> None:
+        changes, self._changes = self._changes, []
+        for change in changes:
+            for listener in list(self._listeners):
+                listener(change)
+
+    def _expense(self, expense_id: int, cid: int, day: int, cents: int, note: Optional[str]) -> Expense:
+        return Expense(expense_id, _date(day), self.category_name(cid), cents / 100, note or "")
+
     def _migrate(self) -> None:
-            c = self.conn.cursor()
-            c.execute(
-                """
-                CREATE TABLE IF NOT EXISTS categories (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT UNIQUE NOT NULL,
-                    created_at TEXT NOT NULL DEFAULT (datetime('now'))
-                )
-                """
+        c = self.conn.cursor()
+        c.execute(
+            """
+            CREATE TABLE IF NOT EXISTS categories (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE NOT NULL,
+                created_at TEXT NOT NULL DEFAULT (datetime('now'))
             )
-            c.execute(
-                """
-                CREATE TABLE IF NOT EXISTS expenses (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    category_id INTEGER NOT NULL,
-                    amount REAL NOT NULL CHECK(amount >= 0),
-                    note TEXT,
-                    date TEXT NOT NULL,
-                    FOREIGN KEY(category_id) REFERENCES categories(id) ON DELETE CASCADE
-                )
-                """
+            """
+        )
+        c.execute(
+            """
+            CREATE TABLE IF NOT EXISTS expenses (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                category_id INTEGER NOT NULL,
+                amount REAL NOT NULL CHECK(amount >= 0),
+                note TEXT,
+                date TEXT NOT NULL,
+                FOREIGN KEY(category_id) REFERENCES categories(id) ON DELETE CASCADE
             )
+            """
+        )
+        c.execute(
+            """
+            CREATE TABLE IF NOT EXISTS incomes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                amount REAL NOT NULL CHECK(amount >= 0),
+                source TEXT,
+                date TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+        version = c.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        # Each step runs in the same transaction as its user_version bump, so an
+        # interrupted upgrade is retried from the last completed version.
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            c.execute("BEGIN")
+            try:
+                getattr(self, f"_upgrade_to_v{target}")(c)
+                c.execute(f"PRAGMA user_version={target}")
+            except Exception:
+                self.conn.rollback()
+                raise
+            self.conn.commit()
+
+    def _upgrade_to_v1(self, c: sqlite3.Cursor) -> None:
+        """Normalize dates to plain 'YYYY-MM-DD' and index them.
+
+        Range queries compare the raw ``date`` columns, which only works (and
+        only uses the indexes) when every stored value has the same shape.
+        """
+        for table in ("expenses", "incomes"):
             c.execute(
+                f"UPDATE {table} SET date = date(date) "
+                "WHERE date(date) IS NOT NULL AND date IS NOT date(date)"
+            )
+        # The implicit rowid suffix makes these (date, id) ordered, matching
+        # the "ORDER BY date DESC, id DESC" of the list queries.
+        c.execute("CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses(date)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_expenses_category_date ON expenses(category_id, date)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_incomes_date ON incomes(date)")
+
+    def _upgrade_to_v2(self, c: sqlite3.Cursor) -> None:
+        """Per-day rollups of expenses (by category) and incomes.
+
+        Triggers keep them exact: inserts add to the day's row, updates and
+        deletes recompute the affected day from the base table (one indexed
+        lookup) so repeated float subtraction never drifts. Rows whose count
+        drops to zero are removed.
+        """
+        c.execute(
+            """
+            CREATE TABLE IF NOT EXISTS daily_category_totals (
+                day TEXT NOT NULL,
+                category_id INTEGER NOT NULL,
+                total REAL NOT NULL,
+                n INTEGER NOT NULL,
+                PRIMARY KEY (day, category_id)
+            ) WITHOUT ROWID
+            """
+        )
+        c.execute(
+            "CREATE INDEX IF NOT EXISTS idx_daily_category_totals_category "
+            "ON daily_category_totals(category_id, day)"
+        )
+        c.execute(
+            """
+            CREATE TABLE IF NOT EXISTS daily_income_totals (
+                day TEXT PRIMARY KEY,
+                total REAL NOT NULL,
+                n INTEGER NOT NULL
+            ) WITHOUT ROWID
+            """
+        )
+
+        c.execute("DELETE FROM daily_category_totals")
+        c.execute(
+            """
+            INSERT INTO daily_category_totals(day, category_id, total, n)
+            SELECT date, category_id, SUM(amount), COUNT(*)
+            FROM expenses GROUP BY date, category_id
+            """
+        )
+        c.execute("DELETE FROM daily_income_totals")
+        c.execute(
+            """
+            INSERT INTO daily_income_totals(day, total, n)
+            SELECT date, SUM(amount), COUNT(*) FROM incomes GROUP BY date
+            """
+        )
+
+        recompute_expense_day = """
+            DELETE FROM daily_category_totals WHERE day = old.date AND category_id = old.category_id;
+            INSERT INTO daily_category_totals(day, category_id, total, n)
+            SELECT date, category_id, SUM(amount), COUNT(*) FROM expenses
+            WHERE category_id = old.category_id AND date = old.date
+            GROUP BY date, category_id;
+        """
+        add_expense_day = """
+            INSERT INTO daily_category_totals(day, category_id, total, n)
+            VALUES (new.date, new.category_id, new.amount, 1)
+            ON CONFLICT(day, category_id) DO UPDATE SET total = total + excluded.total, n = n + 1;
+        """
+        recompute_income_day = """
+            DELETE FROM daily_income_totals WHERE day = old.date;
+            INSERT INTO daily_income_totals(day, total, n)
+            SELECT date, SUM(amount), COUNT(*) FROM incomes WHERE date = old.date GROUP BY date;
+        """
+        add_income_day = """
+            INSERT INTO daily_income_totals(day, total, n)
+            VALUES (new.date, new.amount, 1)
+            ON CONFLICT(day) DO UPDATE SET total = total + excluded.total, n = n + 1;
+        """
+        triggers = {
+            "expenses_ai_rollup": ("AFTER INSERT ON expenses", add_expense_day),
+            "expenses_ad_rollup": ("AFTER DELETE ON expenses", recompute_expense_day),
+            "expenses_au_rollup": (
+                "AFTER UPDATE OF date, category_id, amount ON expenses",
+                recompute_expense_day + recompute_expense_day.replace("old.", "new."),
+            ),
+            "incomes_ai_rollup": ("AFTER INSERT ON incomes", add_income_day),
+            "incomes_ad_rollup": ("AFTER DELETE ON incomes", recompute_income_day),
+            "incomes_au_rollup": (
+                "AFTER UPDATE OF date, amount ON incomes",
+                recompute_income_day + recompute_income_day.replace("old.", "new."),
+            ),
+        }
+        for name, (event, body) in triggers.items():
+            c.execute(f"DROP TRIGGER IF EXISTS {name}")
+            c.execute(f"CREATE TRIGGER {name} {event} BEGIN {body} END")
+
+    def _upgrade_to_v3(self, c: sqlite3.Cursor) -> None:
+        """Lookup index for duplicate detection during statement imports."""
+        c.execute("CREATE INDEX IF NOT EXISTS idx_expenses_dedup ON expenses(date, amount, note)")
+
+    def _upgrade_to_v4(self, c: sqlite3.Cursor) -> None:
+        """Integer storage: amounts in cents, dates as day numbers, STRICT tables.
+
+        Integer sums are exact, and a small integer is narrower and cheaper
+        to compare than a float plus a 10-character date string. expenses
+        and incomes are rebuilt (keeping ids and the AUTOINCREMENT high-water
+        mark); their indexes, the rollups and the triggers are recreated
+        against the new columns.
+        """
+        day = f"CAST(julianday(date) - {_JULIAN_EPOCH} AS INTEGER)"
+        cents = "CAST(round(amount * 100) AS INTEGER)"
+        tables = {
+            "expenses": (
                 """
-                CREATE TABLE IF NOT EXISTS incomes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    amount REAL NOT NULL CHECK(amount >= 0),
-                    source TEXT,
-                    date TEXT NOT NULL
-                )
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                category_id INTEGER NOT NULL,
+                amount_cents INTEGER NOT NULL CHECK(amount_cents >= 0),
+                note TEXT,
+                day INTEGER NOT NULL,
+                FOREIGN KEY(category_id) REFERENCES categories(id) ON DELETE CASCADE
+                """,
+                "id, category_id, amount_cents, note, day",
+                f"id, category_id, {cents}, note, {day}",
+            ),
+            "incomes": (
                 """
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                amount_cents INTEGER NOT NULL CHECK(amount_cents >= 0),
+                source TEXT,
+                day INTEGER NOT NULL
+                """,
+                "id, amount_cents, source, day",
+                f"id, {cents}, source, {day}",
+            ),
+        }
+        for table, (columns, new_cols, old_cols) in tables.items():
+            row = c.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+            c.execute(f"CREATE TABLE {table}_v4 ({columns}) STRICT")
+            c.execute(f"INSERT INTO {table}_v4({new_cols}) SELECT {old_cols} FROM {table}")
+            c.execute(f"DROP TABLE {table}")  # also drops its indexes and triggers
+            c.execute(f"ALTER TABLE {table}_v4 RENAME TO {table}")
+            if row:
+                # The copy only has a sequence row if it received rows, so write
+                # the saved mark back whether or not one exists. sqlite_sequence
+                # has no key on name to INSERT OR REPLACE against.
+                current = c.execute("SELECT max(seq) FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()[0]
+                c.execute("DELETE FROM sqlite_sequence WHERE name = ?", (table,))
+                c.execute("INSERT INTO sqlite_sequence(name, seq) VALUES (?, ?)", (table, max(row[0], current or 0)))
+
+        # As in v1, the implicit rowid suffix keeps these (day, id) ordered.
+        c.execute("CREATE INDEX idx_expenses_day ON expenses(day)")
+        c.execute("CREATE INDEX idx_expenses_category_day ON expenses(category_id, day)")
+        c.execute("CREATE INDEX idx_expenses_dedup ON expenses(day, amount_cents, note)")
+        c.execute("CREATE INDEX idx_incomes_day ON incomes(day)")
+
+        c.execute("DROP TABLE IF EXISTS daily_category_totals")
+        c.execute("DROP TABLE IF EXISTS daily_income_totals")
+        c.execute(
+            """
+            CREATE TABLE daily_category_totals (
+                day INTEGER NOT NULL,
+                category_id INTEGER NOT NULL,
+                total INTEGER NOT NULL,
+                n INTEGER NOT NULL,
+                PRIMARY KEY (day, category_id)
+            ) STRICT, WITHOUT ROWID
+            """
+        )
+        c.execute(
+            "CREATE INDEX idx_daily_category_totals_category "
+            "ON daily_category_totals(category_id, day)"
+        )
+        c.execute(
+            """
+            CREATE TABLE daily_income_totals (
+                day INTEGER PRIMARY KEY,
+                total INTEGER NOT NULL,
+                n INTEGER NOT NULL
+            ) STRICT, WITHOUT ROWID
+            """
+        )
+        c.execute(
+            """
+            INSERT INTO daily_category_totals(day, category_id, total, n)
+            SELECT day, category_id, SUM(amount_cents), COUNT(*)
+            FROM expenses GROUP BY day, category_id
+            """
+        )
+        c.execute(
+            """
+            INSERT INTO daily_income_totals(day, total, n)
+            SELECT day, SUM(amount_cents), COUNT(*) FROM incomes GROUP BY day
+            """
+        )
+
+        # Cents add and subtract exactly, so unlike the v2 triggers these
+        # apply deltas instead of recomputing the day from the base table.
+        add_expense = """
+            INSERT INTO daily_category_totals(day, category_id, total, n)
+            VALUES (new.day, new.category_id, new.amount_cents, 1)
+            ON CONFLICT(day, category_id) DO UPDATE SET total = total + excluded.total, n = n + 1;
+        """
+        remove_expense = """
+            UPDATE daily_category_totals SET total = total - old.amount_cents, n = n - 1
+            WHERE day = old.day AND category_id = old.category_id;
+            DELETE FROM daily_category_totals WHERE day = old.day AND category_id = old.category_id AND n = 0;
+        """
+        add_income = """
+            INSERT INTO daily_income_totals(day, total, n)
+            VALUES (new.day, new.amount_cents, 1)
+            ON CONFLICT(day) DO UPDATE SET total = total + excluded.total, n = n + 1;
+        """
+        remove_income = """
+            UPDATE daily_income_totals SET total = total - old.amount_cents, n = n - 1 WHERE day = old.day;
+            DELETE FROM daily_income_totals WHERE day = old.day AND n = 0;
+        """
+        triggers = {
+            "expenses_ai_rollup": ("AFTER INSERT ON expenses", add_expense),
+            "expenses_ad_rollup": ("AFTER DELETE ON expenses", remove_expense),
+            "expenses_au_rollup": (
+                "AFTER UPDATE OF day, category_id, amount_cents ON expenses", remove_expense + add_expense,
+            ),
+            "incomes_ai_rollup": ("AFTER INSERT ON incomes", add_income),
+            "incomes_ad_rollup": ("AFTER DELETE ON incomes", remove_income),
+            "incomes_au_rollup": ("AFTER UPDATE OF day, amount_cents ON incomes", remove_income + add_income),
+        }
+        for name, (event, body) in triggers.items():
+            c.execute(f"CREATE TRIGGER {name} {event} BEGIN {body} END")
+
+    def _upgrade_to_v5(self, c: sqlite3.Cursor) -> None:
+        """Full-text search: FTS5 indexes over expense notes + category names and income sources.
+
+        Both are external-content tables, so the text is stored once, in the
+        base tables; the indexes only hold the tokens. Expenses are indexed
+        through the expense_search view, which adds the category name, and
+        triggers keep the index in step with every write, including category
+        renames and deletes (deleted categories index as no category).
+        prefix='2 3' makes the prefix queries of search-as-you-type index
+        lookups instead of token scans.
+        """
+        c.execute(
+            """
+            CREATE VIEW expense_search AS
+            SELECT e.id, e.note, c.name AS category
+            FROM expenses e LEFT JOIN categories c ON c.id = e.category_id
+            """
+        )
+        c.execute(
+            f"""
+            CREATE VIRTUAL TABLE expenses_fts USING fts5(
+                note, category, content = 'expense_search', content_rowid = 'id', {_FTS_OPTIONS}
             )
-            self.conn.commit()
-    
+            """
+        )
+        c.execute(
+            f"""
+            CREATE VIRTUAL TABLE incomes_fts USING fts5(
+                source, content = 'incomes', content_rowid = 'id', {_FTS_OPTIONS}
+            )
+            """
+        )
+        c.execute("INSERT INTO expenses_fts(expenses_fts) VALUES ('rebuild')")
+        c.execute("INSERT INTO incomes_fts(incomes_fts) VALUES ('rebuild')")
+
+        # An external-content 'delete' must repeat exactly what was indexed.
+        category_of = "(SELECT name FROM categories WHERE id = {}.category_id)"
+        add_expense = f"""
+            INSERT INTO expenses_fts(rowid, note, category) VALUES (new.id, new.note, {category_of.format('new')});
+        """
+        remove_expense = f"""
+            INSERT INTO expenses_fts(expenses_fts, rowid, note, category)
+            VALUES ('delete', old.id, old.note, {category_of.format('old')});
+        """
+        reindex_category = """
+            INSERT INTO expenses_fts(expenses_fts, rowid, note, category)
+            SELECT 'delete', id, note, old.name FROM expenses WHERE category_id = old.id;
+            INSERT INTO expenses_fts(rowid, note, category)
+            SELECT id, note, {} FROM expenses WHERE category_id = old.id;
+        """
+        add_income = "INSERT INTO incomes_fts(rowid, source) VALUES (new.id, new.source);"
+        remove_income = "INSERT INTO incomes_fts(incomes_fts, rowid, source) VALUES ('delete', old.id, old.source);"
+        triggers = {
+            "expenses_ai_fts": ("AFTER INSERT ON expenses", add_expense),
+            "expenses_ad_fts": ("AFTER DELETE ON expenses", remove_expense),
+            # BEFORE, so the old category is still there to look up.
+            "expenses_bu_fts": ("BEFORE UPDATE OF note, category_id ON expenses", remove_expense),
+            "expenses_au_fts": ("AFTER UPDATE OF note, category_id ON expenses", add_expense),
+            "categories_au_fts": ("AFTER UPDATE OF name ON categories", reindex_category.format("new.name")),
+            "categories_ad_fts": ("AFTER DELETE ON categories", reindex_category.format("NULL")),
+            "incomes_ai_fts": ("AFTER INSERT ON incomes", add_income),
+            "incomes_ad_fts": ("AFTER DELETE ON incomes", remove_income),
+            "incomes_au_fts": ("AFTER UPDATE OF source ON incomes", remove_income + add_income),
+        }
+        for name, (event, body) in triggers.items():
+            c.execute(f"CREATE TRIGGER {name} {event} BEGIN {body} END")
+
+    def _upgrade_to_v6(self, c: sqlite3.Cursor) -> None:
+        """Manifest of the years moved out to archive files by archive_year().
+
+        Holds each archived year's counts and totals in cents. The daily
+        rollups and the categories stay in the main database for every
+        year, so totals never need to open an archive.
+        """
+        c.execute(
+            """
+            CREATE TABLE archives (
+                year INTEGER PRIMARY KEY,
+                file TEXT NOT NULL,
+                expenses INTEGER NOT NULL,
+                expenses_total INTEGER NOT NULL,
+                incomes INTEGER NOT NULL,
+                incomes_total INTEGER NOT NULL,
+                archived_at TEXT NOT NULL DEFAULT (datetime('now'))
+            ) STRICT
+            """
+        )
+
+    # categories
+    def _categories(self) -> dict:
+        """The name -> id cache, loading it from the table on first use."""
+        self.data_version()  # drops the cache if another connection committed
+        if self._cat_by_name is None:
+            rows = self.conn.execute("SELECT id, name FROM categories").fetchall()
+            self._cat_by_id = dict(rows)
+            self._cat_by_name = {name: cid for cid, name in rows}
+        return self._cat_by_name
+
+    def _remember_category(self, cid: int, name: str) -> None:
+        self._categories()[name] = cid
+        self._cat_by_id[cid] = name
+
+    def _ensure_category(self, name: str) -> int:
+        """Id of the category, creating it (without committing) if needed."""
+        name = name.strip()
+        cid = self._categories().get(name)
+        if cid is None:
+            # DO NOTHING leaves a row another process added since we loaded
+            # untouched (no write, no search reindex); RETURNING is then empty.
+            row = self.conn.execute(
+                "INSERT INTO categories(name) VALUES (?) ON CONFLICT(name) DO NOTHING RETURNING id", (name,)
+            ).fetchone()
+            if row is None:
+                cid = self.conn.execute("SELECT id FROM categories WHERE name=?", (name,)).fetchone()[0]
+            else:
+                cid = row[0]
+                self._publish(lambda: CategoryAdded(cid, name))
+            self._remember_category(cid, name)
+        return cid
+
     def add_category(self, name: str) -> None:
-         self.conn.execute("INSERT OR IGNORE INTO categories(name) VALUES (?)", (name.strip(),))
-         self.conn.commit()
+         if self.cat_id(name) is None:
+             self._ensure_category(name)
+             self._commit()
     
     def rename_category(self, old: str, new: str) -> None:
-         self.conn.execute("UPDATE categories SET name=? WHERE name=?", (new.strip(), old.strip()))
-         self.conn.commit()
+         old, new = old.strip(), new.strip()
+         cid = self.cat_id(old)
+         self.conn.execute("UPDATE categories SET name=? WHERE name=?", (new, old))
+         if cid is not None:
+             self._categories().pop(old, None)
+             self._remember_category(cid, new)
+             self._reindex_archived_category(cid, new)
+             self._publish(lambda: CategoryRenamed(cid, old, new))
+         self._commit()
     
+    @_cached
     def all_categories(self) -> List[Tuple[int, str]]:
          return self.conn.execute("SELECT id, name FROM categories ORDER BY name").fetchall()
     
     def cat_id(self, name: str) -> Optional[int]:
-        row = self.conn.execute("SELECT id FROM categories WHERE name=?", (name.strip(),)).fetchone()
-        return row[0] if row else None
+        name = name.strip()
+        cid = self._categories().get(name)
+        if cid is None:
+            # Not seen by this connection; another process may have added it.
+            row = self.conn.execute("SELECT id FROM categories WHERE name=?", (name,)).fetchone()
+            if row:
+                cid = row[0]
+                self._remember_category(cid, name)
+        return cid
+
+    def category_name(self, cid: int) -> Optional[str]:
+        self._categories()
+        return self._cat_by_id.get(cid)
 
     # expenses
     def add_expense(self, category_name: str, amount: float, note: str, d: date) -> None:
-        cid = self.cat_id(category_name)
-        if cid is None:
-            self.add_category(category_name)
-            cid = self.cat_id(category_name)
-        self.conn.execute(
-             "INSERT INTO expenses(category_id, amount, note, date) VALUES (?,?,?,?)",
-            (cid, float(amount), note, d.isoformat())
+        self._check_open(_day(d))
+        cid = self._ensure_category(category_name)
+        cur = self.conn.execute(
+             "INSERT INTO expenses(category_id, amount_cents, note, day) VALUES (?,?,?,?)",
+            (cid, _cents(amount), note, _day(d))
         )
-        self.conn.commit()
+        self._track_expense(cid, _day(d), _cents(amount))
+        self._publish(lambda: ExpenseInserted(
+            None, self._expense(cur.lastrowid, cid, _day(d), _cents(amount), note)))
+        self._commit()
     
     def update_expense(self, expense_id: int, category_name: str, amount: float, note: str, d: date) -> None:
-        cid = self.cat_id(category_name)
-        if cid is None:
-            self.add_category(category_name)
-            cid = self.cat_id(category_name)
+        self._check_not_archived("expenses", expense_id)
+        self._check_open(_day(d))
+        cid = self._ensure_category(category_name)
+        old = self._tracked_row("SELECT category_id, day, amount_cents, note FROM expenses WHERE id=?", expense_id)
         self.conn.execute(
-            "UPDATE expenses SET category_id=?, amount=?, note=?, date=? WHERE id=?",
-            (cid, float(amount), note, d.isoformat(), expense_id),
+            "UPDATE expenses SET category_id=?, amount_cents=?, note=?, day=? WHERE id=?",
+            (cid, _cents(amount), note, _day(d), expense_id),
         )
-        self.conn.commit()
+        if old is not None:
+            self._track_expense(old[0], old[1], -old[2])
+            self._track_expense(cid, _day(d), _cents(amount))
+            self._publish(lambda: ExpenseUpdated(
+                self._expense(expense_id, *old), self._expense(expense_id, cid, _day(d), _cents(amount), note)))
+        self._commit()
     
     def delete_expense(self, expense_id: int) -> None:
+        self._check_not_archived("expenses", expense_id)
+        old = self._tracked_row("SELECT category_id, day, amount_cents, note FROM expenses WHERE id=?", expense_id)
         self.conn.execute("DELETE FROM expenses WHERE id=?", (expense_id,))
-        self.conn.commit()
+        if old is not None:
+            self._track_expense(old[0], old[1], -old[2])
+            self._publish(lambda: ExpenseDeleted(self._expense(expense_id, *old), None))
+        self._commit()
     
     def delete_category(self, name: str) -> None:
-        """Deletes the category by name. Expenses are removed via ON DELETE CASCADE."""
-        self.conn.execute("DELETE FROM categories WHERE name = ?", (name.strip(),))
-        self.conn.commit()
+        """Deletes the category by name together with its expenses.
+
+        Foreign keys are not enforced, so the expenses are deleted here,
+        in the same transaction, which also keeps the rollups and the
+        search index in step. Refused while an archived year still holds
+        expenses of the category.
+        """
+        name = name.strip()
+        cid = self.cat_id(name)
+        if cid is not None:
+            for year in sorted(self._archive_paths()):
+                if self.conn.execute(
+                    f"SELECT 1 FROM {self._schema(year)}.expenses WHERE category_id = ? LIMIT 1", (cid,)
+                ).fetchone():
+                    raise ValueError(f"{year} is archived and has expenses in '{name}'; unarchive it first")
+            if self.conn.execute("DELETE FROM expenses WHERE category_id = ?", (cid,)).rowcount:
+                self._totals = None  # rebuilt on next read
+        self.conn.execute("DELETE FROM categories WHERE name = ?", (name,))
+        if cid is not None:
+            self._categories().pop(name, None)
+            self._cat_by_id.pop(cid, None)
+            self._publish(lambda: CategoryDeleted(cid, name))
+        self._commit()
     
+    @_cached
     def sum_by_category(self, start: date, end: date) -> List[Tuple[str, float]]:
+        index = self.totals_index()
+        if index is not None:
+            return self._indexed_categories(index, _day(start), _day(end))
         return self.conn.execute(
             """
-            SELECT c.name, COALESCE(SUM(e.amount), 0)
+            SELECT c.name, COALESCE(SUM(t.total), 0) / 100.0
             FROM categories c
-            LEFT JOIN expenses e ON e.category_id=c.id AND date(e.date) BETWEEN date(?) AND date(?)
+            LEFT JOIN daily_category_totals t ON t.category_id=c.id AND t.day BETWEEN ? AND ?
             GROUP BY c.id
             ORDER BY c.name
             """,
-            (start.isoformat(), end.isoformat()),
+            (_day(start), _day(end)),
         ).fetchall()
     
     def expenses_for_category(self, category_name: str, start: date, end: date) -> List[Tuple[int, str, float, str]]:
         """Return (id, date, amount, note) for a category within range."""
-        return self.conn.execute(
-            """
-            SELECT e.id, e.date, e.amount, COALESCE(e.note, '')
-            FROM expenses e
-            JOIN categories c ON c.id = e.category_id
-            WHERE c.name = ? AND date(e.date) BETWEEN date(?) AND date(?)
-            ORDER BY date(e.date) DESC, e.id DESC
-            """,
-            (category_name, start.isoformat(), end.isoformat()),
-        ).fetchall()
+        cid = self.cat_id(category_name)
+        if cid is None:
+            return []
+        return self._read(lambda src: f"""
+            SELECT e.id, {_day_text('e.')}, {_amount('e.')}, COALESCE(e.note, '')
+            FROM {src}.expenses e
+            WHERE e.category_id = :cid AND e.day BETWEEN :lo AND :hi
+            ORDER BY e.day DESC, e.id DESC
+            """, start, end, {"cid": cid})
+
+    def expenses_for_category_page(self, category_name: str, start: date, end: date,
+                                   after: PageKey = None, limit: int = PAGE_SIZE) -> List[Tuple[int, str, float, str]]:
+        """One page of expenses_for_category, continuing after the (date, id) key."""
+        cid = self.cat_id(category_name)
+        if cid is None:
+            return []
+        cond, key, end = self._after_clause("e.", after, end)
+        return self._read(lambda src: f"""
+            SELECT e.id, {_day_text('e.')}, {_amount('e.')}, COALESCE(e.note, '')
+            FROM {src}.expenses e
+            WHERE e.category_id = :cid AND e.day BETWEEN :lo AND :hi{cond}
+            ORDER BY e.day DESC, e.id DESC
+            LIMIT :limit
+            """, start, end, {"cid": cid, **key}, limit=limit)
     
     def expenses_in_range(self, start: date, end: date) -> List[Tuple[int, str, float, str, str]]:
         """Return (id, date, amount, category, note) for ALL expenses in range."""
-        return self.conn.execute(
-            """
-            SELECT e.id, e.date, e.amount, c.name AS category, COALESCE(e.note, '')
-            FROM expenses e
+        return self._read(lambda src: f"""
+            SELECT e.id, {_day_text('e.')}, {_amount('e.')}, c.name AS category, COALESCE(e.note, '')
+            FROM {src}.expenses e
             JOIN categories c ON c.id = e.category_id
-            WHERE date(e.date) BETWEEN date(?) AND date(?)
-            ORDER BY date(e.date) DESC, e.id DESC
-            """,
-            (start.isoformat(), end.isoformat()),
-        ).fetchall()
+            WHERE e.day BETWEEN :lo AND :hi
+            ORDER BY e.day DESC, e.id DESC
+            """, start, end)
+
+    def iter_expenses(self, start: date, end: date, batch: int = STREAM_BATCH) -> Iterator[List[Tuple[int, str, float, str, str]]]:
+        """Stream (id, date, amount, category, note) in chronological order, in batches.
+
+        Only one batch is materialized at a time, so exporting the whole ledger
+        uses the same memory as exporting a week.
+        """
+        for year, lo, hi in self._segments(_day(start), _day(end)):
+            cur = self.conn.execute(
+                f"""
+                SELECT e.id, {_day_text('e.')}, {_amount('e.')}, c.name AS category, COALESCE(e.note, '')
+                FROM {self._schema(year)}.expenses e
+                JOIN categories c ON c.id = e.category_id
+                WHERE e.day BETWEEN ? AND ?
+                ORDER BY e.day, e.id
+                """,
+                (lo, hi),
+            )
+            try:
+                while rows := cur.fetchmany(batch):
+                    yield rows
+            finally:
+                cur.close()
+
+    def expenses_in_range_page(self, start: date, end: date, after: PageKey = None,
+                               limit: int = PAGE_SIZE) -> List[Tuple[int, str, float, str, str]]:
+        """One page of expenses_in_range, continuing after the (date, id) key."""
+        cond, key, end = self._after_clause("e.", after, end)
+        return self._read(lambda src: f"""
+            SELECT e.id, {_day_text('e.')}, {_amount('e.')}, c.name AS category, COALESCE(e.note, '')
+            FROM {src}.expenses e
+            JOIN categories c ON c.id = e.category_id
+            WHERE e.day BETWEEN :lo AND :hi{cond}
+            ORDER BY e.day DESC, e.id DESC
+            LIMIT :limit
+            """, start, end, key, limit=limit)
     
+    @_cached
     def expenses_daily_by_category(self, start: date, end: date):
         """
         Returns rows of (date_str 'YYYY-MM-DD', category_name, total_amount)
         for each day/category in the range.
         """
         return self.conn.execute(
-            """
-            SELECT date(e.date) AS d, c.name AS category, COALESCE(SUM(e.amount), 0) AS total
-            FROM expenses e
-            JOIN categories c ON c.id = e.category_id
-            WHERE date(e.date) BETWEEN date(?) AND date(?)
-            GROUP BY d, c.name
-            ORDER BY d, c.name
+            f"""
+            SELECT {_day_text('t.')} AS d, c.name AS category, t.total / 100.0
+            FROM daily_category_totals t
+            JOIN categories c ON c.id = t.category_id
+            WHERE t.day BETWEEN ? AND ?
+            ORDER BY t.day, c.name
             """,
-            (start.isoformat(), end.isoformat()),
+            (_day(start), _day(end)),
         ).fetchall()
     
+    @_cached
     def count_expenses_in_category(self, name:str) -> int:
+        cid = self.cat_id(name)
+        if cid is None:
+            return 0
+        # From the rollups, which also count archived years.
         row = self.conn.execute(
-            """
-            SELECT COUNT(*)
-            FROM expenses e
-            JOIN categories c ON c.id = e.category_id
-            WHERE c.name = ?
-            """,
-            (name.strip(),),
+            "SELECT COALESCE(SUM(n), 0) FROM daily_category_totals WHERE category_id = ?", (cid,)
         ).fetchone()
-        return int(row[0] or 0)
+        return int(row[0])
     
+    def _category_ids(self, names: Iterable[str]) -> dict:
+        """Map each (stripped) name to its category id, creating missing ones."""
+        return {n: self._ensure_category(n) for n in {n.strip() for n in names}}
+
+    def add_expenses_bulk(self, rows: Iterable[Tuple[str, float, str, date]]) -> int:
+        """Insert (category_name, amount, note, date) rows with one executemany.
+
+        Commits once (or joins an enclosing transaction()). Returns the count.
+        """
+        rows = list(rows)
+        if not rows:
+            return 0
+        with self.transaction():
+            ids = self._category_ids(cat for (cat, _a, _n, _d) in rows)
+            params = [(ids[cat.strip()], _cents(amount), note, _day(d)) for (cat, amount, note, d) in rows]
+            self._check_open(*{day for (_c, _a, _n, day) in params})
+            self.conn.executemany(
+                "INSERT INTO expenses(category_id, amount_cents, note, day) VALUES (?,?,?,?)", params,
+            )
+            for cid, cents, _note, day in params:
+                self._track_expense(cid, day, cents)
+            self._publish(lambda: TablesChanged(("expenses",)))
+        return len(rows)
+
+    def import_expenses(self, chunks: Iterable[Sequence[Tuple[date, str, float, str]]]) -> Tuple[int, int]:
+        """Bulk-insert (date, category, amount, note) rows arriving in chunks.
+
+        The whole import is one transaction. Category names are resolved once
+        per chunk (missing ones are created) and rows are inserted with a
+        single executemany per chunk. A row matching the (date, amount, note,
+        category) of an expense that existed before the import is skipped as
+        a duplicate, so re-importing an overlapping statement adds nothing
+        twice, while repeated purchases within the file are all kept.
+        Returns (inserted, duplicates).
+        """
+        inserted = total = 0
+        # A bigger page cache keeps the four touched indexes from spilling to
+        # the WAL mid-transaction; restored afterwards.
+        cache_size = self.conn.execute("PRAGMA cache_size").fetchone()[0]
+        self.conn.execute("PRAGMA cache_size=-65536")
+        try:
+            with self.transaction():
+                # Ids only grow, so rows up to this one are the ones that
+                # existed before the import.
+                before = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM expenses").fetchone()[0]
+                for chunk in chunks:
+                    ids = self._category_ids(cat for (_d, cat, _a, _n) in chunk)
+                    params = [(ids[cat.strip()], _cents(amount), note, _day(d), before)
+                              for (d, cat, amount, note) in chunk]
+                    self._check_open(*{day for (_c, _a, _n, day, _b) in params})
+                    cur = self.conn.executemany(
+                        """
+                        INSERT INTO expenses(category_id, amount_cents, note, day)
+                        SELECT ?1, ?2, ?3, ?4
+                        WHERE NOT EXISTS (
+                            SELECT 1 FROM expenses
+                            WHERE day = ?4 AND amount_cents = ?2 AND note IS ?3 AND id <= ?5 AND category_id = ?1
+                        )
+                        """,
+                        params,
+                    )
+                    inserted += cur.rowcount
+                    total += len(chunk)
+                # Which rows were duplicates isn't reported back; rebuild instead.
+                self._totals = None
+                if inserted:
+                    self._publish(lambda: TablesChanged(("expenses",)))
+        finally:
+            self.conn.execute(f"PRAGMA cache_size={cache_size}")
+        return inserted, total - inserted
+
     # incomes
     def add_income(self, amount: float, source: str, d: date) -> None:
-        self.conn.execute(
-            "INSERT INTO incomes(amount, source, date) VALUES (?,?,?)",
-            (float(amount), source, d.isoformat()),
+        self._check_open(_day(d))
+        cur = self.conn.execute(
+            "INSERT INTO incomes(amount_cents, source, day) VALUES (?,?,?)",
+            (_cents(amount), source, _day(d)),
         )
-        self.conn.commit()
+        self._track_income(_day(d), _cents(amount))
+        self._publish(lambda: IncomeInserted(None, Income(cur.lastrowid, d, _cents(amount) / 100, source)))
+        self._commit()
     
     def update_income(self, income_id: int, amount: float, source: str, d: date) -> None:
+        self._check_not_archived("incomes", income_id)
+        self._check_open(_day(d))
+        old = self._tracked_row("SELECT day, amount_cents, source FROM incomes WHERE id=?", income_id)
         self.conn.execute(
-            "UPDATE incomes SET amount=?, source=?, date=? WHERE id=?",
-            (float(amount), source, d.isoformat(), income_id),
+            "UPDATE incomes SET amount_cents=?, source=?, day=? WHERE id=?",
+            (_cents(amount), source, _day(d), income_id),
         )
-        self.conn.commit()
+        if old is not None:
+            self._track_income(old[0], -old[1])
+            self._track_income(_day(d), _cents(amount))
+            self._publish(lambda: IncomeUpdated(Income(income_id, _date(old[0]), old[1] / 100, old[2]),
+                                                Income(income_id, d, _cents(amount) / 100, source)))
+        self._commit()
 
     def delete_income(self, income_id: int) -> None:
+        self._check_not_archived("incomes", income_id)
+        old = self._tracked_row("SELECT day, amount_cents, source FROM incomes WHERE id=?", income_id)
         self.conn.execute("DELETE FROM incomes WHERE id=?", (income_id,))
-        self.conn.commit()
+        if old is not None:
+            self._track_income(old[0], -old[1])
+            self._publish(lambda: IncomeDeleted(Income(income_id, _date(old[0]), old[1] / 100, old[2]), None))
+        self._commit()
+
+    def add_incomes_bulk(self, rows: Iterable[Tuple[float, str, date]]) -> int:
+        """Insert (amount, source, date) rows with one executemany and one commit."""
+        params = [(_cents(amount), source, _day(d)) for (amount, source, d) in rows]
+        self._check_open(*{day for (_c, _s, day) in params})
+        with self.transaction():
+            cur = self.conn.executemany("INSERT INTO incomes(amount_cents, source, day) VALUES (?,?,?)", params)
+            for cents, _source, day in params:
+                self._track_income(day, cents)
+            self._publish(lambda: TablesChanged(("incomes",)))
+        return max(cur.rowcount, 0)
 
     
     def incomes_in_range(self, start: date, end: date) -> List[Tuple[int, str, float, str]]:
         """Return (id, date, amount, source) for incomes in range."""
-        return self.conn.execute(
+        return self._read(lambda src: f"""
+            SELECT id, {_day_text()}, {_amount()}, COALESCE(source, '')
+            FROM {src}.incomes
+            WHERE day BETWEEN :lo AND :hi
+            ORDER BY day DESC, id DESC
+            """, start, end)
+
+    def iter_incomes(self, start: date, end: date, batch: int = STREAM_BATCH) -> Iterator[List[Tuple[int, str, float, str]]]:
+        """Stream (id, date, amount, source) in chronological order, in batches."""
+        for year, lo, hi in self._segments(_day(start), _day(end)):
+            cur = self.conn.execute(
+                f"""
+                SELECT id, {_day_text()}, {_amount()}, COALESCE(source, '')
+                FROM {self._schema(year)}.incomes
+                WHERE day BETWEEN ? AND ?
+                ORDER BY day, id
+                """,
+                (lo, hi),
+            )
+            try:
+                while rows := cur.fetchmany(batch):
+                    yield rows
+            finally:
+                cur.close()
+
+    def incomes_in_range_page(self, start: date, end: date, after: PageKey = None,
+                              limit: int = PAGE_SIZE) -> List[Tuple[int, str, float, str]]:
+        """One page of incomes_in_range, continuing after the (date, id) key."""
+        cond, key, end = self._after_clause("", after, end)
+        return self._read(lambda src: f"""
+            SELECT id, {_day_text()}, {_amount()}, COALESCE(source, '')
+            FROM {src}.incomes
+            WHERE day BETWEEN :lo AND :hi{cond}
+            ORDER BY day DESC, id DESC
+            LIMIT :limit
+            """, start, end, key, limit=limit)
+
+    @staticmethod
+    def _after_clause(alias: str, after: PageKey, end: date) -> Tuple[str, dict, date]:
+        """Keyset condition continuing a 'day DESC, id DESC' listing past `after`, and the end it allows.
+
+        The row-value comparison alone does not bound the index search, which
+        would still start at the range end and step over every row already
+        listed; clamping the end to the key's date makes :hi do that.
+        """
+        if after is None:
+            return "", {}, end
+        after_date = date.fromisoformat(after[0])
+        return (f" AND ({alias}day, {alias}id) < (:after_day, :after_id)",
+                {"after_day": _day(after_date), "after_id": after[1]}, min(end, after_date))
+
+    # -- search (FTS5, see _upgrade_to_v5) -------------------------------------
+    def search(self, text: str, start: Optional[date] = None, end: Optional[date] = None,
+               limit: int = SEARCH_LIMIT) -> List[Tuple[str, int, str, float, str, str]]:
+        """Expenses and incomes matching text, best match first.
+
+        Every word of text must occur as a word prefix in the expense note or
+        category name, or in the income source; an optional date range
+        narrows the hits. Rows are (kind, id, date, amount, category or
+        source, note) with kind 'expense' or 'income'.
+
+        Ranking (FTS5 bm25) covers the newest SEARCH_WINDOW hits of each
+        table, i.e. all of them unless the words are very common. Archived
+        years in range are searched in their own indexes, each with its
+        own window.
+        """
+        query = _fts_query(text)
+        if not query:
+            return []
+        lo, hi = _day(start or date.min), _day(end or date.max)
+        # main holds no rows of archived years, so it is searched over the
+        # whole range once, next to each archive the range reaches.
+        sources = [None] + [year for year, _lo, _hi in self._segments(lo, hi) if year is not None]
+        rows = []
+        for year in sources:
+            src = self._schema(year)
+            # Reading the index in rowid order lets each branch stop after
+            # the window instead of scoring every match.
+            rows += self.conn.execute(
+                f"""
+                SELECT kind, id, {_day_text()}, {_amount()}, label, note, rank FROM (
+                    SELECT * FROM (
+                        SELECT 'expense' AS kind, e.id, e.day, e.amount_cents, COALESCE(c.name, '') AS label,
+                               COALESCE(e.note, '') AS note, f.rank
+                        FROM {src}.expenses_fts f
+                        JOIN {src}.expenses e ON e.id = f.rowid
+                        LEFT JOIN categories c ON c.id = e.category_id
+                        WHERE f.expenses_fts MATCH ?1 AND e.day BETWEEN ?2 AND ?3
+                        ORDER BY f.rowid DESC
+                        LIMIT ?4
+                    )
+                    UNION ALL
+                    SELECT * FROM (
+                        SELECT 'income', i.id, i.day, i.amount_cents, COALESCE(i.source, ''), '', f.rank
+                        FROM {src}.incomes_fts f
+                        JOIN {src}.incomes i ON i.id = f.rowid
+                        WHERE f.incomes_fts MATCH ?1 AND i.day BETWEEN ?2 AND ?3
+                        ORDER BY f.rowid DESC
+                        LIMIT ?4
+                    )
+                )
+                ORDER BY rank, day DESC, id DESC
+                LIMIT ?5
+                """,
+                (query, lo, hi, SEARCH_WINDOW, limit),
+            ).fetchall()
+        if len(sources) > 1:
+            # Same order as the SQL; stable sorts, least significant key first.
+            rows.sort(key=lambda r: r[1], reverse=True)
+            rows.sort(key=lambda r: r[2], reverse=True)
+            rows.sort(key=lambda r: r[-1])
+        return [row[:-1] for row in rows[:limit]]
+
+    # -- aggregation --------------------------------------------------------
+    @_cached
+    def aggregate(self, dataset: str, start: date, end: date, group_by: Sequence[str] = (),
+                  measure: str = "sum", filters: Optional[Filters] = None) -> Aggregate:
+        """`measure` of the amounts of `dataset` in range, grouped by `group_by`.
+
+        dataset is "expenses" or "incomes"; group_by takes entries of GROUPS
+        ("category" for expenses, "source" for incomes), measure one of
+        MEASURES. Compiles to a single GROUP BY over the daily rollups when
+        the measure and filters allow it, otherwise over the base table;
+        either way the range is an index search on day. Groups come back
+        ordered by their keys; with no group_by there is one value.
+
+        The rollups cover archived years too. Base table reads over a range
+        that reaches into archived years run once per segment (see
+        _segments) and are combined here.
+        """
+        if isinstance(group_by, str):
+            group_by = (group_by,)
+        group_by = tuple(group_by)
+        f = filters or Filters()
+        expenses = dataset == "expenses"
+        if dataset not in ("expenses", "incomes"):
+            raise ValueError(f"Unknown dataset '{dataset}'")
+        if measure not in MEASURES:
+            raise ValueError(f"Unknown measure '{measure}'")
+        allowed = set(_PERIODS) | {"category" if expenses else "source"}
+        for g in group_by:
+            if g not in allowed:
+                raise ValueError(f"Cannot group {dataset} by '{g}'")
+        if f.category is not None and not expenses:
+            raise ValueError("Incomes have no category")
+
+        # The rollups hold per-day SUM and COUNT; anything finer-grained than
+        # that (min/max, amount or text filters, income sources) needs rows.
+        rollup = (measure in ("sum", "count", "avg") and "source" not in group_by
+                  and f.min_amount is None and f.max_amount is None and not f.text)
+        if rollup:
+            table = "daily_category_totals" if expenses else "daily_income_totals"
+            value = {
+                "sum": "COALESCE(SUM(x.total), 0) / 100.0",
+                "count": "COALESCE(SUM(x.n), 0)",
+                "avg": "SUM(x.total) / 100.0 / SUM(x.n)",
+            }[measure]
+        else:
+            table = "expenses" if expenses else "incomes"
+            value = {
+                "sum": "COALESCE(SUM(x.amount_cents), 0) / 100.0",
+                "count": "COUNT(*)",
+                "avg": "AVG(x.amount_cents) / 100.0",
+                "min": "MIN(x.amount_cents) / 100.0",
+                "max": "MAX(x.amount_cents) / 100.0",
+            }[measure]
+
+        where, params = ["x.day BETWEEN ? AND ?"], [_day(start), _day(end)]
+        if f.category is not None:
+            where.append("x.category_id = ?")
+            params.append(self.cat_id(f.category))  # None (unknown name) matches nothing
+        if f.min_amount is not None:
+            where.append("x.amount_cents >= ?")
+            params.append(_cents(f.min_amount))
+        if f.max_amount is not None:
+            where.append("x.amount_cents <= ?")
+            params.append(_cents(f.max_amount))
+        if f.text:
+            escaped = f.text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            where.append(f"x.{'note' if expenses else 'source'} LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+
+        join, labels, keys = "", [], []
+        for g in group_by:
+            if g == "category":
+                join = " JOIN categories c ON c.id = x.category_id"
+                labels.append("c.name")
+                keys.append("x.category_id")
+            elif g == "source":
+                key = "COALESCE(NULLIF(TRIM(x.source), ''), 'Income')"
+                labels.append(key)
+                keys.append(key)
+            else:
+                key = _PERIODS[g].format(d="x.day", j=_JULIAN_EPOCH)
+                labels.append(f"date({_JULIAN_EPOCH} + {key})" if g in ("day", "week") else key)
+                keys.append(key)
+
+        segments = [(None, params[0], params[1])] if rollup else self._segments(params[0], params[1])
+        if len(segments) > 1:
+            rows = self._aggregate_segments(table, join, labels, keys, where, params, measure, segments)
+        else:
+            sql = (f"SELECT {', '.join(labels + [value])} FROM {self._schema(segments[0][0])}.{table} x{join} "
+                   f"WHERE {' AND '.join(where)}")
+            if group_by:
+                # Order by the label for categories (their name), by the key otherwise.
+                order = [lab if g == "category" else key for g, lab, key in zip(group_by, labels, keys)]
+                sql += f" GROUP BY {', '.join(keys)} ORDER BY {', '.join(order)}"
+            rows = self.conn.execute(sql, params).fetchall()
+        columns = tuple(zip(*rows)) if rows else tuple(() for _ in range(len(group_by) + 1))
+        return Aggregate(group_by, columns[:-1], columns[-1])
+
+    def _aggregate_segments(self, table: str, join: str, labels: List[str], keys: List[str], where: List[str],
+                            params: list, measure: str, segments) -> List[tuple]:
+        """aggregate() rows over the base tables of several segments.
+
+        Each segment yields a partial value and a count per group, merged
+        into the measure here. Labels identify their group as well as the
+        keys do and sort the same way (chronologically, or by category
+        name), so the result matches one query over all the rows.
+        """
+        partial, combine = {
+            "sum": ("SUM(x.amount_cents)", operator.add),
+            "count": ("0", operator.add),
+            "avg": ("SUM(x.amount_cents)", operator.add),
+            "min": ("MIN(x.amount_cents)", min),
+            "max": ("MAX(x.amount_cents)", max),
+        }[measure]
+        sql = f"SELECT {', '.join(labels + [partial, 'COUNT(*)'])} FROM $src.{table} x{join} WHERE {' AND '.join(where)}"
+        if keys:
+            sql += f" GROUP BY {', '.join(keys)}"
+        merged: dict = {}
+        for year, lo, hi in segments:
+            for *group, value, n in self.conn.execute(sql.replace("$src", self._schema(year)), [lo, hi, *params[2:]]):
+                if not n:  # no rows, and no groups: the one row of an ungrouped query
+                    continue
+                acc = merged.get(tuple(group))
+                merged[tuple(group)] = [value, n] if acc is None else [combine(acc[0], value), acc[1] + n]
+        rows = []
+        for group in sorted(merged) or ([()] if not keys else []):
+            value, n = merged.get(group, (0, 0))
+            if measure == "count":
+                value = n
+            elif measure == "avg":
+                value = value / n / 100 if n else None
+            elif n or measure == "sum":
+                value = value / 100
+            else:
+                value = None  # min or max of nothing
+            rows.append((*group, value))
+        return rows
+
+    # -- archives: closed years in their own files ----------------------------
+    def archived_years(self) -> List[ArchiveInfo]:
+        """Every archived year with its counts and totals, oldest first."""
+        return [
+            ArchiveInfo(year, file, expenses, expenses_total / 100, incomes, incomes_total / 100)
+            for year, file, expenses, expenses_total, incomes, incomes_total in self.conn.execute(
+                "SELECT year, file, expenses, expenses_total, incomes, incomes_total FROM archives ORDER BY year"
+            )
+        ]
+
+    def archive_year(self, year: int) -> ArchiveInfo:
+        """Move the expenses and incomes of a past year into a database file of their own.
+
+        The archive sits next to the main database as <name>-<year>.db and
+        brings its own search index; the year's counts and totals go into
+        the archives table, while its rollups stay here. Range methods
+        return the same results as before, attaching the archive only when
+        a range reaches into the year. Writes dated in it are refused until
+        unarchive_year().
+
+        The rows are committed to the archive first and deleted here in a
+        second transaction, which checks that nothing was added meanwhile,
+        so an interruption never loses a row. The main file reuses the
+        freed pages, or shrinks at the next VACUUM.
+        """
+        if year >= date.today().year:
+            raise ValueError(f"{year} is not over yet")
+        if year in self._archive_paths():
+            raise ValueError(f"{year} is already archived")
+        main_file = self._main_file()
+        name = f"{Path(main_file).stem}-{year}.db"
+        path = os.path.join(os.path.dirname(main_file), name)
+        for leftover in (path, path + "-journal"):  # of an interrupted attempt
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        lo, hi = _day(date(year, 1, 1)), _day(date(year, 12, 31))
+        schema = f"archive_{year}"
+        self._make_room()
+        self.conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+        try:
+            with self.transaction():
+                self._fill_archive(schema, lo, hi)
+            copied = self._year_totals(schema, lo, hi)
+            with self.transaction():
+                if self._year_totals("main", lo, hi) != copied:
+                    raise ValueError(f"{year} changed while being archived; try again")
+                with self._rollups_paused():
+                    self.conn.execute("DELETE FROM main.expenses WHERE day BETWEEN ? AND ?", (lo, hi))
+                    self.conn.execute("DELETE FROM main.incomes WHERE day BETWEEN ? AND ?", (lo, hi))
+                self.conn.execute(
+                    "INSERT INTO archives(year, file, expenses, expenses_total, incomes, incomes_total) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (year, name, *copied),
+                )
+        except BaseException:
+            self.conn.execute(f"DETACH DATABASE {schema}")
+            for leftover in (path, path + "-journal"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            raise
+        self._attached[year] = schema
+        self._archives = None
+        expenses, expenses_total, incomes, incomes_total = copied
+        return ArchiveInfo(year, name, expenses, expenses_total / 100, incomes, incomes_total / 100)
+
+    def unarchive_year(self, year: int) -> None:
+        """Move an archived year back into the main database and delete its archive file."""
+        path = self._archive_paths().get(year)
+        if path is None:
+            raise ValueError(f"{year} is not archived")
+        schema = self._schema(year)
+        with self.transaction():
+            with self._rollups_paused():
+                self.conn.execute(
+                    f"INSERT INTO main.expenses(id, category_id, amount_cents, note, day) "
+                    f"SELECT id, category_id, amount_cents, note, day FROM {schema}.expenses"
+                )
+                self.conn.execute(
+                    f"INSERT INTO main.incomes(id, amount_cents, source, day) "
+                    f"SELECT id, amount_cents, source, day FROM {schema}.incomes"
+                )
+            self.conn.execute("DELETE FROM archives WHERE year = ?", (year,))
+        self._detach(year)
+        os.remove(path)
+        self._archives = None
+
+    def _fill_archive(self, schema: str, lo: int, hi: int) -> None:
+        """Create the tables of a new archive and copy days lo..hi into them."""
+        c = self.conn
+        c.execute(
+            f"""
+            CREATE TABLE {schema}.expenses (
+                id INTEGER PRIMARY KEY,
+                category_id INTEGER NOT NULL,
+                amount_cents INTEGER NOT NULL,
+                note TEXT,
+                day INTEGER NOT NULL
+            ) STRICT
+            """
+        )
+        c.execute(
+            f"""
+            CREATE TABLE {schema}.incomes (
+                id INTEGER PRIMARY KEY,
+                amount_cents INTEGER NOT NULL,
+                source TEXT,
+                day INTEGER NOT NULL
+            ) STRICT
             """
-            SELECT id, date, amount, COALESCE(source, '')
-            FROM incomes
-            WHERE date(date) BETWEEN date(?) AND date(?)
-            ORDER BY date(date) DESC, id DESC
+        )
+        c.execute(
+            f"INSERT INTO {schema}.expenses SELECT id, category_id, amount_cents, note, day "
+            f"FROM main.expenses WHERE day BETWEEN ? AND ? ORDER BY id",
+            (lo, hi),
+        )
+        c.execute(
+            f"INSERT INTO {schema}.incomes SELECT id, amount_cents, source, day "
+            f"FROM main.incomes WHERE day BETWEEN ? AND ? ORDER BY id",
+            (lo, hi),
+        )
+        # The indexes of main (see _upgrade_to_v4), so queries plan the same.
+        c.execute(f"CREATE INDEX {schema}.idx_expenses_day ON expenses(day)")
+        c.execute(f"CREATE INDEX {schema}.idx_expenses_category_day ON expenses(category_id, day)")
+        c.execute(f"CREATE INDEX {schema}.idx_expenses_dedup ON expenses(day, amount_cents, note)")
+        c.execute(f"CREATE INDEX {schema}.idx_incomes_day ON incomes(day)")
+        # The categories stay in main, so this index stores the category
+        # names itself (see _reindex_archived_category).
+        c.execute(f"CREATE VIRTUAL TABLE {schema}.expenses_fts USING fts5(note, category, {_FTS_OPTIONS})")
+        c.execute(
+            f"CREATE VIRTUAL TABLE {schema}.incomes_fts USING fts5("
+            f"source, content = 'incomes', content_rowid = 'id', {_FTS_OPTIONS})"
+        )
+        c.execute(
+            f"INSERT INTO {schema}.expenses_fts(rowid, note, category) "
+            f"SELECT e.id, e.note, c.name FROM {schema}.expenses e LEFT JOIN main.categories c ON c.id = e.category_id"
+        )
+        c.execute(f"INSERT INTO {schema}.incomes_fts(incomes_fts) VALUES ('rebuild')")
+
+    def _year_totals(self, schema: str, lo: int, hi: int) -> Tuple[int, int, int, int]:
+        """(expenses, their cents, incomes, their cents) of days lo..hi in schema."""
+        return self.conn.execute(
+            f"""
+            SELECT (SELECT COUNT(*) FROM {schema}.expenses WHERE day BETWEEN ?1 AND ?2),
+                   (SELECT COALESCE(SUM(amount_cents), 0) FROM {schema}.expenses WHERE day BETWEEN ?1 AND ?2),
+                   (SELECT COUNT(*) FROM {schema}.incomes WHERE day BETWEEN ?1 AND ?2),
+                   (SELECT COALESCE(SUM(amount_cents), 0) FROM {schema}.incomes WHERE day BETWEEN ?1 AND ?2)
             """,
-            (start.isoformat(), end.isoformat()),
+            (lo, hi),
+        ).fetchone()
+
+    @contextmanager
+    def _rollups_paused(self):
+        """Drop the rollup triggers for the block and recreate them after, in the caller's transaction.
+
+        Rows moving between main and an archive leave the totals as they
+        are; the search index triggers still fire.
+        """
+        triggers = self.conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name GLOB '*_rollup'"
         ).fetchall()
+        for name, _sql in triggers:
+            self.conn.execute(f"DROP TRIGGER {name}")
+        yield
+        for _name, sql in triggers:
+            self.conn.execute(sql)
+
+    def _reindex_archived_category(self, cid: int, name: str) -> None:
+        """Store a renamed category in the archives' search indexes."""
+        for year in self._archive_paths():
+            schema = self._schema(year)
+            self.conn.execute(
+                f"UPDATE {schema}.expenses_fts SET category = ? "
+                f"WHERE rowid IN (SELECT id FROM {schema}.expenses WHERE category_id = ?)",
+                (name, cid),
+            )
+
+    def _main_file(self) -> str:
+        return next(file for (_seq, name, file) in self.conn.execute("PRAGMA database_list") if name == "main")
+
+    def _archive_paths(self) -> Dict[int, str]:
+        """year -> archive file of every archived year."""
+        self.data_version()  # drops the map if another connection committed
+        if self._archives is None:
+            folder = os.path.dirname(self._main_file())
+            self._archives = {
+                year: os.path.join(folder, file) for year, file in self.conn.execute("SELECT year, file FROM archives")
+            }
+            for year in [y for y in self._attached if y not in self._archives]:
+                self._detach(year)
+        return self._archives
+
+    def _segments(self, lo: int, hi: int) -> List[Tuple[Optional[int], int, int]]:
+        """Where the rows of days lo..hi live: (archived year, or None for main, lo, hi) in date order.
+
+        The main database holds no rows of archived years, so each piece
+        is read from exactly one place. With nothing archived in range this
+        is [(None, lo, hi)] and the read never touches an archive.
+        """
+        segments, day = [], lo
+        for year in sorted(self._archive_paths()):
+            first, last = _day(date(year, 1, 1)), _day(date(year, 12, 31))
+            if last < day or first > hi:
+                continue
+            if day < first:
+                segments.append((None, day, first - 1))
+            segments.append((year, max(day, first), min(hi, last)))
+            day = last + 1
+        if day <= hi or not segments:
+            segments.append((None, day, hi))
+        return segments
+
+    def _schema(self, year: Optional[int]) -> str:
+        """Schema of a segment: main, or the year's archive, attached on first use."""
+        if year is None:
+            return "main"
+        schema = f"archive_{year}"
+        if year in self._attached:
+            self._attached.move_to_end(year)
+            return schema
+        path = self._archive_paths()[year]
+        if not os.path.exists(path):  # ATTACH would quietly create an empty one
+            raise FileNotFoundError(f"Archive of {year} not found: {path}")
+        self._make_room()
+        self.conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+        self._attached[year] = schema
+        return schema
+
+    def _make_room(self) -> None:
+        """Detach the least recently used archives until another one may be attached."""
+        for year in list(self._attached):
+            if len(self._attached) < ARCHIVES_ATTACHED:
+                break
+            self._detach(year)
+
+    def _detach(self, year: int) -> None:
+        try:
+            self.conn.execute(f"DETACH DATABASE archive_{year}")
+        except sqlite3.OperationalError:  # still being read, or written in the open transaction
+            return
+        del self._attached[year]
+
+    def _read(self, sql: Callable[[str], str], start: date, end: date, params: Optional[dict] = None,
+              newest_first: bool = True, limit: Optional[int] = None) -> list:
+        """Rows of sql(schema) over every segment of start..end, concatenated in date order.
+
+        Each run binds :lo and :hi to the segment's days, and :limit to the
+        rows still missing; once limit rows are in, later segments are skipped.
+        """
+        segments = self._segments(_day(start), _day(end))
+        if newest_first:
+            segments.reverse()
+        rows: list = []
+        for year, lo, hi in segments:
+            bound = {**(params or {}), "lo": lo, "hi": hi}
+            if limit is not None:
+                bound["limit"] = limit - len(rows)
+            rows += self.conn.execute(sql(self._schema(year)), bound).fetchall()
+            if limit is not None and len(rows) >= limit:
+                break
+        return rows
+
+    def _check_open(self, *days: int) -> None:
+        """Refuse writes dated in an archived year."""
+        archives = self._archive_paths()
+        if archives:
+            for year in {_year(d) for d in days}:
+                if year in archives:
+                    raise ValueError(f"{year} is archived; unarchive it to change its entries")
+
+    def _check_not_archived(self, table: str, row_id: int) -> None:
+        """Refuse to change an expense or income that lives in an archive."""
+        archives = self._archive_paths()
+        if not archives or self.conn.execute(f"SELECT 1 FROM {table} WHERE id = ?", (row_id,)).fetchone():
+            return
+        for year in sorted(archives, reverse=True):
+            if self.conn.execute(f"SELECT 1 FROM {self._schema(year)}.{table} WHERE id = ?", (row_id,)).fetchone():
+                raise ValueError(f"{year} is archived; unarchive it to change its entries")
+
+    # -- in-memory range totals (see totals_index.py) -----------------------
+    def enable_totals_index(self) -> TotalsIndex:
+        """Answer the range totals from an in-memory Fenwick index instead of SQLite.
+
+        Covers total_expenses, total_incomes, sum_by_category and
+        dashboard_snapshot. Built now from the rollups and then updated by
+        this connection's add_*/update_*/delete_* calls; rebuilt on the next
+        read after a rollback, an import or a commit by another connection.
+        """
+        self._totals_enabled = True
+        self._totals = None
+        return self.totals_index()
+
+    def disable_totals_index(self) -> None:
+        self._totals_enabled = False
+        self._totals = None
+
+    def totals_index(self) -> Optional[TotalsIndex]:
+        """The index, current as of now, or None when it is disabled."""
+        if not self._totals_enabled:
+            return None
+        self.data_version()  # drops the index if another connection committed
+        if self._totals is None:
+            self._totals = TotalsIndex.from_rollups(self.conn, _day(date.today()))
+            # The category names it is listed under may be just as stale.
+            self._cat_by_name = None
+        return self._totals
 
-    # -- totals -----------------------------------------------------------
+    def verify_totals_index(self, ranges: Optional[Iterable[Tuple[date, date]]] = None) -> List[str]:
+        """Compare the index against SUMs over the base tables; returns the mismatches.
+
+        ranges defaults to the whole index window plus each calendar year
+        in it. An empty list means the index agrees with SQLite.
+        """
+        index = self.totals_index()
+        if index is None:
+            return ["totals index is disabled"]
+        if ranges is None:
+            first = date.fromordinal(index.first_day + _EPOCH)
+            last = date.fromordinal(index.first_day + len(index.expenses) - 1 + _EPOCH)
+            ranges = [(first, last)] + [
+                (date(y, 1, 1), date(y, 12, 31)) for y in range(first.year, last.year + 1)
+            ]
+        problems = []
+        for start, end in ranges:
+            lo, hi = _day(start), _day(end)
+            by_category: dict = {}
+            incomes = 0
+            for year, seg_lo, seg_hi in self._segments(lo, hi):
+                src = self._schema(year)
+                for cid, cents in self.conn.execute(
+                    f"SELECT category_id, SUM(amount_cents) FROM {src}.expenses WHERE day BETWEEN ? AND ? "
+                    f"GROUP BY category_id",
+                    (seg_lo, seg_hi),
+                ):
+                    by_category[cid] = by_category.get(cid, 0) + cents
+                incomes += self.conn.execute(
+                    f"SELECT COALESCE(SUM(amount_cents), 0) FROM {src}.incomes WHERE day BETWEEN ? AND ?",
+                    (seg_lo, seg_hi),
+                ).fetchone()[0]
+            checks = [("expenses", sum(by_category.values()), index.expenses_total(lo, hi)),
+                      ("incomes", incomes, index.incomes_total(lo, hi))]
+            checks += [(f"category {cid}", by_category.get(cid, 0), index.category_total(cid, lo, hi))
+                       for cid in sorted(set(by_category) | set(index.categories))]
+            problems += [f"{start}..{end} {what}: SQL {want} cents, index {got}"
+                         for what, want, got in checks if want != got]
+        return problems
+
+    def _tracked_row(self, sql: str, key: int) -> Optional[tuple]:
+        """The row a write is about to change, if the index or a listener needs its old values."""
+        if self._totals is None and not self._listeners:
+            return None
+        return self.conn.execute(sql, (key,)).fetchone()
+
+    def _track_expense(self, cid: int, day: int, cents: int) -> None:
+        if self._totals is not None and not self._totals.add_expense(cid, day, cents):
+            self._totals = None  # outside the window; rebuilt on next read
+
+    def _track_income(self, day: int, cents: int) -> None:
+        if self._totals is not None and not self._totals.add_income(day, cents):
+            self._totals = None
+
+    def _indexed_categories(self, index: TotalsIndex, lo: int, hi: int) -> List[Tuple[str, float]]:
+        """(name, total) per category from the index, ordered by name like the SQL versions."""
+        return [(name, index.category_total(cid, lo, hi) / 100) for name, cid in sorted(self._categories().items())]
+
+    # -- totals (read from the daily rollups, see _upgrade_to_v2) ---------
+    @_cached
     def total_expenses(self, start: date, end: date) -> float:
+        index = self.totals_index()
+        if index is not None:
+            return index.expenses_total(_day(start), _day(end)) / 100
         row = self.conn.execute(
-            "SELECT COALESCE(SUM(amount),0) FROM expenses WHERE date(date) BETWEEN date(?) AND date(?)",
-            (start.isoformat(), end.isoformat()),
+            "SELECT COALESCE(SUM(total),0) FROM daily_category_totals WHERE day BETWEEN ? AND ?",
+            (_day(start), _day(end)),
         ).fetchone()
-        return float(row[0] or 0)
+        return (row[0] or 0) / 100
 
+    @_cached
     def total_incomes(self, start: date, end: date) -> float:
+        index = self.totals_index()
+        if index is not None:
+            return index.incomes_total(_day(start), _day(end)) / 100
         row = self.conn.execute(
-            "SELECT COALESCE(SUM(amount),0) FROM incomes WHERE date(date) BETWEEN date(?) AND date(?)",
-            (start.isoformat(), end.isoformat()),
+            "SELECT COALESCE(SUM(total),0) FROM daily_income_totals WHERE day BETWEEN ? AND ?",
+            (_day(start), _day(end)),
         ).fetchone()
-        return float(row[0] or 0)
+        return (row[0] or 0) / 100
+
+    @_cached
+    def expenses_summary(self, start: date, end: date, category_name: Optional[str] = None) -> Tuple[int, float]:
+        """(count, total) of expenses in range, optionally for one category."""
+        if category_name is None:
+            row = self.conn.execute(
+                "SELECT COALESCE(SUM(n),0), COALESCE(SUM(total),0) FROM daily_category_totals WHERE day BETWEEN ? AND ?",
+                (_day(start), _day(end)),
+            ).fetchone()
+        else:
+            cid = self.cat_id(category_name)
+            if cid is None:
+                return 0, 0.0
+            row = self.conn.execute(
+                """
+                SELECT COALESCE(SUM(n),0), COALESCE(SUM(total),0)
+                FROM daily_category_totals
+                WHERE category_id = ? AND day BETWEEN ? AND ?
+                """,
+                (cid, _day(start), _day(end)),
+            ).fetchone()
+        return int(row[0]), (row[1] or 0) / 100
+
+    @_cached
+    def incomes_summary(self, start: date, end: date) -> Tuple[int, float]:
+        """(count, total) of incomes in range."""
+        row = self.conn.execute(
+            "SELECT COALESCE(SUM(n),0), COALESCE(SUM(total),0) FROM daily_income_totals WHERE day BETWEEN ? AND ?",
+            (_day(start), _day(end)),
+        ).fetchone()
+        return int(row[0]), (row[1] or 0) / 100
+
+    @_cached
+    def dashboard_snapshot(self, start: date, end: date) -> DashboardSnapshot:
+        """Totals and per-category sums for the range from one consistent read.
+
+        A single statement is a single read transaction, so a concurrent writer
+        can never leave the totals and the category cards disagreeing. The
+        first row carries the two totals; the rest are the categories. With
+        the totals index enabled the snapshot is read from it instead.
+        """
+        index = self.totals_index()
+        if index is not None:
+            lo, hi = _day(start), _day(end)
+            return DashboardSnapshot(start, end, index.incomes_total(lo, hi) / 100,
+                                     index.expenses_total(lo, hi) / 100,
+                                     tuple(self._indexed_categories(index, lo, hi)))
+        rows = self.conn.execute(
+            """
+            WITH t AS MATERIALIZED (
+                SELECT category_id, SUM(total) AS total
+                FROM daily_category_totals
+                WHERE day BETWEEN ?1 AND ?2
+                GROUP BY category_id
+            )
+            SELECT 0, NULL,
+                (SELECT COALESCE(SUM(total), 0) FROM daily_income_totals WHERE day BETWEEN ?1 AND ?2) / 100.0,
+                (SELECT COALESCE(SUM(total), 0) FROM t) / 100.0
+            UNION ALL
+            SELECT 1, c.name, COALESCE(t.total, 0) / 100.0, NULL
+            FROM categories c
+            LEFT JOIN t ON t.category_id = c.id
+            ORDER BY 1, 2
+            """,
+            (_day(start), _day(end)),
+        ).fetchall()
+        _kind, _name, total_inc, total_exp = rows[0]
+        categories = tuple((name, total) for (_kind, name, total, _none) in rows[1:])
+        return DashboardSnapshot(start, end, float(total_inc or 0), float(total_exp or 0), categories)
@@ -1,12 +1,104 @@
-from typing import List, Optional
+from typing import Callable, List, Optional, Tuple
 from datetime import date
+from pathlib import Path
 from PySide6.QtWidgets import (
     QDialog, QFormLayout, QDialogButtonBox, QDateEdit, QLineEdit, QComboBox, QMessageBox,
-    QVBoxLayout, QLabel, QTableWidget, QTableWidgetItem, QHBoxLayout, QPushButton
+    QVBoxLayout, QLabel, QTableView, QHeaderView, QHBoxLayout, QPushButton,
+    QCheckBox, QFileDialog, QProgressDialog, QTableWidget, QTableWidgetItem,
+    QAbstractItemDelegate, QStyledItemDelegate, QPlainTextEdit
 )
-from PySide6.QtCore import QDate, Qt
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
+from PySide6.QtGui import QKeySequence, QShortcut
+from PySide6.QtCore import QDate, QObject, Qt, QTimer, Signal
+
+from db import EXPENSE_CHANGES, INCOME_CHANGES, CategoryDeleted, CategoryRenamed, RowChange, TablesChanged
+from exporter import ExportCancelled, export
+from importer import ColumnMapping, read_headers
+from models import PagedTableModel
+
+
+def _paged_view(model: PagedTableModel) -> QTableView:
+    """Read-only, row-selecting view over a PagedTableModel."""
+    view = QTableView()
+    view.setModel(model)
+    view.setEditTriggers(QTableView.NoEditTriggers)
+    view.setSelectionBehavior(QTableView.SelectRows)
+    view.setSelectionMode(QTableView.SingleSelection)
+    view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+    view.horizontalHeader().setStretchLastSection(True)
+    # Size columns to the first page only; later pages and rows patched in
+    # never trigger a relayout.
+    model.rowsInserted.connect(
+        lambda _p, first, last: first == 0 and last + 1 == model.rowCount() and view.resizeColumnsToContents()
+    )
+    return view
+
+def _follow(model: PagedTableModel, change: RowChange, listed: Callable, row: Callable) -> Tuple[int, int]:
+    """Patch model for a row change: drop change.before and place change.after, each if listed(it).
+
+    Returns the (count, cents) the change adds to everything the dialog
+    lists, loaded or not, for its footer.
+    """
+    count = cents = 0
+    was = change.before is not None and listed(change.before)
+    now = change.after is not None and listed(change.after)
+    if was:
+        if not now:
+            model.remove(change.before.id)
+        count, cents = count - 1, cents - round(change.before.amount * 100)
+    if now:
+        model.upsert(row(change.after))  # in place when the row keeps its position
+        count, cents = count + 1, cents + round(change.after.amount * 100)
+    return count, cents
+
+
+def _bumped(summary: Optional[tuple], count: int, cents: int) -> Optional[tuple]:
+    """(count, total) summary moved by a _follow() delta; None while it is still loading."""
+    if summary is None:
+        return None
+    return summary[0] + count, (round(summary[1] * 100) + cents) / 100
+
+
+class _ProgressRelay(QObject):
+    """Carries progress from the worker thread to a GUI-thread dialog."""
+    progressed = Signal(int, int)
+
+
+def export_rows(parent, worker, dataset: str, start: date, end: date) -> None:
+    """Ask for a target file and stream `dataset` for the range into it."""
+    path, selected = QFileDialog.getSaveFileName(
+        parent, f"Export {dataset}", f"{dataset}_{start.isoformat()}_{end.isoformat()}.csv",
+        "CSV (*.csv);;Excel (*.xlsx);;Parquet (*.parquet)",
+    )
+    if not path:
+        return
+    if not Path(path).suffix:
+        path += "." + selected.split("*.")[-1].rstrip(")")
+    progress = QProgressDialog(f"Exporting {dataset}…", "Cancel", 0, 0, parent)
+    progress.setWindowModality(Qt.WindowModal)
+    progress.setMinimumDuration(300)
+    relay = _ProgressRelay(progress)
+    relay.progressed.connect(lambda done, total: (progress.setMaximum(max(total, 1)), progress.setValue(done)))
+    cancelled = []  # set from the GUI thread, read from the worker thread
+
+    progress.canceled.connect(lambda: cancelled.append(True))
+
+    def report(done: int, total: int) -> None:
+        if cancelled:
+            raise ExportCancelled()
+        relay.progressed.emit(done, total)
+
+    def finished(n):
+        progress.reset()
+        QMessageBox.information(parent, "Export", f"Exported {n:,} {dataset} to {path}")
+
+    def failed(exc):
+        progress.reset()
+        if not isinstance(exc, ExportCancelled):
+            QMessageBox.warning(parent, "Export", f"Export failed:\n{exc}")
+
+    worker.call(export, dataset, path, start, end, None, report, on_result=finished, on_error=failed)
+
+
 # ---------------------- Add dialogs ---------------------- #
 class IncomeDialog(QDialog):
     def __init__(self, parent=None):
@@ -83,6 +175,118 @@ class ExpenseDialog(QDialog):
         return None
 
 
+class _CategoryDelegate(QStyledItemDelegate):
+    """Editable category combo for the batch grid's Category column."""
+    def __init__(self, categories: List[str], parent=None):
+        super().__init__(parent)
+        self.categories = categories
+
+    def createEditor(self, parent, option, index):
+        combo = QComboBox(parent)
+        combo.setEditable(True)
+        combo.addItems(self.categories)
+        return combo
+
+    def setEditorData(self, editor, index):
+        editor.setCurrentText(index.data() or "")
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.currentText().strip())
+
+
+class _EntryGrid(QTableWidget):
+    """Spreadsheet-style grid: Enter commits a cell and edits the next one,
+    growing the grid at the end so a receipt can be typed without the mouse."""
+    def closeEditor(self, editor, hint):
+        if hint == QAbstractItemDelegate.SubmitModelCache:
+            if self.currentRow() == self.rowCount() - 1 and self.currentColumn() == self.columnCount() - 1:
+                self._append_row()
+            hint = QAbstractItemDelegate.EditNextItem
+        super().closeEditor(editor, hint)
+
+    def _append_row(self):
+        r = self.rowCount()
+        self.insertRow(r)
+        # New lines default to the previous line's date, like items on one receipt.
+        prev = self.item(r - 1, 0) if r else None
+        self.setItem(r, 0, QTableWidgetItem(prev.text() if prev else date.today().isoformat()))
+
+    def keyPressEvent(self, event):
+        if event.key() in (Qt.Key_Return, Qt.Key_Enter) and self.state() != QTableWidget.EditingState:
+            self.edit(self.currentIndex())
+            return
+        if event.key() == Qt.Key_Delete and event.modifiers() & Qt.ControlModifier:
+            if self.rowCount() > 1:
+                self.removeRow(self.currentRow())
+            return
+        super().keyPressEvent(event)
+
+
+class BatchEntryDialog(QDialog):
+    """Grid for typing many expenses at once; they are saved in one commit.
+
+    Enter moves to the next cell (adding a line at the end), Ctrl+Delete
+    removes a line and Ctrl+Enter saves.
+    """
+    COLUMNS = ["Date", "Category", "Amount", "Note"]
+
+    def __init__(self, categories: List[str], parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Batch Entry")
+        self.resize(640, 420)
+        lay = QVBoxLayout(self)
+        lay.addWidget(QLabel("Enter: next cell · Ctrl+Delete: remove line · Ctrl+Enter: save all"))
+
+        self.grid = _EntryGrid(0, len(self.COLUMNS))
+        self.grid.setHorizontalHeaderLabels(self.COLUMNS)
+        self.grid.horizontalHeader().setStretchLastSection(True)
+        self.grid.setItemDelegateForColumn(1, _CategoryDelegate(categories, self.grid))
+        self.grid.setEditTriggers(QTableWidget.AnyKeyPressed | QTableWidget.DoubleClicked
+                                  | QTableWidget.EditKeyPressed)
+        self.grid._append_row()
+        self.grid.setCurrentCell(0, 1)
+        lay.addWidget(self.grid)
+
+        btns = QDialogButtonBox(QDialogButtonBox.Save | QDialogButtonBox.Cancel)
+        btns.accepted.connect(self._validate)
+        btns.rejected.connect(self.reject)
+        lay.addWidget(btns)
+        for key in ("Ctrl+Return", "Ctrl+Enter"):
+            QShortcut(QKeySequence(key), self, activated=self._validate)
+        self.rows = []
+
+    def _cell(self, r: int, c: int) -> str:
+        item = self.grid.item(r, c)
+        return item.text().strip() if item else ""
+
+    def _validate(self):
+        rows = []
+        for r in range(self.grid.rowCount()):
+            dstr, cat, amt, note = (self._cell(r, c) for c in range(len(self.COLUMNS)))
+            if not (cat or amt or note):
+                continue  # blank line
+            try:
+                d = date.fromisoformat(dstr)
+                amount = float(amt)
+            except ValueError:
+                self.grid.setCurrentCell(r, 2 if dstr else 0)
+                QMessageBox.warning(self, "Invalid", f"Line {r + 1}: date must be YYYY-MM-DD and amount a number")
+                return
+            if not cat:
+                self.grid.setCurrentCell(r, 1)
+                QMessageBox.warning(self, "Invalid", f"Line {r + 1}: please enter a category")
+                return
+            rows.append((cat, amount, note, d))
+        self.rows = rows
+        self.accept()
+
+    def get(self):
+        """List of (category, amount, note, date) rows, or None if cancelled."""
+        if self.exec() == QDialog.Accepted and self.rows:
+            return self.rows
+        return None
+
+
 # ---------------- Category detail (edit/delete) ---------------- #
 class EditExpenseDialog(QDialog):
     def __init__(self, categories: List[str], init_date: date, init_category: str, init_amount: float, init_note: str, parent=None):
@@ -132,10 +336,12 @@ class EditExpenseDialog(QDialog):
 
 class CategoryExpensesDialog(QDialog):
     """Table showing expenses for a category in a period, with edit/delete."""
-    def __init__(self, db, category_name: str, start: date, end: date, parent=None):
+    def __init__(self, worker, category_name: str, start: date, end: date, parent=None):
         super().__init__(parent)
-        self.db = db
+        self.worker = worker
         self.category_name = category_name
+        self._range = (start, end)
+        self._summary = None  # (count, total), patched by _on_change
         self.setWindowTitle(f"{category_name} — Expenses")
 
         outer = QVBoxLayout(self)
@@ -158,12 +364,12 @@ class CategoryExpensesDialog(QDialog):
         self.lbl_info = QLabel("")
         outer.addWidget(self.lbl_info)
 
-        # Table: Date, Amount, Note, (hidden ID)
-        self.table = QTableWidget(0, 4)
-        self.table.setHorizontalHeaderLabels(["Date", "Amount", "Note", "ID"])
-        self.table.setColumnHidden(3, True)
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        # Rows are (id, date, amount, note); the id stays in the model only.
+        self.model = PagedTableModel(
+            worker, [("Date", 1, False), ("Amount", 2, True), ("Note", 3, False)],
+            "expenses_for_category_page", parent=self,
+        )
+        self.table = _paged_view(self.model)
         outer.addWidget(self.table)
 
         # Bottom controls
@@ -186,6 +392,8 @@ class CategoryExpensesDialog(QDialog):
         outer.addWidget(self.lbl_total)
 
         self.reload()
+        # Edits patch the loaded rows and the footer instead of reloading.
+        worker.changed.connect(self._on_change)
 
     def _current_range(self):
         s = self.start.date().toPython()
@@ -194,68 +402,83 @@ class CategoryExpensesDialog(QDialog):
             s, e = e, s
         return s, e
 
+    def done(self, result):
+        self.worker.changed.disconnect(self._on_change)
+        self.model.close()
+        self.worker.cancel(self)
+        super().done(result)
+
     def reload(self):
-        s, e = self._current_range()
-        rows = self.db.expenses_for_category(self.category_name, s, e)
-        self.table.setRowCount(0)
-        total = 0.0
-        for (exp_id, dstr, amt, note) in rows:
-            r = self.table.rowCount()
-            self.table.insertRow(r)
-            self.table.setItem(r, 0, QTableWidgetItem(dstr))
-            amt_item = QTableWidgetItem(f"{amt:.2f}")
-            amt_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            self.table.setItem(r, 1, amt_item)
-            self.table.setItem(r, 2, QTableWidgetItem(note))
-            self.table.setItem(r, 3, QTableWidgetItem(str(exp_id)))
-            total += float(amt or 0)
-
-        self.table.resizeColumnsToContents()
+        s, e = self._range = self._current_range()
+        self._summary = None
+        self.model.reset((self.category_name, s, e))
+        # Footer comes from the rollups, not from summing the loaded pages.
+        self.worker.call("expenses_summary", s, e, self.category_name,
+                         channel=self, on_result=self._show_summary)
+
+    def _show_summary(self, summary):
+        self._summary = summary
+        if summary is None:
+            return
+        count, total = summary
         self.lbl_total.setText(f"Total: {total:.2f}")
-        self.lbl_info.setText(f"{self.category_name} — {len(rows)} items")
+        self.lbl_info.setText(f"{self.category_name} — {count} items")
+
+    def _on_change(self, change):
+        if isinstance(change, EXPENSE_CHANGES):
+            s, e = self._range
+            delta = _follow(self.model, change,
+                            lambda x: x.category == self.category_name and s <= x.day <= e,
+                            lambda x: (x.id, x.day.isoformat(), x.amount, x.note))
+            self._show_summary(_bumped(self._summary, *delta))
+        elif isinstance(change, CategoryRenamed) and change.old == self.category_name:
+            self.category_name = change.new
+            self.model.args = (change.new, *self.model.args[1:])  # for the pages still to come
+            self.setWindowTitle(f"{change.new} — Expenses")
+            self._show_summary(self._summary)
+        elif (isinstance(change, CategoryDeleted) and change.name == self.category_name
+              or isinstance(change, TablesChanged) and "expenses" in change.tables):
+            self.reload()
 
-    def _selected_id(self) -> Optional[int]:
-        row = self.table.currentRow()
-        if row < 0:
-            return None
-        return int(self.table.item(row, 3).text())
+    def _selected_row(self) -> Optional[tuple]:
+        return self.model.row_at(self.table.currentIndex().row())
 
     def edit_selected(self):
-        exp_id = self._selected_id()
-        if exp_id is None:
+        row = self._selected_row()
+        if row is None:
             return
-        row = self.table.currentRow()
-        cur_date = date.fromisoformat(self.table.item(row, 0).text())
-        cur_amount = float(self.table.item(row, 1).text())
-        cur_note = self.table.item(row, 2).text() or ""
+        exp_id, dstr, cur_amount, cur_note = row
+        cur_date = date.fromisoformat(dstr)
         cur_cat = self.category_name
 
-        cats = [name for (_id, name) in self.db.all_categories()]
-        dlg = EditExpenseDialog(cats, cur_date, cur_cat, cur_amount, cur_note, self)
-        res = dlg.get()
-        if res:
-            d, new_cat, amount, note = res
-            self.db.update_expense(exp_id, new_cat, amount, note, d)
-            self.reload()
+        def edit(categories):
+            cats = [name for (_id, name) in categories]
+            dlg = EditExpenseDialog(cats, cur_date, cur_cat, cur_amount, cur_note, self)
+            res = dlg.get()
+            if res:
+                d, new_cat, amount, note = res
+                self.worker.call("update_expense", exp_id, new_cat, amount, note, d)
+
+        self.worker.call("all_categories", on_result=edit)
 
     def delete_selected(self):
-        exp_id = self._selected_id()
-        if exp_id is None:
+        row = self._selected_row()
+        if row is None:
             return
-        from PySide6.QtWidgets import QMessageBox
+        exp_id = row[0]
         if QMessageBox.question(self, "Delete", "Delete selected expense?", QMessageBox.Yes | QMessageBox.No) == QMessageBox.Yes:
-            self.db.delete_expense(exp_id)
-            self.reload()
+            self.worker.call("delete_expense", exp_id)
 
 
 # ---------------- Whole-period lists ---------------- #
 class IncomesListDialog(QDialog):
     """List of incomes in the period with Edit/Delete."""
-    def __init__(self, db, start: date, end: date, parent=None):
+    def __init__(self, worker, start: date, end: date, parent=None):
         super().__init__(parent)
-        self.db = db
+        self.worker = worker
         self.start = start
         self.end = end
+        self._summary = None  # (count, total), patched by _on_change
         self.setWindowTitle("Incomes in Period")
 
         outer = QVBoxLayout(self)
@@ -263,13 +486,13 @@ class IncomesListDialog(QDialog):
         self.lbl_info = QLabel("")
         outer.addWidget(self.lbl_info)
 
-        # Table: Date, Amount, Source, (hidden ID)
-        self.table = QTableWidget(0, 4)
-        self.table.setHorizontalHeaderLabels(["Date", "Amount", "Source", "ID"])
-        self.table.setColumnHidden(3, True)
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.table.itemDoubleClicked.connect(lambda *_: self.edit_selected())
+        # Rows are (id, date, amount, source); the id stays in the model only.
+        self.model = PagedTableModel(
+            worker, [("Date", 1, False), ("Amount", 2, True), ("Source", 3, False)],
+            "incomes_in_range_page", (start, end), parent=self,
+        )
+        self.table = _paged_view(self.model)
+        self.table.doubleClicked.connect(lambda *_: self.edit_selected())
         outer.addWidget(self.table)
 
         # Buttons
@@ -280,9 +503,12 @@ class IncomesListDialog(QDialog):
         self.btn_edit.clicked.connect(self.edit_selected)
         self.btn_delete.clicked.connect(self.delete_selected)
         self.btn_close.clicked.connect(self.reject)
+        self.btn_export = QPushButton("Export…")
+        self.btn_export.clicked.connect(lambda: export_rows(self, self.worker, "incomes", self.start, self.end))
         row.addWidget(self.btn_edit)
         row.addWidget(self.btn_delete)
         row.addStretch()
+        row.addWidget(self.btn_export)
         row.addWidget(self.btn_close)
         outer.addLayout(row)
 
@@ -292,92 +518,202 @@ class IncomesListDialog(QDialog):
         outer.addWidget(self.lbl_total)
 
         self.reload()
+        worker.changed.connect(self._on_change)
+
+    def done(self, result):
+        self.worker.changed.disconnect(self._on_change)
+        self.model.close()
+        self.worker.cancel(self)
+        super().done(result)
 
     def reload(self):
-        rows = self.db.incomes_in_range(self.start, self.end)
-        self.table.setRowCount(0)
-        total = 0.0
-        for (inc_id, dstr, amt, src) in rows:
-            r = self.table.rowCount()
-            self.table.insertRow(r)
-            self.table.setItem(r, 0, QTableWidgetItem(dstr))
-            amt_item = QTableWidgetItem(f"{amt:.2f}")
-            amt_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            self.table.setItem(r, 1, amt_item)
-            self.table.setItem(r, 2, QTableWidgetItem(src))
-            self.table.setItem(r, 3, QTableWidgetItem(str(inc_id)))
-            total += float(amt or 0)
-
-        self.table.resizeColumnsToContents()
+        self._summary = None
+        self.model.reset()
+        self.worker.call("incomes_summary", self.start, self.end,
+                         channel=self, on_result=self._show_summary)
+
+    def _show_summary(self, summary):
+        self._summary = summary
+        if summary is None:
+            return
+        count, total = summary
         self.lbl_total.setText(f"Total: {total:,.2f}")
-        self.lbl_info.setText(f"Items: {len(rows)}")
+        self.lbl_info.setText(f"Items: {count}")
+
+    def _on_change(self, change):
+        if isinstance(change, INCOME_CHANGES):
+            delta = _follow(self.model, change, lambda x: self.start <= x.day <= self.end,
+                            lambda x: (x.id, x.day.isoformat(), x.amount, x.source))
+            self._show_summary(_bumped(self._summary, *delta))
+        elif isinstance(change, TablesChanged) and "incomes" in change.tables:
+            self.reload()
 
-    def _selected_id(self):
-        row = self.table.currentRow()
-        if row < 0:
-            return None
-        return int(self.table.item(row, 3).text())
+    def _selected_row(self) -> Optional[tuple]:
+        return self.model.row_at(self.table.currentIndex().row())
 
     def edit_selected(self):
-        inc_id = self._selected_id()
-        if inc_id is None:
+        row = self._selected_row()
+        if row is None:
             return
-        r = self.table.currentRow()
-        cur_date = date.fromisoformat(self.table.item(r, 0).text())
-        cur_amount = float(self.table.item(r, 1).text())
-        cur_source = self.table.item(r, 2).text() or ""
+        inc_id, dstr, cur_amount, cur_source = row
+        cur_date = date.fromisoformat(dstr)
 
         dlg = EditIncomeDialog(cur_date, cur_amount, cur_source, self)
         res = dlg.get()
         if res:
             d, amount, source = res
-            self.db.update_income(inc_id, amount, source, d)
-            self.reload()
+            self.worker.call("update_income", inc_id, amount, source, d)
 
     def delete_selected(self):
-        inc_id = self._selected_id()
-        if inc_id is None:
+        row = self._selected_row()
+        if row is None:
             return
-        from PySide6.QtWidgets import QMessageBox
+        inc_id = row[0]
         if QMessageBox.question(self, "Delete", "Delete selected income?",
                                 QMessageBox.Yes | QMessageBox.No) == QMessageBox.Yes:
-            self.db.delete_income(inc_id)
-            self.reload()
+            self.worker.call("delete_income", inc_id)
 
 
 class ExpensesListDialog(QDialog):
     """Read-only list of ALL expenses for the given period."""
-    def __init__(self, rows: list[tuple[int, str, float, str, str]], parent=None):
+    def __init__(self, worker, start: date, end: date, parent=None):
         super().__init__(parent)
+        self.worker = worker
+        self.start = start
+        self.end = end
+        self._summary = None  # (count, total), patched by _on_change
         self.setWindowTitle("Expenses in Period")
         layout = QVBoxLayout(self)
 
-        total = sum(float(r[2] or 0) for r in rows)
-        layout.addWidget(QLabel(f"Items: {len(rows)} — Total: {total:,.2f}"))
+        self.lbl_info = QLabel("")
+        layout.addWidget(self.lbl_info)
+
+        self.model = PagedTableModel(
+            worker,
+            [("Date", 1, False), ("Amount", 2, True), ("Category", 3, False), ("Note", 4, False)],
+            "expenses_in_range_page", (start, end), parent=self,
+        )
+        layout.addWidget(_paged_view(self.model))
+
+        btns = QDialogButtonBox(QDialogButtonBox.Close)
+        btn_export = btns.addButton("Export…", QDialogButtonBox.ActionRole)
+        btn_export.clicked.connect(lambda: export_rows(self, worker, "expenses", start, end))
+        btns.rejected.connect(self.reject)
+        btns.accepted.connect(self.accept)
+        layout.addWidget(btns)
+
+        self.reload()
+        worker.changed.connect(self._on_change)
+
+    def done(self, result):
+        self.worker.changed.disconnect(self._on_change)
+        self.model.close()
+        self.worker.cancel(self)
+        super().done(result)
 
-        table = QTableWidget(0, 4)
-        table.setHorizontalHeaderLabels(["Date", "Amount", "Category", "Note"]) 
-        table.setEditTriggers(QTableWidget.NoEditTriggers)
-        table.setSelectionBehavior(QTableWidget.SelectRows)
-        layout.addWidget(table)
+    def reload(self):
+        self._summary = None
+        self.model.reset()
+        self.worker.call("expenses_summary", self.start, self.end, channel=self, on_result=self._show_summary)
+
+    def _show_summary(self, summary):
+        self._summary = summary
+        if summary is None:
+            return
+        count, total = summary
+        self.lbl_info.setText(f"Items: {count} — Total: {total:,.2f}")
+
+    def _on_change(self, change):
+        if isinstance(change, EXPENSE_CHANGES):
+            delta = _follow(self.model, change, lambda x: self.start <= x.day <= self.end,
+                            lambda x: (x.id, x.day.isoformat(), x.amount, x.category, x.note))
+            self._show_summary(_bumped(self._summary, *delta))
+        elif isinstance(change, CategoryRenamed):
+            self.model.update_rows(lambda r: r[:3] + (change.new,) + r[4:] if r[3] == change.old else r)
+        elif (isinstance(change, CategoryDeleted)
+              or isinstance(change, TablesChanged) and "expenses" in change.tables):
+            self.reload()
+
+class SearchDialog(QDialog):
+    """Full-text search over expenses and incomes, updated as you type.
+
+    Each keystroke restarts a short debounce; the query then runs on the
+    worker's channel for this dialog, so a newer query supersedes (and
+    interrupts) one still running.
+    """
+    DEBOUNCE_MS = 150
+    COLUMNS = ("Date", "Amount", "Category / Source", "Note", "Kind")
+
+    def __init__(self, worker, start: date, end: date, parent=None):
+        super().__init__(parent)
+        self.worker = worker
+        self.start = start
+        self.end = end
+        self.setWindowTitle("Search")
+        self.resize(720, 520)
+        layout = QVBoxLayout(self)
 
-        for (_id, dstr, amt, cat, note) in rows:
-            r = table.rowCount()
-            table.insertRow(r)
-            table.setItem(r, 0, QTableWidgetItem(dstr))
-            amt_item = QTableWidgetItem(f"{amt:.2f}")
-            amt_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            table.setItem(r, 1, amt_item)
-            table.setItem(r, 2, QTableWidgetItem(cat))
-            table.setItem(r, 3, QTableWidgetItem(note))
+        self.query = QLineEdit()
+        self.query.setPlaceholderText("Search notes, categories and income sources…")
+        self.query.setClearButtonEnabled(True)
+        self.in_period = QCheckBox(f"Only {start.isoformat()} – {end.isoformat()}")
+        row = QHBoxLayout()
+        row.addWidget(self.query, 1)
+        row.addWidget(self.in_period)
+        layout.addLayout(row)
 
-        table.resizeColumnsToContents()
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table, 1)
 
+        self.lbl_info = QLabel("")
+        layout.addWidget(self.lbl_info)
         btns = QDialogButtonBox(QDialogButtonBox.Close)
         btns.rejected.connect(self.reject)
-        btns.accepted.connect(self.accept)
         layout.addWidget(btns)
 
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(self.DEBOUNCE_MS)
+        self._debounce.timeout.connect(self._search)
+        self.query.textChanged.connect(self._debounce.start)
+        self.in_period.toggled.connect(self._search)
+
+    def done(self, result):
+        self._debounce.stop()
+        self.worker.cancel(self)
+        super().done(result)
+
+    def _search(self):
+        text = self.query.text().strip()
+        if not text:
+            self.worker.cancel(self)
+            self._show([])
+            return
+        rng = (self.start, self.end) if self.in_period.isChecked() else (None, None)
+        self.worker.call("search", text, *rng, channel=self, on_result=self._show)
+
+    def _show(self, rows):
+        self.table.setRowCount(len(rows))
+        for r, (kind, _id, d, amount, label, note) in enumerate(rows):
+            cells = (d, f"{amount:,.2f}", label, note, kind.capitalize())
+            for c, text in enumerate(cells):
+                item = QTableWidgetItem(text)
+                if c == 1:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(r, c, item)
+        if rows:
+            self.table.resizeColumnsToContents()
+        if not self.query.text().strip():
+            self.lbl_info.setText("")
+        else:
+            self.lbl_info.setText(f"{len(rows)} match(es)" + (", best first" if rows else ""))
+
+
 class EditIncomeDialog(QDialog):
     def __init__(self, init_date: date, init_amount: float, init_source: str, parent=None):
         super().__init__(parent)
@@ -410,65 +746,164 @@ class EditIncomeDialog(QDialog):
             return (self.date.date().toPython(), amt, self.source.text().strip())
         return None
 
-class ChartDialog(QDialog):
-    """Simple Matplotlib dialog for pie/bar charts."""
-    def __init__(self, title: str, labels: list[str], values: list[float], chart: str = "pie", parent=None):
+class ImportDialog(QDialog):
+    """Pick a CSV/XLSX bank statement and map its columns to expense fields."""
+    NONE = "(none)"
+
+    def __init__(self, parent=None):
         super().__init__(parent)
-        self.setWindowTitle(title)
+        self.setWindowTitle("Import Statement")
+        lay = QFormLayout(self)
 
-        layout = QVBoxLayout(self)
-        self.fig = Figure(figsize=(6, 4))
-        self.canvas = FigureCanvas(self.fig)
-        layout.addWidget(self.canvas)
-
-        self.ax = self.fig.add_subplot(111)
-        self._plot(chart, labels, values)
-
-    def _plot(self, chart: str, labels: list[str], values: list[float]):
-        self.ax.clear()
-        if not values or sum(values) == 0:
-            self.ax.text(0.5, 0.5, "No data in range", ha="center", va="center")
-        elif chart == "pie":
-            self.ax.pie(values, labels=labels, autopct="%1.1f%%", startangle=90)
-            self.ax.axis("equal")
-        else:  # bar
-            bars = self.ax.bar(labels, values)
-            self.ax.set_ylabel("Amount")
-            self.ax.set_xticklabels(labels, rotation=45, ha="right")
-            # optional value labels on top of bars
-            for b in bars:
-                self.ax.text(b.get_x() + b.get_width()/2, b.get_height(), f"{b.get_height():,.0f}",
-                             ha="center", va="bottom")
-        self.fig.tight_layout()
-        self.canvas.draw()
-
-class DailyExpensesChartDialog(QDialog):
-    """Stacked bar char: daily expenses per categroy in the selected period."""
-    def __init__(self, dates: list[str], series: dict[str, list[float]], parent=None):
+        file_row = QHBoxLayout()
+        self.path = QLineEdit()
+        self.path.setReadOnly(True)
+        browse = QPushButton("Browse…")
+        browse.clicked.connect(self._browse)
+        file_row.addWidget(self.path)
+        file_row.addWidget(browse)
+
+        self.col_date = QComboBox()
+        self.col_amount = QComboBox()
+        self.col_category = QComboBox()
+        self.col_note = QComboBox()
+        self.default_category = QLineEdit("Other")
+        self.date_format = QLineEdit()
+        self.date_format.setPlaceholderText("ISO (YYYY-MM-DD), or e.g. %d.%m.%Y")
+        self.negative = QCheckBox("Only negative amounts are expenses")
+
+        lay.addRow("File", file_row)
+        lay.addRow("Date column", self.col_date)
+        lay.addRow("Amount column", self.col_amount)
+        lay.addRow("Category column", self.col_category)
+        lay.addRow("Note column", self.col_note)
+        lay.addRow("Default category", self.default_category)
+        lay.addRow("Date format", self.date_format)
+        lay.addRow("", self.negative)
+
+        btns = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        btns.accepted.connect(self.accept)
+        btns.rejected.connect(self.reject)
+        lay.addRow(btns)
+
+    def _browse(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Import statement", "", "Statements (*.csv *.xlsx *.xlsm);;All files (*)"
+        )
+        if not path:
+            return
+        try:
+            headers = read_headers(path)
+        except Exception as e:
+            QMessageBox.warning(self, "Import", f"Could not read {path}:\n{e}")
+            return
+        self.path.setText(path)
+        for combo, optional in ((self.col_date, False), (self.col_amount, False),
+                                (self.col_category, True), (self.col_note, True)):
+            combo.clear()
+            if optional:
+                combo.addItem(self.NONE)
+            combo.addItems(headers)
+        # Preselect columns whose header names the field.
+        for combo, words in ((self.col_date, ("date",)), (self.col_amount, ("amount", "sum")),
+                             (self.col_category, ("category",)),
+                             (self.col_note, ("note", "description", "memo", "text"))):
+            for i, h in enumerate(headers):
+                if any(w in h.lower() for w in words):
+                    combo.setCurrentText(h)
+                    break
+
+    def get(self):
+        if self.exec() != QDialog.Accepted:
+            return None
+        if not self.path.text() or not self.col_date.currentText() or not self.col_amount.currentText():
+            QMessageBox.warning(self, "Import", "Choose a file and its date and amount columns")
+            return None
+
+        def optional(combo):
+            text = combo.currentText()
+            return None if text in ("", self.NONE) else text
+
+        mapping = ColumnMapping(
+            date=self.col_date.currentText(),
+            amount=self.col_amount.currentText(),
+            category=optional(self.col_category),
+            note=optional(self.col_note),
+            default_category=self.default_category.text().strip() or "Other",
+            date_format=self.date_format.text().strip() or None,
+            negative_expenses=self.negative.isChecked(),
+        )
+        return self.path.text(), mapping
+
+
+class TraceDialog(QDialog):
+    """Debug panel over a tracing.Tracer: per-method latency and recent slow statements.
+
+    Reads the tracer directly (it is thread-safe), never the database, and
+    refreshes itself every second while open.
+    """
+    COLUMNS = ("Method", "Calls", "Total ms", "p50 ms", "p95 ms", "p99 ms", "Max ms")
+    _KEYS = ("calls", "total_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms")
+
+    def __init__(self, tracer, parent=None):
         super().__init__(parent)
-        self.setWindowTitle("Daily Expenses by Category")
-        layout = QVBoxLayout(self)
+        self.tracer = tracer
+        self.setWindowTitle("Query Trace")
+        self.resize(760, 560)
+        outer = QVBoxLayout(self)
 
-        self.fig = Figure(figsize=(7,4))
-        self.canvas = FigureCanvas(self.fig)
-        layout.addWidget(self.canvas)
+        self.lbl_info = QLabel("")
+        outer.addWidget(self.lbl_info)
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        outer.addWidget(self.table, 2)
 
-        ax = self.fig.add_subplot(111)
+        outer.addWidget(QLabel(f"Slow statements (≥ {tracer.slow_ms:g} ms), most recent first"))
+        self.slow = QPlainTextEdit()
+        self.slow.setReadOnly(True)
+        self.slow.setLineWrapMode(QPlainTextEdit.NoWrap)
+        outer.addWidget(self.slow, 1)
 
-        if not dates or not series:
-            ax.text(0.5, 0.5, "No data in range", ha="center", va="center")
-        else:
-            x = list(range(len(dates)))
-            bottoms = [0.0] * len(dates)
-            # Plot each category stacked
-            for cat, vals in series.items():
-                ax.bar(x, vals, bottom=bottoms, label=cat)
-                bottoms = [b + v for b, v in zip(bottoms, vals)]
-            
-            ax.set_xticks(x)
-            ax.set_xticklabels(dates, rotation=45, ha="right")
-            ax.set_ylabel("Amount")
-            ax.legend(loc="upper right", fontsize=8)
-        
-        self.fig.tight_layout()
-        self.canvas.draw()
\ No newline at end of file
+        row = QHBoxLayout()
+        btn_reset = QPushButton("Reset")
+        btn_save = QPushButton("Save JSON…")
+        btn_close = QPushButton("Close")
+        btn_reset.clicked.connect(lambda: (self.tracer.reset(), self.reload()))
+        btn_save.clicked.connect(self._save)
+        btn_close.clicked.connect(self.reject)
+        row.addWidget(btn_reset)
+        row.addStretch()
+        row.addWidget(btn_save)
+        row.addWidget(btn_close)
+        outer.addLayout(row)
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.reload)
+        self._timer.start(1000)
+        self.reload()
+
+    def reload(self):
+        report = self.tracer.report()
+        self.lbl_info.setText(f"{report['statements']:,} statement(s) since {report['started']}")
+        stats = report["methods"]
+        self.table.setRowCount(len(stats))
+        for r, (name, s) in enumerate(stats.items()):
+            self.table.setItem(r, 0, QTableWidgetItem(name))
+            for c, key in enumerate(self._KEYS, start=1):
+                value = s[key]
+                item = QTableWidgetItem(f"{value:,}" if key == "calls" else f"{value:,.3f}")
+                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(r, c, item)
+        self.slow.setPlainText("\n\n".join(
+            f"{s['method']}: {s['ms']:.1f} ms\n{' '.join(s['sql'].split())}\n"
+            + "\n".join(f"  {line}" for line in s["plan"])
+            for s in reversed(report["slow"])
+        ))
+
+    def _save(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save trace", "trace.json", "JSON (*.json)")
+        if path:
+            self.tracer.dump(path)
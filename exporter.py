@@ -0,0 +1,143 @@
+"""Constant-memory export of expenses or incomes to CSV, XLSX or Parquet.
+
+Rows are streamed from Database.iter_expenses / iter_incomes one fetchmany
+batch at a time and written out immediately: CSV line by line, XLSX through
+openpyxl's write-only workbook, Parquet as one row group per batch (needs
+pyarrow, which is optional).
+
+Command line:
+    python exporter.py expenses ledger.xlsx [--start 2020-01-01] [--end 2020-12-31]
+"""
+import argparse
+import csv
+from datetime import date
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Sequence
+
+import working_copy
+from db import Database, DB_FILE
+
+COLUMNS = {
+    "expenses": ("id", "date", "amount", "category", "note"),
+    "incomes": ("id", "date", "amount", "source"),
+}
+FORMATS = ("csv", "xlsx", "parquet")
+
+# progress(rows_written, rows_expected)
+Progress = Callable[[int, int], None]
+
+
+class ExportCancelled(Exception):
+    """Raised from a progress callback to abort an export."""
+
+
+def _write_csv(path: str, header: Sequence[str], batches: Iterator[List[tuple]]) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        w = csv.writer(fh)
+        w.writerow(header)
+        for rows in batches:
+            w.writerows(rows)
+
+
+def _write_xlsx(path: str, header: Sequence[str], batches: Iterator[List[tuple]], title: str) -> None:
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    ws.append(list(header))
+    for rows in batches:
+        for row in rows:
+            ws.append(row)
+    wb.save(path)
+
+
+def _write_parquet(path: str, header: Sequence[str], batches: Iterator[List[tuple]]) -> None:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)") from None
+    types = {"id": pa.int64(), "amount": pa.float64()}
+    schema = pa.schema([(name, types.get(name, pa.string())) for name in header])
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in batches:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)], schema=schema,
+            ))
+
+
+def export(db: Database, dataset: str, path: str, start: Optional[date] = None, end: Optional[date] = None,
+           fmt: Optional[str] = None, progress: Optional[Progress] = None) -> int:
+    """Write `dataset` ("expenses" or "incomes") for the range to path.
+
+    A missing start/end means the whole ledger. The format is taken from the
+    file suffix unless given. Returns the number of rows written.
+    """
+    if dataset not in COLUMNS:
+        raise ValueError(f"Unknown dataset '{dataset}'")
+    fmt = (fmt or Path(path).suffix.lstrip(".")).lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}' (use one of {', '.join(FORMATS)})")
+    start = start or date.min
+    end = end or date.max
+
+    if dataset == "expenses":
+        expected = db.expenses_summary(start, end)[0]
+        source = db.iter_expenses(start, end)
+    else:
+        expected = db.incomes_summary(start, end)[0]
+        source = db.iter_incomes(start, end)
+
+    written = 0
+
+    def batches() -> Iterator[List[tuple]]:
+        nonlocal written
+        for rows in source:
+            yield rows
+            written += len(rows)
+            if progress is not None:
+                progress(written, expected)
+
+    header = COLUMNS[dataset]
+    try:
+        if fmt == "csv":
+            _write_csv(path, header, batches())
+        elif fmt == "xlsx":
+            _write_xlsx(path, header, batches(), dataset.capitalize())
+        else:
+            _write_parquet(path, header, batches())
+    except BaseException:
+        # Don't leave a truncated file behind a failed or cancelled export.
+        Path(path).unlink(missing_ok=True)
+        raise
+    return written
+
+
+def add_arguments(ap: argparse.ArgumentParser) -> None:
+    """Dataset, target file and range options, shared with `python -m cli export`."""
+    ap.add_argument("dataset", choices=sorted(COLUMNS))
+    ap.add_argument("file", help="output path; .csv, .xlsx or .parquet")
+    ap.add_argument("--start", type=date.fromisoformat, help="YYYY-MM-DD (default: first entry)")
+    ap.add_argument("--end", type=date.fromisoformat, help="YYYY-MM-DD (default: last entry)")
+    ap.add_argument("--format", choices=FORMATS, help="override the format implied by the suffix")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Export expenses or incomes without loading them into memory.")
+    add_arguments(ap)
+    ap.add_argument("--db", default=working_copy.resolve(DB_FILE))
+    args = ap.parse_args(argv)
+
+    def report(done: int, total: int) -> None:
+        print(f"\r{done:,}/{total:,} rows", end="", flush=True)
+
+    db = Database(args.db)
+    try:
+        n = export(db, args.dataset, args.file, args.start, args.end, args.format, report)
+    finally:
+        db.conn.close()
+    print(f"\rExported {n:,} {args.dataset} to {args.file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Streaming import of bank statement exports (CSV or XLSX) as expenses.
+
+Files are read row by row (csv module / openpyxl read-only mode) and handed
+to Database.import_expenses in fixed-size chunks, so memory stays bounded
+however long the statement is.
+
+Command line:
+    python importer.py statement.csv --date Date --amount Amount --note Description
+"""
+import argparse
+import csv
+import re
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+import working_copy
+from db import Database, DB_FILE
+
+CHUNK_SIZE = 5000
+
+Row = Tuple[date, str, float, str]
+
+
+@dataclass(frozen=True)
+class ColumnMapping:
+    """Which source columns feed which expense fields."""
+    date: str
+    amount: str
+    category: Optional[str] = None
+    note: Optional[str] = None
+    default_category: str = "Other"
+    date_format: Optional[str] = None  # strptime format; ISO dates when None
+    # Bank exports often list debits as negative numbers next to positive
+    # credits. When set, only negative rows are imported (as positive amounts).
+    negative_expenses: bool = False
+
+
+@dataclass
+class ImportResult:
+    inserted: int = 0
+    duplicates: int = 0
+    skipped: int = 0  # rows whose date or amount could not be parsed
+
+
+def _is_xlsx(path: str) -> bool:
+    return Path(path).suffix.lower() in (".xlsx", ".xlsm")
+
+
+def _iter_raw(path: str, sheet: Optional[str] = None) -> Iterator[List[Any]]:
+    """Yield the header row and then every data row as a list of cells."""
+    if _is_xlsx(path):
+        from openpyxl import load_workbook
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            ws = wb[sheet] if sheet else wb.active
+            for row in ws.iter_rows(values_only=True):
+                yield list(row)
+        finally:
+            wb.close()
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as fh:
+            sample = fh.read(4096)
+            fh.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+            except csv.Error:
+                dialect = csv.excel
+            yield from csv.reader(fh, dialect)
+
+
+def read_headers(path: str, sheet: Optional[str] = None) -> List[str]:
+    """Column names of the file, for the mapping step."""
+    for header in _iter_raw(path, sheet):
+        return [str(h).strip() if h is not None else "" for h in header]
+    return []
+
+
+def _parse_date(value: Any, fmt: Optional[str]) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value).strip()
+    if fmt:
+        return datetime.strptime(text, fmt).date()
+    return date.fromisoformat(text[:10])
+
+
+_NOT_NUMERIC = re.compile(r"[^\d,.\-+]")
+
+
+def _parse_amount(value: Any) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = _NOT_NUMERIC.sub("", str(value))
+    if "," in text and "." in text:
+        # "1.234,56" or "1,234.56": whichever separator comes last is decimal.
+        if text.rfind(",") > text.rfind("."):
+            text = text.replace(".", "").replace(",", ".")
+        else:
+            text = text.replace(",", "")
+    else:
+        text = text.replace(",", ".")
+    return float(text)
+
+
+def iter_chunks(path: str, mapping: ColumnMapping, result: ImportResult,
+                chunk_size: int = CHUNK_SIZE, sheet: Optional[str] = None) -> Iterator[List[Row]]:
+    """Parse the file into lists of (date, category, amount, note) rows."""
+    rows = _iter_raw(path, sheet)
+    header = [str(h).strip() if h is not None else "" for h in next(rows, [])]
+
+    def col(name: Optional[str]) -> Optional[int]:
+        if name is None:
+            return None
+        try:
+            return header.index(name)
+        except ValueError:
+            raise ValueError(f"Column '{name}' not found in {Path(path).name}") from None
+
+    i_date, i_amount = col(mapping.date), col(mapping.amount)
+    i_cat, i_note = col(mapping.category), col(mapping.note)
+
+    # Statements repeat the same few hundred dates; strptime is the single
+    # most expensive step, so parse each distinct cell value once.
+    dates: dict = {}
+    chunk: List[Row] = []
+    for raw in rows:
+        try:
+            cell = raw[i_date]
+            d = dates.get(cell)
+            if d is None:
+                d = dates[cell] = _parse_date(cell, mapping.date_format)
+            amount = _parse_amount(raw[i_amount])
+        except (ValueError, TypeError, IndexError):
+            result.skipped += 1
+            continue
+        if mapping.negative_expenses:
+            if amount >= 0:
+                continue
+        amount = abs(amount)
+        cat = raw[i_cat] if i_cat is not None and i_cat < len(raw) else None
+        cat = str(cat).strip() if cat not in (None, "") else mapping.default_category
+        note = raw[i_note] if i_note is not None and i_note < len(raw) else None
+        note = str(note).strip() if note is not None else ""
+        chunk.append((d, cat, amount, note))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_file(db: Database, path: str, mapping: ColumnMapping, chunk_size: int = CHUNK_SIZE,
+                sheet: Optional[str] = None,
+                progress: Optional[Callable[[int], None]] = None) -> ImportResult:
+    """Import a statement file into db in one transaction."""
+    result = ImportResult()
+
+    def chunks():
+        done = 0
+        for chunk in iter_chunks(path, mapping, result, chunk_size, sheet):
+            yield chunk
+            done += len(chunk)
+            if progress is not None:
+                progress(done)
+
+    result.inserted, result.duplicates = db.import_expenses(chunks())
+    return result
+
+
+def add_arguments(ap: argparse.ArgumentParser) -> None:
+    """The statement file and column mapping options, shared with `python -m cli import`."""
+    ap.add_argument("file")
+    ap.add_argument("--date", required=True, help="date column name")
+    ap.add_argument("--amount", required=True, help="amount column name")
+    ap.add_argument("--category", help="category column name")
+    ap.add_argument("--note", help="note/description column name")
+    ap.add_argument("--default-category", default="Other")
+    ap.add_argument("--date-format", help="strptime format, e.g. %%d.%%m.%%Y (default: ISO)")
+    ap.add_argument("--negative-expenses", action="store_true",
+                    help="only import negative amounts (debits) as expenses")
+    ap.add_argument("--sheet", help="XLSX worksheet (default: first)")
+    ap.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+
+def mapping_from(args: argparse.Namespace) -> ColumnMapping:
+    return ColumnMapping(
+        date=args.date, amount=args.amount, category=args.category, note=args.note,
+        default_category=args.default_category, date_format=args.date_format,
+        negative_expenses=args.negative_expenses,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Import a CSV/XLSX bank statement as expenses.")
+    add_arguments(ap)
+    ap.add_argument("--db", default=working_copy.resolve(DB_FILE))
+    args = ap.parse_args(argv)
+
+    db = Database(args.db)
+    try:
+        res = import_file(db, args.file, mapping_from(args), args.chunk_size, args.sheet)
+    finally:
+        db.conn.close()
+    print(f"Imported {res.inserted} expense(s), skipped {res.duplicates} duplicate(s) "
+          f"and {res.skipped} unreadable row(s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,25 @@
+import threading
 from datetime import date, timedelta
 
-from PySide6.QtCore import Qt, QDate
-from PySide6.QtGui import QFont, QIcon
+from PySide6.QtCore import Qt, QDate, QTimer, Signal
+from PySide6.QtGui import QFont, QIcon, QKeySequence, QShortcut
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
     QPushButton, QDateEdit, QGridLayout, QInputDialog, QMessageBox, QScrollArea,
     QComboBox
 )
 
-from db import Database
+import working_copy
+from db import DB_FILE, CategoryRenamed, DashboardSnapshot
 from dialogs import (
     IncomeDialog, ExpenseDialog,
-    CategoryExpensesDialog, IncomesListDialog, ExpensesListDialog, ChartDialog,
-    DailyExpensesChartDialog
+    CategoryExpensesDialog, IncomesListDialog, ExpensesListDialog,
+    ImportDialog, BatchEntryDialog, SearchDialog, TraceDialog
 )
-from widgets import CategoryCard, StatBox
+from importer import import_file
+from tracing import process_tracer
+from widgets import CATEGORY_CARD_STYLE, CategoryCard, StatBox
+from worker import QueryWorker
 from pathlib import Path
 import sys
 
@@ -25,14 +30,56 @@ def resource_path(relative: str) -> str:
 
 ICON_FILE = resource_path("money_icon.png")
 
+# Serve range totals from the worker's in-memory index (Database.enable_totals_index).
+TOTALS_INDEX = True
+
+# Parts of the dashboard a refresh can redo: the income/expense/balance
+# boxes, the category cards and the chart dialog, if one is open.
+STATS, CARDS, CHART = "stats", "cards", "chart"
+ALL_PARTS = frozenset((STATS, CARDS, CHART))
+
+
+def _rows_if_changed(db, known_version, job, *args):
+    """Worker job: (data version, db.job(*args)), skipping the query (None) if known_version is current."""
+    version = db.data_version()
+    return version, (None if version == known_version else getattr(db, job)(*args))
+
+
 class Dashboard(QMainWindow):
+    # Emitted once a refresh has been rendered (or found nothing to redo).
+    refreshed = Signal()
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Expense Manager — Dashboard")
         self.resize(720, 900)
         self.setWindowIcon(QIcon(ICON_FILE))
 
-        self.db = Database()
+        # The app works on a local copy of DB_FILE, which self.backup prepares
+        # in the background and pushes back periodically and on close (see
+        # working_copy). The worker opens it once ready, off the GUI thread.
+        path, self.backup = working_copy.start(DB_FILE)
+        # All SQLite access happens on the worker's thread; results come back
+        # to the callbacks below.
+        self.worker = QueryWorker(path, parent=self)
+        self.worker.error.connect(lambda msg: QMessageBox.warning(self, "Error", msg))
+        # Writes, from here or from a dialog, patch the dashboard as they commit.
+        self.worker.changed.connect(self._on_change)
+        self._snapshot = None
+        self._snapshot_version = None  # Database.data_version() the snapshot was read at
+        self._painted = False
+        self._totals_requested = not TOTALS_INDEX
+        self._charts = None  # charts.ChartCache, created with the first chart
+        self._chart_shown = None  # (key, group_by, draw) of the last chart opened
+
+        # Refresh requests only mark parts dirty; a zero-delay timer folds
+        # every request made during one event-loop pass into one update.
+        self._dirty = set()
+        self._inflight = set()  # parts waiting for the snapshot on the "dashboard" channel
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(0)
+        self._refresh_timer.timeout.connect(self._flush_refresh)
         self._seed_defaults()
 
         root = QWidget()
@@ -51,6 +98,25 @@ class Dashboard(QMainWindow):
             b.setStyleSheet("border:1px solid #999;border-radius:10px;padding:4px 10px;")
             period_row.addWidget(b)
         period_row.addStretch()
+        self.btn_search = QPushButton("Search…")
+        self.btn_batch = QPushButton("Batch Entry")
+        self.btn_import = QPushButton("Import…")
+        for b in (self.btn_search, self.btn_batch, self.btn_import):
+            b.setFixedHeight(36)
+            b.setStyleSheet("border:1px solid #999;border-radius:10px;padding:4px 10px;")
+            period_row.addWidget(b)
+        self.btn_search.clicked.connect(self.search)
+        QShortcut(QKeySequence.Find, self, activated=self.search)
+        self.btn_batch.clicked.connect(self.batch_entry)
+        self.btn_import.clicked.connect(self.import_statement)
+        # Only with EXPENSES_TRACE set; the worker's Database reports to the same tracer.
+        self.tracer = process_tracer()
+        if self.tracer is not None:
+            self.btn_trace = QPushButton("Trace")
+            self.btn_trace.setFixedHeight(36)
+            self.btn_trace.setStyleSheet("border:1px solid #999;border-radius:10px;padding:4px 10px;")
+            self.btn_trace.clicked.connect(lambda: TraceDialog(self.tracer, self).exec())
+            period_row.addWidget(self.btn_trace)
         outer.addLayout(period_row)
 
         # ---- Date range ----
@@ -119,6 +185,8 @@ class Dashboard(QMainWindow):
         self.scroll = QScrollArea()
         self.scroll.setWidgetResizable(True)
         self.cards_host = QWidget()
+        self.cards_host.setStyleSheet(CATEGORY_CARD_STYLE)
+        self._cards = {}  # category name -> CategoryCard, reused across refreshes
         self.grid = QGridLayout(self.cards_host)
         self.grid.setHorizontalSpacing(12)
         self.grid.setVerticalSpacing(12)
@@ -146,14 +214,20 @@ class Dashboard(QMainWindow):
         header_row.addWidget(self.btn_bar)
         header_row.addWidget(self.btn_daily)
 
-        # Defaults and initial load
+        # Defaults and initial load, submitted now rather than on the first
+        # event-loop pass so the query overlaps showing the window.
         self._set_default_range()
-        self.refresh()
+        self._dirty.update(ALL_PARTS)
+        self._flush_refresh()
 
     # ------------------------ helpers & actions ------------------------ #
     def _seed_defaults(self):
         for name in ["Food", "Other"]:
-            self.db.add_category(name)
+            self.worker.call("add_category", name)
+
+    def _category_names(self):
+        """Category names as of the last rendered snapshot."""
+        return [name for (name, _t) in self._snapshot.categories] if self._snapshot else []
 
     def _set_default_range(self):
         today = date.today()
@@ -179,7 +253,7 @@ class Dashboard(QMainWindow):
             start = today
         self.start.setDate(QDate(start.year, start.month, start.day))
         self.end.setDate(QDate(today.year, today.month, today.day))
-        self.refresh()
+        self.request_refresh(STATS, CARDS)
 
     # ---- income & expense dialogs ----
     def add_income(self):
@@ -187,11 +261,10 @@ class Dashboard(QMainWindow):
         result = dlg.get()
         if result:
             d, amount, src = result
-            self.db.add_income(amount, src, d)
-            self.refresh()
+            self.worker.call("add_income", amount, src, d)
 
     def add_expense(self):
-        cats = [name for (_id, name) in self.db.all_categories()]
+        cats = self._category_names()
         dlg = ExpenseDialog(cats, self)
         result = dlg.get()
         if result:
@@ -199,18 +272,41 @@ class Dashboard(QMainWindow):
             if not cat:
                 QMessageBox.information(self, "Category", "Please enter a category name")
                 return
-            self.db.add_expense(cat, amount, note, d)
-            self.refresh()
+            self.worker.call("add_expense", cat, amount, note, d)
+
+    def search(self):
+        s, e = self.current_range()
+        SearchDialog(self.worker, s, e, self).exec()
+
+    def batch_entry(self):
+        rows = BatchEntryDialog(self._category_names(), self).get()
+        if rows:
+            # One executemany, one commit for the whole grid.
+            self.worker.call("add_expenses_bulk", rows)
+
+    def import_statement(self):
+        result = ImportDialog(self).get()
+        if not result:
+            return
+        path, mapping = result
+
+        def done(res):
+            QMessageBox.information(
+                self, "Import",
+                f"Imported {res.inserted} expense(s).\n"
+                f"Skipped {res.duplicates} duplicate(s) and {res.skipped} unreadable row(s).",
+            )
+
+        self.worker.call(import_file, path, mapping, on_result=done)
 
     # ---- categories ----
     def add_category(self):
         name, ok = QInputDialog.getText(self, "Add category", "Name:")
         if ok and name.strip():
-            self.db.add_category(name)
-            self.refresh()
+            self.worker.call("add_category", name)
 
     def edit_category(self):
-        cats = [name for (_id, name) in self.db.all_categories()]
+        cats = self._category_names()
         if not cats:
             return
         old, ok = QInputDialog.getItem(self, "Edit category", "Select:", cats, 0, False)
@@ -218,42 +314,104 @@ class Dashboard(QMainWindow):
             return
         new, ok2 = QInputDialog.getText(self, "Rename", f"New name for '{old}':")
         if ok2 and new.strip():
-            try:
-                self.db.rename_category(old, new)
-            except Exception as e:
-                QMessageBox.warning(self, "Error", str(e))
-            self.refresh()
+            self.worker.call("rename_category", old, new,
+                             on_error=lambda exc: QMessageBox.warning(self, "Error", str(exc)))
     
     def delete_category(self):
-        cats = [name for (_id, name) in self.db.all_categories()]
+        cats = self._category_names()
         if not cats:
             return
         name, ok = QInputDialog.getItem(self, "Delete category", "Select:", cats, 0, False)
         if not ok:
             return
-        
-        n = self.db.count_expenses_in_category(name)
-        msg = (f"Delete category '{name}'?\n\n"
-               f"This will also delete {n} expense(s) in this category.")
-        if QMessageBox.question(self, "Confirm delete", msg,
-                                QMessageBox.Yes | QMessageBox.No) != QMessageBox.Yes:
-            return
-        
-        self.db.delete_category(name)
-        self.refresh()
+
+        def confirm(n):
+            msg = (f"Delete category '{name}'?\n\n"
+                   f"This will also delete {n} expense(s) in this category.")
+            if QMessageBox.question(self, "Confirm delete", msg,
+                                    QMessageBox.Yes | QMessageBox.No) != QMessageBox.Yes:
+                return
+            self.worker.call("delete_category", name,
+                             on_error=lambda exc: QMessageBox.warning(self, "Error", str(exc)))
+
+        self.worker.call("count_expenses_in_category", name, on_result=confirm)
 
     # ---- refresh UI ----
     def refresh(self):
-        self._update_stats()
-        self._populate_cards()
+        """Bring the whole dashboard up to date with the current range."""
+        self.request_refresh()
+
+    def request_refresh(self, *parts: str):
+        """Mark parts (STATS, CARDS, CHART; all by default) dirty and schedule one update."""
+        self._dirty.update(parts or ALL_PARTS)
+        self._refresh_timer.start()
 
-    def _update_stats(self):
+    def _flush_refresh(self):
+        dirty, self._dirty = self._dirty, set()
         s, e = self.current_range()
-        total_inc = self.db.total_incomes(s, e)
-        total_exp = self.db.total_expenses(s, e)
-        self.box_income.set_amount(total_inc)
-        self.box_expense.set_amount(total_exp)
-        bal = total_inc - total_exp
+        snap = self._snapshot
+        if snap is None or (snap.start, snap.end) != (s, e):
+            dirty |= {STATS, CARDS}
+            known = None
+        else:
+            # Same range: the worker skips the query unless the data moved.
+            known = self._snapshot_version
+        if CHART in dirty:
+            self._refresh_open_chart()
+        if not dirty & {STATS, CARDS}:
+            self.refreshed.emit()
+            return
+        # A newer request supersedes one still in flight, so rapid period
+        # clicks only ever render the last range; its parts carry over.
+        self._inflight |= dirty
+        self.worker.call(_rows_if_changed, known, "dashboard_snapshot", s, e,
+                         channel="dashboard", on_result=self._render)
+
+    def _on_change(self, change):
+        """Fold a committed write into the snapshot on screen, or re-read what it can't describe."""
+        self.request_refresh(CHART)
+        snap = self._snapshot
+        new = snap.apply(change) if snap is not None else None
+        if new is None:
+            self.request_refresh(STATS, CARDS)
+            return
+        # The version the patched snapshot matches is unknown; the next
+        # same-range refresh reads it once more.
+        self._snapshot, self._snapshot_version = new, None
+        if (new.total_income, new.total_expenses) != (snap.total_income, snap.total_expenses):
+            self._update_stats(new)
+        if isinstance(change, CategoryRenamed):
+            card = self._cards.pop(change.old, None)
+            if card is not None:
+                card.rename(change.new)
+                self._cards[change.new] = card
+        if [n for n, _t in new.categories] != [n for n, _t in snap.categories]:
+            self._populate_cards(new)  # cards come, go or move
+        else:
+            for (name, total), (_n, old) in zip(new.categories, snap.categories):
+                if total != old:
+                    self._cards[name].update_total(total)
+
+    def _render(self, result):
+        version, snap = result
+        parts, self._inflight = self._inflight, set()
+        if snap is not None:
+            self._snapshot, self._snapshot_version = snap, version
+            if STATS in parts:
+                self._update_stats(snap)
+            if CARDS in parts:
+                self._populate_cards(snap)
+        self.refreshed.emit()
+        if not self._totals_requested:
+            # Built after the first render, so it stays off the startup path;
+            # later snapshots come from the index.
+            self._totals_requested = True
+            self.worker.call("enable_totals_index")
+
+    def _update_stats(self, snap: DashboardSnapshot):
+        self.box_income.set_amount(snap.total_income)
+        self.box_expense.set_amount(snap.total_expenses)
+        bal = snap.balance
         self.balance_box.setText(
             f"<div>Balance<br><span style='font-size:18pt'>{bal:,.2f}</span></div>"
         )
@@ -266,101 +424,135 @@ class Dashboard(QMainWindow):
                 "border:2px solid #b00020; color:#b00020; border-radius:16px; padding:12px; font-weight:700;"
             )
 
-    def _populate_cards(self):
-        while self.grid.count():
-            item = self.grid.takeAt(0)
-            w = item.widget()
-            if w:
-                w.setParent(None)
-        s, e = self.current_range()
-        data = self.db.sum_by_category(s, e)
+    def _populate_cards(self, snap: DashboardSnapshot):
+        """Sync the card grid with the snapshot, reusing cards by category name.
+
+        Only new categories get a widget, only changed totals are re-rendered,
+        and only cards whose grid cell shifted are moved.
+        """
+        current = {name for (name, _t) in snap.categories}
+        for name in [n for n in self._cards if n not in current]:
+            card = self._cards.pop(name)
+            self.grid.removeWidget(card)
+            card.deleteLater()
+
         cols = 3
-        for i, (name, total) in enumerate(data):
+        for i, (name, total) in enumerate(snap.categories):
             r, c = divmod(i, cols)
-            card = CategoryCard(name, total)
-            card.clicked.connect(lambda _=False, n=name: self.show_category_details(n))
-            self.grid.addWidget(card, r, c)
+            card = self._cards.get(name)
+            if card is None:
+                card = CategoryCard(name, total)
+                card.clicked.connect(lambda _=False, c=card: self.show_category_details(c.name))
+                self._cards[name] = card
+                self.grid.addWidget(card, r, c)
+                continue
+            card.update_total(total)
+            if self.grid.getItemPosition(self.grid.indexOf(card))[:2] != (r, c):
+                self.grid.removeWidget(card)
+                self.grid.addWidget(card, r, c)
 
     # ---- click handlers for totals boxes ----
     def show_all_incomes(self):
         s, e = self.current_range()
-        dlg = IncomesListDialog(self.db, s, e, self)
-        dlg.exec()
-        self.refresh()  # reflect edits/deletes
+        IncomesListDialog(self.worker, s, e, self).exec()
 
 
     def show_all_expenses(self):
         s, e = self.current_range()
-        rows = self.db.expenses_in_range(s, e)
-        ExpensesListDialog(rows, self).exec()
+        ExpensesListDialog(self.worker, s, e, self).exec()
 
     def show_category_details(self, category_name: str):
         s, e = self.current_range()
-        dlg = CategoryExpensesDialog(self.db, category_name, s, e, self)
-        dlg.exec()
-        self.refresh()
+        CategoryExpensesDialog(self.worker, category_name, s, e, self).exec()
     
     # --- dataset helpers ---
-    def _category_totals(self):
-        """Expenses by category for current period (labels, values)."""
-        s, e = self.current_range()
-        rows = self.db.sum_by_category(s, e)  # [(name, total)]
-        labels = [n for (n, t) in rows if (t or 0) > 0]
-        values = [t for (n, t) in rows if (t or 0) > 0]
-        return labels, values
-
-    def _income_totals_by_source(self):
-        """Incomes grouped by 'source' for current period (labels, values)."""
-        from collections import defaultdict
-        s, e = self.current_range()
-        rows = self.db.incomes_in_range(s, e)  # [(id, date, amount, source)]
-        agg = defaultdict(float)
-        for (_id, _d, amt, src) in rows:
-            key = src.strip() if src and src.strip() else "Income"
-            agg[key] += float(amt or 0)
-        labels = list(agg.keys())
-        values = [agg[k] for k in labels]
-        return labels, values
+    @staticmethod
+    def _positive_totals(agg):
+        """(labels, values) of a one-key Database.aggregate result, dropping empty groups."""
+        pairs = [(k, v) for k, v in zip(agg.keys[0], agg.values) if v > 0]
+        return [k for k, _v in pairs], [v for _k, v in pairs]
 
     def _selected_dataset(self):
         return "expenses" if self.dataset_sel.currentIndex() == 0 else "incomes"
 
     # --- chart launchers ---
     def open_pie_chart(self):
-        ds = self._selected_dataset()
-        if ds == "expenses":
-            labels, values = self._category_totals()
-            title = "Expenses by Category (%)"
-        else:
-            labels, values = self._income_totals_by_source()
-            title = "Incomes by Source (%)"
-        ChartDialog(title, labels, values, chart="pie", parent=self).exec()
+        self._open_chart("pie")
 
     def open_bar_chart(self):
-        ds = self._selected_dataset()
-        if ds == "expenses":
-            labels, values = self._category_totals()
-            title = "Expenses by Category (Total)"
-        else:
-            labels, values = self._income_totals_by_source()
-            title = "Incomes by Source (Total)"
-        ChartDialog(title, labels, values, chart="bar", parent=self).exec()
+        self._open_chart("bar")
+
+    def _chart_cache(self):
+        if self._charts is None:
+            from charts import ChartCache
+            self._charts = ChartCache(self)
+        return self._charts
+
+    def _show_chart(self, key, group_by, draw, modal=True):
+        """Show chart `key` = (dataset, kind, start, end), aggregating only if the data changed.
 
-    def _daily_expense_pivot(self):
-        """Return (dates[], {category: [values aligned to dates]}) for current range."""
+        With modal=False the chart is only redrawn, for a dialog already open.
+        """
+        charts = self._chart_cache()
+        dataset, _kind, s, e = key
+        self._chart_shown = (key, group_by, draw)
+
+        def show(result):
+            version, agg = result
+            charts.show(key, version, lambda dlg: draw(dlg, agg), modal)
+
+        self.worker.call(_rows_if_changed, charts.version(key), "aggregate", dataset, s, e, group_by,
+                         channel="chart", on_result=show)
+
+    def _refresh_open_chart(self):
+        if self._charts is None or self._chart_shown is None:
+            return
+        key, group_by, draw = self._chart_shown
+        if self._charts.visible_key() == key:
+            self._show_chart(key, group_by, draw, modal=False)
+
+    def _open_chart(self, chart: str):
         s, e = self.current_range()
-        rows = self.db.expenses_daily_by_category(s, e) # (d, cat, total)
-        dates = sorted({d for (d, _cat, _t) in rows})
-        cats = sorted({cat for (_d, cat, _t) in rows})
-        idx = {d: i for i, d in enumerate(dates)}
-        series = {cat: [0.0] * len(dates) for cat in cats}
-        for d, cat, total in rows:
-            series[cat][idx[d]] = float(total or 0)
-        return dates, series
-    
+        dataset = self._selected_dataset()
+        suffix = "(%)" if chart == "pie" else "(Total)"
+        if dataset == "expenses":
+            group, title = "category", "Expenses by Category"
+        else:
+            group, title = "source", "Incomes by Source"
+
+        def draw(dlg, agg):
+            dlg.set_data(f"{title} {suffix}", *self._positive_totals(agg))
+
+        self._show_chart((dataset, chart, s, e), (group,), draw)
+
     def open_daily_cart(self):
-        dates, series = self._daily_expense_pivot()
-        DailyExpensesChartDialog(dates, series, self).exec()
+        s, e = self.current_range()
+
+        def draw(dlg, agg):
+            dlg.set_data(list(agg.rows()), s, e)
+
+        self._show_chart(("expenses", "daily", s, e), ("day", "category"), draw)
+
+    # ---- startup ----
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._painted:
+            self._painted = True
+            # Charts are imported lazily; pay for matplotlib in the background
+            # once the window is up, so the first chart opens without the wait.
+            QTimer.singleShot(500, self._warm_up_charts)
+
+    @staticmethod
+    def _warm_up_charts():
+        threading.Thread(target=lambda: __import__("charts"), name="warm-up-charts", daemon=True).start()
+
+    def closeEvent(self, event):
+        if self._charts is not None:
+            self._charts.release()
+        self.worker.stop()
+        if self.backup is not None:
+            self.backup.stop()  # final push, after the worker's last commit
+        super().closeEvent(event)
 
 if __name__ == "__main__":
     import sys
@@ -0,0 +1,146 @@
+"""Item models for the list dialogs."""
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+from db import PAGE_SIZE
+
+# (header, index into the row tuple, is_amount)
+Column = Tuple[str, int, bool]
+
+
+class PagedTableModel(QAbstractTableModel):
+    """Read-only table filled page by page as the view scrolls.
+
+    Pages come from a keyset-paginated Database method (``*_page``) run on
+    the QueryWorker; every row tuple starts with (id, date, ...), which is
+    also the continuation key. Only pages the user has scrolled to are ever
+    fetched or held in memory.
+
+    Rows are kept newest first, ordered by (date, id) descending like the
+    pages, so upsert()/remove() can patch single rows in place when the
+    data changes; later pages still continue from the last loaded key.
+    """
+    def __init__(self, worker, columns: Sequence[Column], job: str, args: tuple = (), parent=None):
+        super().__init__(parent)
+        self.worker = worker
+        self.columns = list(columns)
+        self.job = job
+        self.args = args
+        self._rows: List[tuple] = []
+        self._exhausted = False
+        self._loading = False
+
+    def reset(self, args: Optional[tuple] = None) -> None:
+        """Drop loaded rows (optionally switching query arguments) and refetch."""
+        self.worker.cancel(self)
+        self.beginResetModel()
+        if args is not None:
+            self.args = args
+        self._rows = []
+        self._exhausted = False
+        self._loading = False
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    def close(self) -> None:
+        self.worker.cancel(self)
+
+    def row_at(self, row: int) -> Optional[tuple]:
+        return self._rows[row] if 0 <= row < len(self._rows) else None
+
+    # -- in-place patches -----------------------------------------------
+    def _find(self, row_id: int) -> int:
+        return next((i for i, r in enumerate(self._rows) if r[0] == row_id), -1)
+
+    def _position(self, key: tuple) -> int:
+        """Index of the first loaded row that sorts after (date, id) key."""
+        lo, hi = 0, len(self._rows)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if (self._rows[mid][1], self._rows[mid][0]) > key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def remove(self, row_id: int) -> bool:
+        """Drop the loaded row with this id; False if it isn't loaded."""
+        i = self._find(row_id)
+        if i < 0:
+            return False
+        self.beginRemoveRows(QModelIndex(), i, i)
+        del self._rows[i]
+        self.endRemoveRows()
+        return True
+
+    def upsert(self, row: tuple) -> None:
+        """Show row in its (date, id) place, replacing the loaded row with the same id.
+
+        A row sorting after the last loaded one is left to fetchMore(),
+        unless there is nothing left to fetch.
+        """
+        i = self._find(row[0])
+        if i >= 0 and self._position((row[1], row[0])) in (i, i + 1):
+            self._rows[i] = row  # same place: repaint the one row
+            self.dataChanged.emit(self.index(i, 0), self.index(i, len(self.columns) - 1))
+            return
+        if i >= 0:
+            self.remove(row[0])
+        at = self._position((row[1], row[0]))
+        if at == len(self._rows) and not self._exhausted:
+            return
+        self.beginInsertRows(QModelIndex(), at, at)
+        self._rows.insert(at, row)
+        self.endInsertRows()
+
+    def update_rows(self, fn: Callable[[tuple], tuple]) -> None:
+        """Replace each loaded row by fn(row), repainting the ones that changed."""
+        for i, row in enumerate(self._rows):
+            new = fn(row)
+            if new != row:
+                self._rows[i] = new
+                self.dataChanged.emit(self.index(i, 0), self.index(i, len(self.columns) - 1))
+
+    # -- lazy loading ---------------------------------------------------
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        return not parent.isValid() and not self._exhausted and not self._loading
+
+    def fetchMore(self, parent: QModelIndex) -> None:
+        if not self.canFetchMore(parent):
+            return
+        self._loading = True
+        after = (self._rows[-1][1], self._rows[-1][0]) if self._rows else None
+        self.worker.call(self.job, *self.args, after, PAGE_SIZE, channel=self, on_result=self._append)
+
+    def _append(self, page: List[tuple]) -> None:
+        self._loading = False
+        self._exhausted = len(page) < PAGE_SIZE
+        if page:
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+            self._rows.extend(page)
+            self.endInsertRows()
+
+    # -- QAbstractTableModel --------------------------------------------
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        _header, pos, is_amount = self.columns[index.column()]
+        if role == Qt.DisplayRole:
+            value = self._rows[index.row()][pos]
+            return f"{value:.2f}" if is_amount else value
+        if role == Qt.TextAlignmentRole and is_amount:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole) -> Any:
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.columns[section][0]
+        return super().headerData(section, orientation, role)
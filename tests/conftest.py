@@ -0,0 +1,45 @@
+"""Shared fixtures: a fresh Database, one with a small ledger over several years, and a second connection to it."""
+from datetime import date
+
+import pytest
+
+from db import Database
+
+# (category, amount, note, date) and (amount, source, date) spread over 2021..2024.
+EXPENSES = [
+    ("Food", 12.5, "lunch", date(2021, 3, 4)),
+    ("Food", 7.25, "coffee beans", date(2022, 7, 1)),
+    ("Car", 40.0, "fuel", date(2022, 7, 1)),
+    ("Car", 120.1, "tyres", date(2023, 1, 15)),
+    ("Home", 0.3, "", date(2023, 12, 31)),
+    ("Food", 3.1, "bakery", date(2024, 2, 29)),
+]
+INCOMES = [
+    (1000.0, "salary", date(2021, 3, 1)),
+    (1000.0, "salary", date(2023, 1, 1)),
+    (55.55, "refund", date(2024, 2, 29)),
+]
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / "ledger.db"))
+    yield database
+    database.conn.close()
+
+
+@pytest.fixture
+def ledger(db):
+    for category, amount, note, d in EXPENSES:
+        db.add_expense(category, amount, note, d)
+    for amount, source, d in INCOMES:
+        db.add_income(amount, source, d)
+    return db
+
+
+@pytest.fixture
+def other(ledger):
+    """A second connection to the ledger's file, as the importer CLI would open."""
+    conn = Database(ledger.conn.execute("PRAGMA database_list").fetchone()[2], cache_size=0)
+    yield conn
+    conn.conn.close()
@@ -0,0 +1,69 @@
+"""Archiving a year moves its rows to their own file without changing any range result."""
+import os
+from datetime import date
+
+import pytest
+
+from db import Database, Filters
+
+START, END = date(2021, 1, 1), date(2024, 12, 31)
+
+
+def _results(db):
+    """Range results that must not notice where the rows live."""
+    return {
+        "expenses": db.expenses_in_range(START, END),
+        "incomes": db.incomes_in_range(START, END),
+        "pages": db.expenses_in_range_page(START, END, ("2023-01-15", 10**6), 2),
+        "category": db.expenses_for_category("Car", START, END),
+        "stream": [row for rows in db.iter_expenses(START, END, batch=2) for row in rows],
+        "summary": (db.expenses_summary(START, END), db.incomes_summary(START, END)),
+        "by_category": db.sum_by_category(START, END),
+        "snapshot": db.dashboard_snapshot(START, END),
+        "aggregate": db.aggregate("expenses", START, END, ("month",), "max", Filters(min_amount=1)).values,
+        "search": sorted(db.search("fuel")),
+    }
+
+
+def test_round_trip_keeps_results(ledger):
+    db = ledger
+    before = _results(db)
+    info = db.archive_year(2022)
+    assert (info.year, info.expenses, info.expenses_total, info.incomes) == (2022, 2, 47.25, 0)
+    path = os.path.join(os.path.dirname(db.conn.execute("PRAGMA database_list").fetchone()[2]), info.file)
+    assert os.path.exists(path)
+    assert db.conn.execute("SELECT COUNT(*) FROM main.expenses WHERE note IN ('fuel', 'coffee beans')").fetchone() == (0,)
+    assert _results(db) == before
+    assert [a.year for a in db.archived_years()] == [2022]
+
+    db.unarchive_year(2022)
+    assert not os.path.exists(path)
+    assert db.archived_years() == []
+    assert _results(db) == before
+
+
+def test_archived_year_is_read_only(ledger):
+    db = ledger
+    fuel = db.conn.execute("SELECT id FROM expenses WHERE note = 'fuel'").fetchone()[0]
+    db.archive_year(2022)
+    with pytest.raises(ValueError, match="archived"):
+        db.add_expense("Food", 1.0, "late", date(2022, 5, 5))
+    with pytest.raises(ValueError, match="archived"):
+        db.update_expense(fuel, "Car", 1.0, "fuel", date(2024, 1, 1))
+    with pytest.raises(ValueError, match="archived"):
+        db.delete_expense(fuel)
+    with pytest.raises(ValueError, match="archived"):
+        db.delete_category("Car")
+    with pytest.raises(ValueError, match="already archived"):
+        db.archive_year(2022)
+    with pytest.raises(ValueError, match="not over"):
+        db.archive_year(date.today().year)
+
+
+def test_second_connection_sees_the_archive(ledger):
+    path = ledger.conn.execute("PRAGMA database_list").fetchone()[2]
+    other = Database(path)
+    before = _results(other)
+    ledger.archive_year(2022)
+    assert _results(other) == before
+    other.conn.close()
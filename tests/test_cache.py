@@ -0,0 +1,43 @@
+"""Cached results never outlive a write, from this connection or another."""
+from datetime import date
+
+import pytest
+
+RANGES = [(date(2021, 1, 1), date(2024, 12, 31)), (date(2022, 7, 1), date(2022, 7, 1)),
+          (date(2023, 1, 1), date(2023, 12, 31)), (date(2024, 3, 1), date(2024, 3, 31))]
+
+
+def _totals(db):
+    return [(db.total_expenses(s, e), db.total_incomes(s, e), db.sum_by_category(s, e), db.dashboard_snapshot(s, e))
+            for s, e in RANGES]
+
+
+def test_repeated_reads_hit_the_cache(ledger):
+    first = _totals(ledger)
+    hits = ledger.cache_stats.hits
+    assert _totals(ledger) == first
+    assert ledger.cache_stats.hits - hits == 4 * len(RANGES)
+
+
+def test_own_writes_invalidate(ledger, other):
+    _totals(ledger)
+    ledger.add_expense("Food", 1.0, "x", date(2023, 6, 1))
+    ledger.add_income(2.0, "y", date(2024, 3, 3))
+    assert _totals(ledger) == _totals(other)
+
+
+def test_other_connections_commits_invalidate(ledger, other):
+    _totals(ledger)
+    other.add_expense("Food", 1.0, "x", date(2023, 6, 1))
+    other.rename_category("Car", "Vehicle")
+    assert _totals(ledger) == _totals(other)
+
+
+def test_rollback_invalidates(ledger, other):
+    _totals(ledger)
+    with pytest.raises(RuntimeError):
+        with ledger.transaction():
+            ledger.add_expense("Food", 100.0, "x", date(2023, 6, 1))
+            _totals(ledger)  # cached mid-transaction
+            raise RuntimeError
+    assert _totals(ledger) == _totals(other)
@@ -0,0 +1,20 @@
+"""The category name <-> id cache follows other connections' changes."""
+from datetime import date
+
+
+def test_rename_elsewhere_is_seen(ledger, other):
+    assert ledger.cat_id("Food") is not None  # cache loaded
+    other.rename_category("Food", "Meals")
+    ledger.add_expense("Food", 1.0, "snack", date(2024, 3, 1))
+    assert ledger.expenses_for_category("Food", date(2024, 3, 1), date(2024, 3, 1))[0][3] == "snack"
+    assert ledger.expenses_for_category("Meals", date(2024, 3, 1), date(2024, 3, 1)) == []
+    assert ledger.category_name(ledger.cat_id("Meals")) == "Meals"
+
+
+def test_delete_elsewhere_is_seen(ledger, other):
+    home = ledger.cat_id("Home")
+    other.delete_category("Home")
+    assert ledger.category_name(home) is None
+    ledger.add_expense("Home", 2.0, "lamp", date(2024, 3, 1))
+    assert ledger.cat_id("Home") != home
+    assert dict(ledger.sum_by_category(date(2024, 3, 1), date(2024, 3, 1)))["Home"] == 2.0
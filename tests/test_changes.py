@@ -0,0 +1,96 @@
+"""Change events: delivered once committed, and enough to patch a dashboard snapshot exactly."""
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from db import (CategoryAdded, CategoryDeleted, CategoryRenamed, Database, ExpenseDeleted, ExpenseInserted,
+                ExpenseUpdated, IncomeInserted, TablesChanged)
+
+PERIOD = (date(2023, 1, 1), date(2023, 12, 31))
+
+
+@pytest.fixture
+def events(ledger):
+    received = []
+    ledger.subscribe(received.append)
+    return received
+
+
+def test_row_events_carry_before_and_after(ledger, events):
+    ledger.add_expense("Food", 1.5, "x", date(2023, 5, 1))
+    (inserted,) = events
+    assert isinstance(inserted, ExpenseInserted) and inserted.before is None
+    assert (inserted.after.category, inserted.after.amount, inserted.after.day) == ("Food", 1.5, date(2023, 5, 1))
+    ledger.update_expense(inserted.after.id, "Car", 2.5, "y", date(2023, 5, 2))
+    ledger.delete_expense(inserted.after.id)
+    updated, deleted = events[1:]
+    assert isinstance(updated, ExpenseUpdated) and updated.before == inserted.after
+    assert isinstance(deleted, ExpenseDeleted) and deleted.before == updated.after and deleted.after is None
+
+
+def test_events_wait_for_commit_and_vanish_on_rollback(ledger, events):
+    with ledger.transaction():
+        ledger.add_income(1.0, "a", date(2023, 5, 1))
+        assert events == []
+    assert [type(e) for e in events] == [IncomeInserted]
+    with pytest.raises(RuntimeError):
+        with ledger.transaction():
+            ledger.add_income(1.0, "b", date(2023, 5, 1))
+            raise RuntimeError
+    assert len(events) == 1
+
+
+def test_category_events(ledger, events):
+    ledger.add_category("Food")  # exists: no event
+    ledger.add_expense("Pets", 1.0, "x", date(2023, 5, 1))  # created on the fly
+    ledger.rename_category("Pets", "Animals")
+    ledger.delete_category("Animals")
+    assert [type(e) for e in events] == [CategoryAdded, ExpenseInserted, CategoryRenamed, CategoryDeleted]
+
+
+def test_other_connections_commit_is_reported(ledger, events):
+    ledger.data_version()
+    other = Database(ledger.conn.execute("PRAGMA database_list").fetchone()[2])
+    other.add_income(1.0, "elsewhere", date(2023, 5, 1))
+    other.conn.close()
+    ledger.data_version()
+    assert [type(e) for e in events] == [TablesChanged]
+
+
+def _write(db, rng):
+    """One random write through the public API."""
+    cats = [name for _cid, name in db.all_categories()]
+    expenses = [row[0] for row in db.conn.execute("SELECT id FROM expenses")]
+    incomes = [row[0] for row in db.conn.execute("SELECT id FROM incomes")]
+    d = date(2022, 11, 1) + timedelta(days=rng.randrange(500))
+    amount = rng.randrange(1, 100_000) / 100
+    op = rng.randrange(10)
+    if op < 3 or not expenses:
+        db.add_expense(rng.choice(cats + ["New"]), amount, "n", d)
+    elif op == 3:
+        db.update_expense(rng.choice(expenses), rng.choice(cats), amount, "u", d)
+    elif op == 4:
+        db.delete_expense(rng.choice(expenses))
+    elif op == 5 or not incomes:
+        db.add_income(amount, "s", d)
+    elif op == 6:
+        db.update_income(rng.choice(incomes), amount, "s", d)
+    elif op == 7:
+        db.delete_income(rng.choice(incomes))
+    elif op == 8 and len(cats) > 1:
+        db.delete_category(rng.choice(cats))
+    else:
+        db.rename_category(rng.choice(cats), f"Cat{rng.randrange(1000)}")
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_patched_snapshot_matches_fresh_read(ledger, events, seed):
+    rng = random.Random(seed)
+    snapshot = ledger.dashboard_snapshot(*PERIOD)
+    for _ in range(150):
+        _write(ledger, rng)
+        for change in events:
+            snapshot = snapshot.apply(change) or ledger.dashboard_snapshot(*PERIOD)
+        events.clear()
+        assert snapshot == ledger.dashboard_snapshot(*PERIOD)
@@ -0,0 +1,40 @@
+"""python -m cli: reports from a subprocess, and no GUI or chart library on its import path.
+
+The start-up time budget is checked by benchmarks/bench_cli.py; this only
+guards what gets imported, which a slow machine cannot make flaky.
+"""
+import csv
+import io
+import json
+import subprocess
+import sys
+from datetime import date
+from pathlib import Path
+
+from benchmarks.bench_cli import CHILD, FORBIDDEN
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _cli(db, *args: str) -> subprocess.CompletedProcess:
+    """Run the CLI on db's file as `python -m cli` would; stderr ends with the imported modules."""
+    path = db.conn.execute("PRAGMA database_list").fetchone()[2]
+    return subprocess.run(
+        [sys.executable, "-c", CHILD, *args, "--db", path],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+
+
+def test_totals_imports_no_gui_or_chart_library(ledger):
+    proc = _cli(ledger, "totals", "--period", "all")
+    modules = json.loads(proc.stderr.strip().splitlines()[-1])
+    assert not [m for m in FORBIDDEN if m in modules]
+    report = json.loads(proc.stdout)
+    assert (report["expenses"], report["expense_total"]) == ledger.expenses_summary(date.min, date.max)
+    assert (report["incomes"], report["income_total"]) == ledger.incomes_summary(date.min, date.max)
+
+
+def test_categories_csv(ledger):
+    proc = _cli(ledger, "categories", "--start", "2022-01-01", "--end", "2022-12-31", "--output", "csv")
+    rows = list(csv.reader(io.StringIO(proc.stdout)))
+    assert rows == [["category", "count", "total"], ["Car", "1", "40.0"], ["Food", "1", "7.25"]]
@@ -0,0 +1,34 @@
+"""Statement import: duplicates are judged against the ledger as it was before the import."""
+from datetime import date
+
+import importer
+from importer import ColumnMapping, ImportResult
+
+MAPPING = ColumnMapping(date="Date", amount="Amount", category="Category", note="Note")
+
+
+def _statement(tmp_path, *rows: str) -> str:
+    path = tmp_path / "statement.csv"
+    path.write_text("\n".join(("Date,Amount,Category,Note",) + rows) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_repeats_within_the_file_are_kept(db, tmp_path):
+    path = _statement(tmp_path, "2024-01-05,3.50,Food,Coffee", "2024-01-05,3.50,Food,Coffee",
+                      "2024-01-06,9.00,Food,Deli")
+    assert importer.import_file(db, path, MAPPING) == ImportResult(inserted=3, duplicates=0)
+    assert db.expenses_summary(date(2024, 1, 5), date(2024, 1, 5)) == (2, 7.0)
+
+
+def test_reimport_adds_nothing(db, tmp_path):
+    path = _statement(tmp_path, "2024-01-05,3.50,Food,Coffee", "2024-01-05,3.50,Food,Coffee")
+    importer.import_file(db, path, MAPPING)
+    assert importer.import_file(db, path, MAPPING) == ImportResult(inserted=0, duplicates=2)
+    assert db.expenses_summary(date(2024, 1, 5), date(2024, 1, 5)) == (2, 7.0)
+
+
+def test_other_category_is_not_a_duplicate(db, tmp_path):
+    db.add_expense("Food", 7.0, "lunch", date(2024, 1, 5))
+    path = _statement(tmp_path, "2024-01-05,7.00,Car,lunch", "2024-01-05,7.00,Food,lunch")
+    assert importer.import_file(db, path, MAPPING) == ImportResult(inserted=1, duplicates=1)
+    assert db.expenses_for_category("Car", date(2024, 1, 5), date(2024, 1, 5))[0][1:] == ("2024-01-05", 7.0, "lunch")
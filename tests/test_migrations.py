@@ -0,0 +1,49 @@
+"""Upgrading a v3 database (REAL amounts, TEXT dates) to the current schema."""
+from datetime import date
+
+import db as db_module
+from db import Database, SCHEMA_VERSION
+
+
+def _legacy(path, monkeypatch) -> None:
+    """A v3 database with float-unfriendly amounts and a deleted last row of each table."""
+    monkeypatch.setattr(db_module, "SCHEMA_VERSION", 3)
+    old = Database(path)
+    c = old.conn
+    c.execute("INSERT INTO categories(name) VALUES ('Food'), ('Car')")
+    c.executemany(
+        "INSERT INTO expenses(category_id, amount, note, date) VALUES (?, ?, ?, ?)",
+        [(1, 0.1, "a", "2023-01-01"), (1, 0.2, "b", "2023-01-01"), (2, 19.99, "c", "2023-02-28"),
+         (2, 5.0, "gone", "2023-03-01")],
+    )
+    c.executemany("INSERT INTO incomes(amount, source, date) VALUES (?, ?, ?)",
+                  [(1000.01, "salary", "2023-01-31"), (1.0, "gone", "2023-02-01")])
+    c.execute("DELETE FROM expenses WHERE note = 'gone'")
+    c.execute("DELETE FROM incomes")
+    c.commit()
+    c.close()
+    monkeypatch.setattr(db_module, "SCHEMA_VERSION", SCHEMA_VERSION)
+
+
+def test_upgrade_keeps_rows_and_sums_exactly(tmp_path, monkeypatch):
+    path = str(tmp_path / "old.db")
+    _legacy(path, monkeypatch)
+    db = Database(path)
+    assert db.conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    assert db.conn.execute("SELECT id, amount_cents FROM expenses ORDER BY id").fetchall() == [(1, 10), (2, 20), (3, 1999)]
+    assert db.expenses_in_range(date(2023, 1, 1), date(2023, 12, 31))[-1] == (1, "2023-01-01", 0.1, "Food", "a")
+    assert db.sum_by_category(date(2023, 1, 1), date(2023, 1, 31)) == [("Car", 0.0), ("Food", 0.3)]
+    assert db.total_expenses(date(2023, 1, 1), date(2023, 12, 31)) == 20.29
+    strict = dict(db.conn.execute("SELECT name, strict FROM pragma_table_list WHERE schema = 'main'").fetchall())
+    assert strict["expenses"] == strict["incomes"] == 1
+
+
+def test_upgrade_keeps_autoincrement_marks(tmp_path, monkeypatch):
+    path = str(tmp_path / "old.db")
+    _legacy(path, monkeypatch)
+    db = Database(path)
+    db.add_expense("Food", 1.0, "new", date(2024, 1, 1))
+    db.add_income(1.0, "new", date(2024, 1, 1))  # incomes was rebuilt empty
+    assert db.conn.execute("SELECT id FROM expenses WHERE note = 'new'").fetchone()[0] == 5
+    assert db.conn.execute("SELECT id FROM incomes WHERE source = 'new'").fetchone()[0] == 3
+    assert db.conn.execute("SELECT COUNT(*), COUNT(DISTINCT name) FROM sqlite_sequence").fetchone() == (3, 3)
@@ -0,0 +1,82 @@
+"""Every range method reads through an index: no full scan of a ledger or rollup table.
+
+Each method runs with a trace callback recording its statements (with the
+values bound), and EXPLAIN QUERY PLAN of every SELECT among them may only
+SCAN the small categories and archives tables, constant rows, subqueries,
+materialized CTEs, or an FTS index through a MATCH.
+"""
+import re
+from datetime import date
+
+import pytest
+
+from db import Database, Filters
+
+START, END = date(2021, 1, 1), date(2024, 12, 31)
+AFTER = ("2023-06-01", 10**6)
+
+RANGE_CALLS = {
+    "total_expenses": lambda db: db.total_expenses(START, END),
+    "total_incomes": lambda db: db.total_incomes(START, END),
+    "sum_by_category": lambda db: db.sum_by_category(START, END),
+    "expenses_summary": lambda db: db.expenses_summary(START, END),
+    "expenses_summary[category]": lambda db: db.expenses_summary(START, END, "Food"),
+    "incomes_summary": lambda db: db.incomes_summary(START, END),
+    "dashboard_snapshot": lambda db: db.dashboard_snapshot(START, END),
+    "expenses_daily_by_category": lambda db: db.expenses_daily_by_category(START, END),
+    "expenses_in_range": lambda db: db.expenses_in_range(START, END),
+    "expenses_in_range_page": lambda db: db.expenses_in_range_page(START, END),
+    "expenses_in_range_page[after]": lambda db: db.expenses_in_range_page(START, END, AFTER),
+    "expenses_for_category": lambda db: db.expenses_for_category("Car", START, END),
+    "expenses_for_category_page": lambda db: db.expenses_for_category_page("Car", START, END),
+    "expenses_for_category_page[after]": lambda db: db.expenses_for_category_page("Car", START, END, AFTER),
+    "incomes_in_range": lambda db: db.incomes_in_range(START, END),
+    "incomes_in_range_page": lambda db: db.incomes_in_range_page(START, END),
+    "incomes_in_range_page[after]": lambda db: db.incomes_in_range_page(START, END, AFTER),
+    "iter_expenses": lambda db: list(db.iter_expenses(START, END)),
+    "iter_incomes": lambda db: list(db.iter_incomes(START, END)),
+    "search": lambda db: db.search("fuel", START, END),
+    "aggregate[rollup]": lambda db: db.aggregate("expenses", START, END, ("category", "month")),
+    "aggregate[incomes]": lambda db: db.aggregate("incomes", START, END, ("year",), "count"),
+    "aggregate[base]": lambda db: db.aggregate("expenses", START, END, ("week",), "max", Filters(min_amount=1)),
+    "aggregate[text]": lambda db: db.aggregate("incomes", START, END, ("source",), "avg", Filters(text="sal")),
+}
+
+_ALLOWED_SCAN = re.compile(r"SCAN (c|categories|archives)\b|SCAN CONSTANT ROW|SCAN \(subquery-\d+\)|SCAN \w+ VIRTUAL TABLE INDEX \d+:M")
+
+
+def _plans(db: Database, call) -> list:
+    statements = []
+    db.conn.set_trace_callback(statements.append)
+    try:
+        call(db)
+    finally:
+        db.conn.set_trace_callback(None)
+    selects = [s for s in statements if s.lstrip().upper().startswith(("SELECT", "WITH"))]
+    assert selects, "no query ran"
+    return [[row[3] for row in db.conn.execute(f"EXPLAIN QUERY PLAN {s}")] for s in selects]
+
+
+def _full_scans(plan: list) -> list:
+    ctes = {m.group(1) for line in plan for m in [re.match(r"MATERIALIZE (\w+)", line)] if m}
+    return [line for line in plan
+            if line.startswith("SCAN ") and not _ALLOWED_SCAN.match(line)
+            and line.split()[1] not in ctes]
+
+
+@pytest.mark.parametrize("archived", [False, True], ids=["main", "archived"])
+@pytest.mark.parametrize("name", sorted(RANGE_CALLS))
+def test_range_methods_use_indexes(ledger, name, archived):
+    if archived:
+        ledger.archive_year(2022)
+    for plan in _plans(ledger, RANGE_CALLS[name]):
+        assert not _full_scans(plan), plan
+
+
+def test_every_range_method_is_covered():
+    methods = {name for name in dir(Database) if not name.startswith("_")
+               and any(part in name for part in ("_in_range", "_page", "summary", "total", "_by_"))}
+    methods |= {"dashboard_snapshot", "iter_expenses", "iter_incomes", "search", "aggregate"}
+    methods -= {"totals_index", "enable_totals_index", "disable_totals_index", "verify_totals_index"}
+    covered = {name.split("[")[0] for name in RANGE_CALLS}
+    assert methods <= covered, methods - covered
@@ -0,0 +1,55 @@
+"""The daily rollups stay equal to a GROUP BY over the base tables through every kind of write."""
+from datetime import date
+
+
+def _stored(db):
+    return (
+        db.conn.execute("SELECT day, category_id, total, n FROM daily_category_totals ORDER BY 1, 2").fetchall(),
+        db.conn.execute("SELECT day, total, n FROM daily_income_totals ORDER BY 1").fetchall(),
+    )
+
+
+def _recomputed(db):
+    return (
+        db.conn.execute(
+            "SELECT day, category_id, SUM(amount_cents), COUNT(*) FROM expenses GROUP BY 1, 2 ORDER BY 1, 2"
+        ).fetchall(),
+        db.conn.execute("SELECT day, SUM(amount_cents), COUNT(*) FROM incomes GROUP BY 1 ORDER BY 1").fetchall(),
+    )
+
+
+def _expense_id(db, note):
+    return db.conn.execute("SELECT id FROM expenses WHERE note = ?", (note,)).fetchone()[0]
+
+
+def _income_id(db, source):
+    return db.conn.execute("SELECT id FROM incomes WHERE source = ?", (source,)).fetchone()[0]
+
+
+def test_rollups_follow_every_write(ledger):
+    db = ledger
+    steps = [
+        lambda: db.add_expense("Food", 2.2, "second lunch", date(2021, 3, 4)),
+        lambda: db.update_expense(_expense_id(db, "lunch"), "Car", 13.0, "lunch", date(2021, 3, 5)),
+        lambda: db.update_expense(_expense_id(db, "fuel"), "Car", 41.0, "fuel", date(2022, 7, 1)),
+        lambda: db.delete_expense(_expense_id(db, "second lunch")),
+        lambda: db.add_expenses_bulk([("Home", 1.0, "a", date(2023, 5, 1)), ("New", 2.0, "b", date(2023, 5, 1))]),
+        lambda: db.import_expenses([[(date(2023, 5, 1), "Home", 1.0, "a"), (date(2023, 5, 2), "Home", 5.0, "c")]]),
+        lambda: db.delete_category("Food"),
+        lambda: db.add_income(10.0, "gift", date(2021, 3, 1)),
+        lambda: db.update_income(_income_id(db, "gift"), 11.0, "gift", date(2022, 3, 1)),
+        lambda: db.delete_income(_income_id(db, "refund")),
+        lambda: db.add_incomes_bulk([(1.0, "x", date(2024, 1, 1)), (2.0, "y", date(2024, 1, 1))]),
+    ]
+    assert _stored(db) == _recomputed(db)
+    for step in steps:
+        step()
+        assert _stored(db) == _recomputed(db)
+
+
+def test_empty_days_leave_no_rollup_rows(db):
+    db.add_expense("Food", 1.0, "x", date(2024, 1, 1))
+    db.add_income(1.0, "y", date(2024, 1, 1))
+    db.delete_expense(_expense_id(db, "x"))
+    db.delete_income(_income_id(db, "y"))
+    assert _stored(db) == ([], [])
@@ -0,0 +1,62 @@
+"""The FTS indexes follow every write, including category renames, in main and in archives."""
+from datetime import date
+
+
+def _hits(db, text):
+    return sorted((kind, row_id) for kind, row_id, *_rest in db.search(text))
+
+
+def _expense_id(db, note):
+    return db.conn.execute("SELECT id FROM expenses WHERE note = ?", (note,)).fetchone()[0]
+
+
+def _fts_ok(db):
+    for table in ("expenses_fts", "incomes_fts"):
+        db.conn.execute(f"INSERT INTO {table}({table}) VALUES ('integrity-check')")
+
+
+def test_index_follows_row_writes(ledger):
+    db = ledger
+    fuel = _expense_id(db, "fuel")
+    assert _hits(db, "fuel") == [("expense", fuel)]
+    assert _hits(db, "coff") == [("expense", _expense_id(db, "coffee beans"))]  # word prefix
+
+    db.update_expense(fuel, "Car", 40.0, "diesel", date(2022, 7, 1))
+    assert _hits(db, "fuel") == []
+    assert _hits(db, "diesel") == [("expense", fuel)]
+
+    db.delete_expense(fuel)
+    assert _hits(db, "diesel") == []
+
+    db.add_income(3.0, "lottery win", date(2024, 3, 1))
+    assert [kind for kind, _id in _hits(db, "lottery")] == ["income"]
+    _fts_ok(db)
+
+
+def test_index_follows_categories(ledger):
+    db = ledger
+    cars = {("expense", _expense_id(db, note)) for note in ("fuel", "tyres")}
+    assert set(_hits(db, "car")) == cars
+    db.rename_category("Car", "Vehicle")
+    assert _hits(db, "car") == []
+    assert set(_hits(db, "vehicle")) == cars
+    db.delete_category("Vehicle")
+    assert _hits(db, "vehicle") == []
+    _fts_ok(db)
+
+
+def test_archived_rows_are_searched_and_renamed(ledger):
+    db = ledger
+    fuel = _expense_id(db, "fuel")
+    db.archive_year(2022)
+    assert _hits(db, "fuel") == [("expense", fuel)]
+    db.rename_category("Car", "Vehicle")
+    assert ("expense", fuel) in _hits(db, "vehicle")
+    db.unarchive_year(2022)
+    assert ("expense", fuel) in _hits(db, "vehicle")
+    _fts_ok(db)
+
+
+def test_query_syntax_is_searched_literally(ledger):
+    ledger.add_expense("Food", 1.0, 'say "NEAR" AND more', date(2024, 1, 2))
+    assert len(_hits(ledger, 'NEAR AND "')) == 1
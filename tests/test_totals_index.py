@@ -0,0 +1,43 @@
+"""The totals index answers like SQLite after every write, from this connection or another."""
+from datetime import date
+
+import pytest
+
+RANGES = [(date(2021, 1, 1), date(2024, 12, 31)), (date(2022, 7, 1), date(2022, 7, 1)),
+          (date(2023, 1, 1), date(2023, 12, 31)), (date(2024, 3, 1), date(2024, 3, 31))]
+
+
+def _totals(db):
+    return [(db.total_expenses(s, e), db.total_incomes(s, e), db.sum_by_category(s, e), db.dashboard_snapshot(s, e))
+            for s, e in RANGES]
+
+
+@pytest.fixture
+def indexed(ledger):
+    ledger.enable_totals_index()
+    return ledger
+
+
+def test_index_follows_own_writes(indexed, other):
+    db = indexed
+    fuel = db.conn.execute("SELECT id FROM expenses WHERE note = 'fuel'").fetchone()[0]
+    db.add_expense("Food", 1.1, "x", date(2023, 6, 1))
+    db.update_expense(fuel, "Home", 2.2, "fuel", date(2024, 3, 2))
+    db.add_income(3.3, "y", date(2022, 7, 1))
+    db.delete_category("Food")
+    db.add_category("Empty")
+    assert db.verify_totals_index() == []
+    assert _totals(db) == _totals(other)
+
+
+def test_index_follows_other_connections_and_rollback(indexed, other):
+    db = indexed
+    _totals(db)
+    other.add_expense("Car", 5.0, "x", date(2024, 3, 5))
+    assert _totals(db) == _totals(other)
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.add_expense("Car", 7.0, "y", date(2024, 3, 5))
+            raise RuntimeError
+    assert db.verify_totals_index() == []
+    assert _totals(db) == _totals(other)
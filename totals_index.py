@@ -0,0 +1,175 @@
+"""In-memory range totals over day numbers, for Database.enable_totals_index.
+
+One Fenwick tree (binary indexed tree) of integer cents per expense
+category, one over all expenses and one over incomes, each spanning the
+same window of days. Totals for any [start, end] range then take two
+O(log days) prefix sums instead of a rollup scan, and a single expense or
+income changes O(log days) nodes. The index is built from the daily
+rollups; Database keeps it in step with its own writes and rebuilds it
+after anything it cannot follow (rollbacks, imports, other processes).
+"""
+import sqlite3
+import sys
+from array import array
+from functools import lru_cache
+from itertools import accumulate, islice
+from operator import sub
+from typing import Dict, Iterable, Sequence, Tuple
+
+# Days of room kept before the first and after the last stored day (or
+# today), so routine new entries land inside the window without a rebuild.
+MARGIN_BEFORE = 31
+MARGIN_AFTER = 366
+
+
+@lru_cache(maxsize=4)
+def _lower_bounds(size: int) -> Tuple[int, ...]:
+    """i - lowbit(i), i.e. i & (i - 1), for i = 1..size: where node i's range starts."""
+    return tuple(i & (i - 1) for i in range(1, size + 1))
+
+
+class Fenwick:
+    """Fenwick tree of integers over positions 0..size-1."""
+    __slots__ = ("tree",)
+
+    def __init__(self, values: Sequence[int]) -> None:
+        # O(n) build: node i (1-based) covers (i - lowbit(i), i], i.e. the
+        # difference of two prefix sums, and i - lowbit(i) == i & (i - 1).
+        # The bounds are shared by every tree of the same size, which keeps
+        # the loop in C.
+        prefix = [0, *accumulate(values)]
+        self.tree = array("q", [0])
+        self.tree.extend(map(sub, islice(prefix, 1, None), map(prefix.__getitem__, _lower_bounds(len(values)))))
+
+    @classmethod
+    def from_points(cls, size: int, points: Dict[int, int]) -> "Fenwick":
+        """Tree over size positions holding points {position: value}, zero elsewhere.
+
+        Sparse input is added point by point (O(k log n)) onto a zeroed
+        array instead of paying the O(n) build.
+        """
+        if len(points) * size.bit_length() * 8 >= size:  # a C-speed dense build wins early
+            values = [0] * size
+            for i, v in points.items():
+                values[i] = v
+            return cls(values)
+        tree = cls.__new__(cls)
+        tree.tree = array("q", bytes(8 * (size + 1)))
+        for i, v in points.items():
+            tree.add(i, v)
+        return tree
+
+    def __len__(self) -> int:
+        return len(self.tree) - 1
+
+    def add(self, i: int, delta: int) -> None:
+        tree, n = self.tree, len(self.tree) - 1
+        i += 1
+        while i <= n:
+            tree[i] += delta
+            i += i & -i
+
+    def prefix(self, k: int) -> int:
+        """Sum of positions 0..k-1."""
+        tree, s = self.tree, 0
+        while k > 0:
+            s += tree[k]
+            k &= k - 1
+        return s
+
+    def range_sum(self, lo: int, hi: int) -> int:
+        """Sum of positions lo..hi inclusive, clipped to the tree."""
+        lo, hi = max(lo, 0), min(hi, len(self) - 1)
+        return self.prefix(hi + 1) - self.prefix(lo) if lo <= hi else 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.tree.buffer_info()[1] * self.tree.itemsize
+
+
+class TotalsIndex:
+    """Expense totals per category and in all, and income totals, for any day range.
+
+    Days are the day numbers of the v4 storage format; amounts are cents.
+    Days outside the window hold nothing, so range queries simply clip to
+    it; an add_* outside it returns False and the caller must rebuild.
+    """
+    def __init__(self, first_day: int, last_day: int,
+                 expenses: Iterable[Tuple[int, int, int]], incomes: Iterable[Tuple[int, int]]) -> None:
+        """Build from (category_id, day, cents) and (day, cents) rows, all days in [first_day, last_day]."""
+        self.first_day = first_day
+        size = last_day - first_day + 1
+        per_category: Dict[int, Dict[int, int]] = {}
+        everything = [0] * size
+        for cid, day, cents in expenses:
+            i = day - first_day
+            points = per_category.setdefault(cid, {})
+            points[i] = points.get(i, 0) + cents
+            everything[i] += cents
+        daily_incomes = [0] * size
+        for day, cents in incomes:
+            daily_incomes[day - first_day] += cents
+        self.categories: Dict[int, Fenwick] = {
+            cid: Fenwick.from_points(size, points) for cid, points in per_category.items()
+        }
+        self.expenses = Fenwick(everything)
+        self.incomes = Fenwick(daily_incomes)
+        self._size = size
+
+    @classmethod
+    def from_rollups(cls, conn: sqlite3.Connection, today: int) -> "TotalsIndex":
+        """Build from daily_category_totals/daily_income_totals, in one read transaction."""
+        rows = conn.execute(
+            """
+            SELECT 0, category_id, day, total FROM daily_category_totals
+            UNION ALL
+            SELECT 1, NULL, day, total FROM daily_income_totals
+            """
+        ).fetchall()
+        days = [r[2] for r in rows] or [today]
+        first = min(days) - MARGIN_BEFORE
+        last = max(max(days), today) + MARGIN_AFTER
+        return cls(
+            first, last,
+            ((cid, day, total) for (kind, cid, day, total) in rows if kind == 0),
+            ((day, total) for (kind, _cid, day, total) in rows if kind == 1),
+        )
+
+    # ---- updates ----
+    def add_expense(self, category_id: int, day: int, cents: int) -> bool:
+        """Apply an expense delta (negative to remove one); False if day is outside the window."""
+        i = day - self.first_day
+        if not 0 <= i < self._size:
+            return False
+        tree = self.categories.get(category_id)
+        if tree is None:
+            tree = self.categories[category_id] = Fenwick.from_points(self._size, {})
+        tree.add(i, cents)
+        self.expenses.add(i, cents)
+        return True
+
+    def add_income(self, day: int, cents: int) -> bool:
+        i = day - self.first_day
+        if not 0 <= i < self._size:
+            return False
+        self.incomes.add(i, cents)
+        return True
+
+    # ---- queries (cents, inclusive day range) ----
+    def expenses_total(self, lo: int, hi: int) -> int:
+        return self.expenses.range_sum(lo - self.first_day, hi - self.first_day)
+
+    def incomes_total(self, lo: int, hi: int) -> int:
+        return self.incomes.range_sum(lo - self.first_day, hi - self.first_day)
+
+    def category_total(self, category_id: int, lo: int, hi: int) -> int:
+        tree = self.categories.get(category_id)
+        return tree.range_sum(lo - self.first_day, hi - self.first_day) if tree is not None else 0
+
+    def footprint(self) -> dict:
+        """Memory held by the index: tree count, window length and bytes (arrays plus objects)."""
+        trees = [self.expenses, self.incomes, *self.categories.values()]
+        data = sum(t.nbytes for t in trees)
+        overhead = sum(sys.getsizeof(t) + sys.getsizeof(t.tree) - t.nbytes for t in trees)
+        overhead += sys.getsizeof(self.categories)
+        return {"trees": len(trees), "days": self._size, "bytes": data + overhead}
@@ -0,0 +1,301 @@
+"""Opt-in latency tracing for Database.
+
+Off by default and free when off: nothing is wrapped or hooked until a
+Tracer is attached, either explicitly with Database.enable_tracing() or for
+every connection of the process by setting EXPENSES_TRACE:
+
+    EXPENSES_TRACE=1              trace, inspect via Tracer.report() / the Trace panel
+    EXPENSES_TRACE=trace.json     same, and write the report there at exit
+    EXPENSES_TRACE_SLOW_MS=20     slow-statement threshold (default SLOW_MS)
+
+An attached Tracer wraps each public method of that one Database instance
+and keeps a latency histogram per method (nested calls count for both
+caller and callee). Statements are seen through
+sqlite3.Connection.set_trace_callback, which only reports when a statement
+starts; a statement's time is taken as the span until the next one starts
+or the traced call returns. Slow ones are logged together with their
+EXPLAIN QUERY PLAN.
+"""
+import atexit
+import functools
+import inspect
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+TRACE_ENV = "EXPENSES_TRACE"
+SLOW_MS_ENV = "EXPENSES_TRACE_SLOW_MS"
+
+# Statements taking at least this long are logged with their query plan.
+SLOW_MS = 50.0
+# Slow statements kept for report(), most recent last.
+SLOW_KEPT = 100
+
+# Histogram buckets grow by 2**(1/8) (~9%) from 1 µs, which bounds the error
+# of a reported percentile to one bucket.
+_BUCKET_BASE = 2 ** (1 / 8)
+_BUCKET_LOG = math.log(_BUCKET_BASE)
+_MIN_MS = 0.001
+
+# Statements worth an EXPLAIN QUERY PLAN; BEGIN/COMMIT/PRAGMA have no plan.
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+log = logging.getLogger("expenses.trace")
+
+
+class Histogram:
+    """Log-bucketed latency histogram in milliseconds."""
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._buckets: Dict[int, int] = {}
+
+    def add(self, ms: float) -> None:
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+        i = int(math.log(max(ms, _MIN_MS) / _MIN_MS) / _BUCKET_LOG)
+        self._buckets[i] = self._buckets.get(i, 0) + 1
+
+    def percentile(self, p: float) -> float:
+        """Upper bound of the bucket holding the p-th percentile (0 < p <= 100)."""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for i in sorted(self._buckets):
+            seen += self._buckets[i]
+            if seen >= rank:
+                return min(_MIN_MS * _BUCKET_BASE ** (i + 1), self.max_ms)
+        return self.max_ms
+
+    def summary(self) -> dict:
+        return {
+            "calls": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "p50_ms": round(self.percentile(50), 3),
+            "p95_ms": round(self.percentile(95), 3),
+            "p99_ms": round(self.percentile(99), 3),
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+@dataclass(frozen=True)
+class SlowStatement:
+    method: str  # outermost traced Database method that ran it
+    ms: float
+    sql: str  # with the bound parameters filled in
+    plan: Tuple[str, ...]  # EXPLAIN QUERY PLAN detail lines, empty if not explainable
+
+
+class _Session:
+    """Per-connection tracing state; only ever touched by the connection's thread."""
+    def __init__(self, tracer: "Tracer", conn: sqlite3.Connection) -> None:
+        self.tracer = tracer
+        self.conn = conn
+        self.stack: List[str] = []  # traced methods currently executing
+        self.open: Optional[Tuple[str, str, float]] = None  # (method, sql, started) of the running statement
+        self.slow: List[Tuple[str, float, str]] = []  # found during the outermost call
+
+    def on_statement(self, sql: str) -> None:
+        now = time.perf_counter()
+        self.close_statement(now)
+        self.tracer._count_statement()
+        if self.stack:
+            self.open = (self.stack[0], sql, now)
+
+    def close_statement(self, now: float) -> None:
+        if self.open is None:
+            return
+        method, sql, started = self.open
+        self.open = None
+        ms = (now - started) * 1000
+        if ms >= self.tracer.slow_ms:
+            self.slow.append((method, ms, sql))
+
+    def enter(self, name: str) -> float:
+        self.stack.append(name)
+        return time.perf_counter()
+
+    def leave(self, name: str, started: float, record: bool = True) -> float:
+        """Close a traced call; returns its duration in ms."""
+        now = time.perf_counter()
+        self.stack.pop()
+        ms = (now - started) * 1000
+        if record:
+            self.tracer._record(name, ms)
+        if not self.stack:
+            self.close_statement(now)
+            if self.slow:
+                slow, self.slow = self.slow, []
+                for method, ms, sql in slow:
+                    self.tracer._record_slow(SlowStatement(method, round(ms, 3), sql, self.explain(sql)))
+        return ms
+
+    def explain(self, sql: str) -> Tuple[str, ...]:
+        if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+            return ()
+        # Untraced, or the EXPLAIN would report itself.
+        self.conn.set_trace_callback(None)
+        try:
+            return tuple(row[-1] for row in self.conn.execute("EXPLAIN QUERY PLAN " + sql))
+        except sqlite3.Error as exc:
+            return (f"(no plan: {exc})",)
+        finally:
+            self.conn.set_trace_callback(self.on_statement)
+
+
+class Tracer:
+    """Latency histograms per Database method plus a log of slow statements.
+
+    One Tracer may be attached to several Database instances on different
+    threads; report() can be called from any thread.
+    """
+    def __init__(self, slow_ms: float = SLOW_MS, keep: int = SLOW_KEPT) -> None:
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._methods: Dict[str, Histogram] = {}
+        self._statements = 0
+        self._slow: deque = deque(maxlen=keep)
+        self._started = time.time()
+
+    # ---- attaching ----
+    def attach(self, db) -> None:
+        """Wrap db's public methods and hook its connection; see Database.enable_tracing."""
+        session = _Session(self, db.conn)
+        for name, method in inspect.getmembers(type(db), inspect.isfunction):
+            # transaction() is a context manager; its BEGIN/COMMIT count towards the calls inside it.
+            if name.startswith("_") or name in ("enable_tracing", "disable_tracing", "transaction"):
+                continue
+            bound = method.__get__(db)
+            if inspect.isgeneratorfunction(getattr(method, "__wrapped__", method)):
+                wrapper = self._wrap_iterator(session, name, bound)
+            else:
+                wrapper = self._wrap(session, name, bound)
+            setattr(db, name, wrapper)
+        db.conn.set_trace_callback(session.on_statement)
+
+    @staticmethod
+    def detach(db) -> None:
+        db.conn.set_trace_callback(None)
+        for name in [n for n, v in vars(db).items() if getattr(v, "_traced", False)]:
+            delattr(db, name)
+
+    @staticmethod
+    def _wrap(session: _Session, name: str, bound):
+        @functools.wraps(bound)
+        def traced(*args, **kwargs):
+            started = session.enter(name)
+            try:
+                return bound(*args, **kwargs)
+            finally:
+                session.leave(name, started)
+
+        traced._traced = True
+        return traced
+
+    @staticmethod
+    def _wrap_iterator(session: _Session, name: str, bound):
+        """Time only the steps of the iterator, not the consumer between them."""
+        @functools.wraps(bound)
+        def traced(*args, **kwargs):
+            it = bound(*args, **kwargs)
+            spent = 0.0
+            try:
+                while True:
+                    started = session.enter(name)
+                    try:
+                        item = next(it)
+                    except StopIteration:
+                        return
+                    finally:
+                        spent += session.leave(name, started, record=False)
+                    yield item
+            finally:
+                it.close()
+                session.tracer._record(name, spent)
+
+        traced._traced = True
+        return traced
+
+    # ---- recording (any thread) ----
+    def _record(self, name: str, ms: float) -> None:
+        with self._lock:
+            hist = self._methods.get(name)
+            if hist is None:
+                hist = self._methods[name] = Histogram()
+            hist.add(ms)
+
+    def _count_statement(self) -> None:
+        with self._lock:
+            self._statements += 1
+
+    def _record_slow(self, stmt: SlowStatement) -> None:
+        with self._lock:
+            self._slow.append(stmt)
+        log.warning("slow statement in %s: %.1f ms\n%s\n%s", stmt.method, stmt.ms, stmt.sql,
+                    "\n".join(stmt.plan))
+
+    # ---- reading ----
+    def method_stats(self) -> Dict[str, dict]:
+        """{method: {calls, total_ms, p50_ms, p95_ms, p99_ms, max_ms}}, slowest total first."""
+        with self._lock:
+            stats = {name: h.summary() for name, h in self._methods.items()}
+        return dict(sorted(stats.items(), key=lambda kv: -kv[1]["total_ms"]))
+
+    def slow_statements(self) -> List[SlowStatement]:
+        with self._lock:
+            return list(self._slow)
+
+    def report(self) -> dict:
+        """Everything recorded so far, JSON-serializable."""
+        with self._lock:
+            statements = self._statements
+        return {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self._started)),
+            "slow_ms": self.slow_ms,
+            "statements": statements,
+            "methods": self.method_stats(),
+            "slow": [asdict(s) for s in self.slow_statements()],
+        }
+
+    def dump(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(self.report(), fh, indent=2)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._methods.clear()
+            self._statements = 0
+            self._slow.clear()
+
+
+_process_tracer: Optional[Tracer] = None
+_process_lock = threading.Lock()
+
+
+def process_tracer() -> Optional[Tracer]:
+    """The Tracer every Database of this process attaches to, if EXPENSES_TRACE is set.
+
+    Created on first use; when EXPENSES_TRACE names a file, the report is
+    written there at exit.
+    """
+    global _process_tracer
+    setting = os.environ.get(TRACE_ENV, "")
+    if not setting or setting == "0":
+        return None
+    with _process_lock:
+        if _process_tracer is None:
+            _process_tracer = Tracer(float(os.environ.get(SLOW_MS_ENV) or SLOW_MS))
+            if setting != "1":
+                atexit.register(_process_tracer.dump, setting)
+        return _process_tracer
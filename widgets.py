@@ -1,5 +1,16 @@
 from PySide6.QtWidgets import QPushButton
 
+# Applied once to the widget hosting the cards instead of per card, so
+# creating or updating a card never re-parses a stylesheet.
+CATEGORY_CARD_STYLE = """
+CategoryCard {
+    border: 2px solid #333; border-radius: 12px; padding: 8px;
+    font-weight: 600;
+}
+CategoryCard:hover { background: #f3f3f3; }
+"""
+
+
 class CategoryCard(QPushButton):
     def __init__(self, name: str, total: float, parent=None):
         super().__init__(parent)
@@ -8,20 +19,17 @@ class CategoryCard(QPushButton):
         self.setText(f"{name}\n{total:.2f}")
         self.setFixedSize(150, 80)
         self.setCheckable(False)
-        self.setStyleSheet(
-            """
-            QPushButton {
-                border: 2px solid #333; border-radius: 12px; padding: 8px;
-                font-weight: 600;
-            }
-            QPushButton:hover { background: #f3f3f3; }
-            """
-        )
 
     def update_total(self, total: float):
+        if total == self.total:
+            return
         self.total = total
         self.setText(f"{self.name}\n{total:.2f}")
 
+    def rename(self, name: str):
+        self.name = name
+        self.setText(f"{name}\n{self.total:.2f}")
+
 
 class StatBox(QPushButton):
     """Clickable box with title and big number."""
@@ -0,0 +1,197 @@
+"""Background execution of Database calls for the GUI.
+
+The GUI thread never touches SQLite. Every read or write is submitted to a
+QueryWorker as a job, runs on a dedicated QThread that owns the only
+connection, and its result is handed back to a callback on the GUI thread
+through a queued signal.
+
+Jobs submitted on a *channel* supersede each other: only the newest job of a
+channel is run and delivered. Older ones still in the queue are skipped, and
+one that is already executing is interrupted.
+
+The change events the Database publishes for committed writes (see
+Database.subscribe) are re-emitted on the GUI thread as QueryWorker.changed,
+ahead of the result of the job that made the write.
+"""
+import itertools
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, Union
+
+from PySide6.QtCore import QObject, QThread, Signal, Slot
+
+from db import Database, DB_FILE
+
+# A job is either the name of a Database method or a callable taking the
+# Database as its first argument; any extra call() arguments follow.
+Job = Union[str, Callable[..., Any]]
+
+
+class _Gate:
+    """Thread-safe record of the newest ticket per channel and the running job."""
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._latest: Dict[Hashable, int] = {}
+        self._running: Optional[Tuple[int, Hashable, sqlite3.Connection]] = None
+
+    def claim(self, channel: Hashable, ticket: int) -> None:
+        with self._lock:
+            self._latest[channel] = ticket
+            if self._running is not None and self._running[1] == channel:
+                self._running[2].interrupt()
+
+    def release(self, channel: Hashable, ticket: Optional[int] = None) -> None:
+        with self._lock:
+            if ticket is None or self._latest.get(channel) == ticket:
+                self._latest.pop(channel, None)
+            if ticket is None and self._running is not None and self._running[1] == channel:
+                self._running[2].interrupt()
+
+    def superseded(self, ticket: int, channel: Optional[Hashable]) -> bool:
+        if channel is None:
+            return False
+        with self._lock:
+            return self._latest.get(channel) != ticket
+
+    def begin(self, ticket: int, channel: Optional[Hashable], conn: sqlite3.Connection) -> None:
+        with self._lock:
+            self._running = (ticket, channel, conn)
+
+    def end(self) -> None:
+        with self._lock:
+            self._running = None
+
+
+class _Executor(QObject):
+    """Lives on the worker thread and owns the Database connection."""
+    done = Signal(int, object)
+    failed = Signal(int, object)
+    changed = Signal(object)
+
+    def __init__(self, path: Union[str, Callable[[], str]], gate: _Gate) -> None:
+        super().__init__()
+        self.path = path
+        self.gate = gate
+        self.db: Optional[Database] = None
+
+    @Slot(int, object, object, object)
+    def run(self, ticket: int, channel: Optional[Hashable], job: Job, args: tuple) -> None:
+        if self.gate.superseded(ticket, channel):
+            return
+        try:
+            if self.db is None:
+                self.db = Database(self.path() if callable(self.path) else self.path)
+                self.db.subscribe(self.changed.emit)
+            self.gate.begin(ticket, channel, self.db.conn)
+            if isinstance(job, str):
+                result = getattr(self.db, job)(*args)
+            else:
+                result = job(self.db, *args)
+        except Exception as exc:
+            # Never let a failed (or interrupted) write leak into the next job.
+            if self.db is not None and self.db.conn.in_transaction:
+                self.db.rollback()
+            self.failed.emit(ticket, exc)
+            return
+        finally:
+            self.gate.end()
+        self.done.emit(ticket, result)
+
+    @Slot()
+    def shutdown(self) -> None:
+        """Queued behind every pending job, so those finish first."""
+        if self.db is not None:
+            self.db.conn.close()
+            self.db = None
+        QThread.currentThread().quit()
+
+
+class QueryWorker(QObject):
+    """GUI-side handle for running Database jobs on a background thread.
+
+    Jobs run one at a time in submission order, so a write followed by a
+    refresh always sees the write. path may be a function returning the
+    path instead; it is called on the worker thread before the first job,
+    so it may block (see working_copy.start).
+    """
+    # Failures of jobs that were submitted without an on_error callback.
+    error = Signal(str)
+    # A db.Change event, for each write the worker's Database committed.
+    changed = Signal(object)
+    _submit = Signal(int, object, object, object)
+    _shutdown = Signal()
+
+    def __init__(self, path: Union[str, Callable[[], str]] = DB_FILE, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self._tickets = itertools.count(1)
+        self._pending: Dict[int, Tuple[Optional[Hashable], Optional[Callable], Optional[Callable]]] = {}
+        self._channels: Dict[Hashable, int] = {}
+        self._gate = _Gate()
+
+        self._thread = QThread(self)
+        self._executor = _Executor(path, self._gate)
+        self._executor.moveToThread(self._thread)
+        self._submit.connect(self._executor.run)
+        self._executor.done.connect(self._on_done)
+        self._executor.failed.connect(self._on_failed)
+        self._executor.changed.connect(self.changed)
+        self._shutdown.connect(self._executor.shutdown)
+        self._thread.start()
+
+    def call(self, job: Job, *args: Any, channel: Optional[Hashable] = None,
+             on_result: Optional[Callable[[Any], None]] = None,
+             on_error: Optional[Callable[[Exception], None]] = None) -> int:
+        """Queue a job; returns its ticket.
+
+        Only read-only jobs should use a channel, since a superseded job may be
+        interrupted part-way through.
+        """
+        ticket = next(self._tickets)
+        if channel is not None:
+            stale = self._channels.get(channel)
+            if stale is not None:
+                self._pending.pop(stale, None)
+            self._channels[channel] = ticket
+            self._gate.claim(channel, ticket)
+        self._pending[ticket] = (channel, on_result, on_error)
+        self._submit.emit(ticket, channel, job, args)
+        return ticket
+
+    def cancel(self, channel: Hashable) -> None:
+        """Drop any queued or running job of the channel without delivering it."""
+        ticket = self._channels.pop(channel, None)
+        if ticket is not None:
+            self._pending.pop(ticket, None)
+        self._gate.release(channel)
+
+    def stop(self) -> None:
+        """Finish queued jobs, close the connection and join the thread."""
+        if self._thread.isRunning():
+            self._shutdown.emit()
+            self._thread.wait()
+
+    def _finish(self, ticket: int):
+        entry = self._pending.pop(ticket, None)
+        if entry is None:
+            return None  # superseded or cancelled
+        channel = entry[0]
+        if channel is not None and self._channels.get(channel) == ticket:
+            del self._channels[channel]
+            self._gate.release(channel, ticket)
+        return entry
+
+    @Slot(int, object)
+    def _on_done(self, ticket: int, result: Any) -> None:
+        entry = self._finish(ticket)
+        if entry is not None and entry[1] is not None:
+            entry[1](result)
+
+    @Slot(int, object)
+    def _on_failed(self, ticket: int, exc: Exception) -> None:
+        entry = self._finish(ticket)
+        if entry is None:
+            return
+        if entry[2] is not None:
+            entry[2](exc)
+        else:
+            self.error.emit(str(exc))
@@ -0,0 +1,275 @@
+"""Local working copy of the database, backed up to the synced DB_FILE.
+
+DB_FILE usually sits in a cloud-synced folder. Running SQLite there in WAL
+mode means every commit rewrites -wal/-shm files the sync client then
+uploads, and the client can pick up a file mid-write. Instead the app
+opens a copy on local disk and a BackupThread pushes a consistent snapshot
+to DB_FILE every BACKUP_INTERVAL seconds when something changed, and once
+more at exit:
+
+- the snapshot is taken with sqlite3.Connection.backup in steps of
+  BACKUP_PAGES pages, so the app's connection is never blocked for long;
+- it is written next to DB_FILE under a temporary name in rollback-journal
+  mode (no -wal/-shm) and renamed over DB_FILE in one step, so the sync
+  client only ever sees a complete file;
+- before each push the local WAL is checkpointed (PASSIVE while running,
+  TRUNCATE at exit) so it does not grow without bound.
+
+On startup prepare() takes the synced file over the working copy when it
+changed since our last push and is the newer of the two, so edits made on
+another machine (and synced down) win over an older local copy. start()
+runs it on the BackupThread, so a large ledger in a slow synced folder
+never holds up the window; whoever opens the working copy waits on
+BackupThread.ready() first (the app: its QueryWorker thread).
+
+Archive files of closed years (Database.archive_year) travel along: each
+push copies the ones that differ next to DB_FILE, and prepare() fetches
+the ones the working copy lacks.
+
+    EXPENSES_WORKING_COPY=0     work on DB_FILE directly, as before
+    EXPENSES_LOCAL_DB=path      where the working copy lives
+    EXPENSES_BACKUP_INTERVAL=s  seconds between pushes
+"""
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+WORKING_COPY_ENV = "EXPENSES_WORKING_COPY"
+LOCAL_DB_ENV = "EXPENSES_LOCAL_DB"
+INTERVAL_ENV = "EXPENSES_BACKUP_INTERVAL"
+
+BACKUP_INTERVAL = 60.0
+# Pages copied per backup step and the pause between steps, during which
+# the app's connection can write.
+BACKUP_PAGES = 256
+BACKUP_PAUSE = 0.005
+
+
+def enabled() -> bool:
+    return os.environ.get(WORKING_COPY_ENV, "1") != "0"
+
+
+def local_path(synced: str) -> str:
+    """Where the working copy of synced lives (EXPENSES_LOCAL_DB, or the user's local app data)."""
+    configured = os.environ.get(LOCAL_DB_ENV)
+    if configured:
+        return configured
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(Path.home(), ".local", "share")
+    return os.path.join(base, "ExpenseManager", Path(synced).name)
+
+
+def resolve(synced: str) -> str:
+    """The file to open for synced right now: the working copy if there is one."""
+    if enabled():
+        local = local_path(synced)
+        if os.path.exists(local):
+            return local
+    return synced
+
+
+def _modified(path: str) -> float:
+    """Last modification of the database, counting commits still in its WAL; 0 if missing."""
+    times = [os.path.getmtime(path)] if os.path.exists(path) else []
+    wal = path + "-wal"
+    if os.path.exists(wal) and os.path.getsize(wal) > 0:  # an empty WAL holds no commits
+        times.append(os.path.getmtime(wal))
+    return max(times, default=0.0)
+
+
+# Record of the last push (or pull), kept beside the working copy: the
+# synced file's (mtime_ns, size) right after it and the working copy's
+# _modified() time, which tell later runs what changed on either side.
+def _stamp_path(local: str) -> str:
+    return local + ".sync.json"
+
+
+def _read_stamp(local: str) -> Optional[dict]:
+    try:
+        with open(_stamp_path(local), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_stamp(local: str, synced: str) -> None:
+    st = os.stat(synced)
+    with open(_stamp_path(local), "w", encoding="utf-8") as fh:
+        json.dump({"synced": [st.st_mtime_ns, st.st_size], "local_modified": _modified(local)}, fh)
+
+
+def _copy(src: str, dst: str, journal_mode: str) -> None:
+    """Consistent copy of the database at src into dst, replacing dst atomically."""
+    tmp = os.path.join(os.path.dirname(os.path.abspath(dst)), f".{Path(dst).name}.partial")
+    for leftover in (tmp, tmp + "-journal"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    source = sqlite3.connect(src)
+    target = sqlite3.connect(tmp)
+    try:
+        source.backup(target, pages=BACKUP_PAGES, sleep=BACKUP_PAUSE)
+        target.execute(f"PRAGMA journal_mode={journal_mode}")
+    finally:
+        target.close()
+        source.close()
+    os.replace(tmp, dst)
+
+
+def _archive_names(path: str) -> List[str]:
+    """Archive files the database at path lists, relative to its directory."""
+    if not os.path.exists(path):
+        return []
+    conn = sqlite3.connect(path)
+    try:
+        return [name for (name,) in conn.execute("SELECT file FROM archives")]
+    except sqlite3.OperationalError:  # not migrated to schema v6 yet
+        return []
+    finally:
+        conn.close()
+
+
+def _sync_archives(src_db: str, dst_db: str, replace: bool) -> None:
+    """Copy the archives src_db lists next to dst_db: missing ones, and with replace, differing ones."""
+    src_dir, dst_dir = (os.path.dirname(os.path.abspath(p)) for p in (src_db, dst_db))
+    for name in _archive_names(src_db):
+        src, dst = os.path.join(src_dir, name), os.path.join(dst_dir, name)
+        if not os.path.exists(src):
+            continue
+        if os.path.exists(dst):
+            a, b = os.stat(src), os.stat(dst)
+            if not replace or (a.st_size, a.st_mtime_ns) == (b.st_size, b.st_mtime_ns):
+                continue
+        _copy(src, dst, "DELETE")
+        st = os.stat(src)
+        os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))  # equal stamps mean "same file" next time
+
+
+def prepare(synced: str, local: Optional[str] = None) -> str:
+    """Make the working copy current and return its path.
+
+    The synced file replaces the working copy when there is none yet, or
+    when it changed since our last push (say, on another machine) and is
+    newer than the working copy. Otherwise the working copy is kept and
+    the BackupThread brings the synced file up to date.
+    """
+    local = local or local_path(synced)
+    os.makedirs(os.path.dirname(os.path.abspath(local)), exist_ok=True)
+    if not os.path.exists(synced):
+        return local
+    stamp = _read_stamp(local)
+    st = os.stat(synced)
+    changed_there = stamp is None or stamp["synced"] != [st.st_mtime_ns, st.st_size]
+    if not os.path.exists(local) or (changed_there and _modified(synced) > _modified(local)):
+        for stale in (local + "-wal", local + "-shm"):
+            if os.path.exists(stale):
+                os.remove(stale)
+        _copy(synced, local, "WAL")
+        _write_stamp(local, synced)
+        _sync_archives(synced, local, replace=True)
+    else:
+        _sync_archives(synced, local, replace=False)
+    return local
+
+
+class BackupThread(threading.Thread):
+    """Pushes the working copy to the synced path periodically and at stop().
+
+    With prepare, it first runs prepare() and only then starts pushing;
+    ready() waits for that.
+    """
+    def __init__(self, local: str, synced: str, interval: float = BACKUP_INTERVAL, prepare: bool = False) -> None:
+        super().__init__(name="db-backup", daemon=True)
+        self.local = local
+        self.synced = synced
+        self.interval = interval
+        self.pushes = 0
+        self.error: Optional[Exception] = None  # last failed push, cleared by the next good one
+        self._prepare = prepare
+        self._prepare_error: Optional[Exception] = None
+        self._ready = threading.Event()
+        if not prepare:
+            self._ready.set()
+        self._stopping = threading.Event()
+        self._pushed_version: Optional[int] = None
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def run(self) -> None:
+        if self._prepare:
+            try:
+                prepare(self.synced, self.local)
+            except (OSError, sqlite3.Error) as exc:
+                self._prepare_error = exc  # nothing to push from; ready() reports it
+                return
+            finally:
+                self._ready.set()
+        self._conn = sqlite3.connect(self.local)
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        try:
+            stamp = _read_stamp(self.local)
+            if (not os.path.exists(self.synced) or stamp is None
+                    or _modified(self.local) > stamp["local_modified"]):
+                self._push("PASSIVE")  # edited since the last push, e.g. by the importer CLI
+            else:
+                self._pushed_version = self._version()
+            while not self._stopping.wait(self.interval):
+                if self._version() != self._pushed_version:
+                    self._push("PASSIVE")
+            if self._version() != self._pushed_version:
+                self._push("TRUNCATE")
+            up_to_date = self._version() == self._pushed_version and self.error is None
+        finally:
+            self._conn.close()
+        if up_to_date:
+            # Closing the last connection checkpoints into the main file;
+            # that is not an edit the next run needs to push.
+            _write_stamp(self.local, self.synced)
+
+    def ready(self) -> str:
+        """Wait until the working copy is prepared and return its path."""
+        self._ready.wait()
+        if self._prepare_error is not None:
+            raise self._prepare_error
+        return self.local
+
+    def stop(self) -> None:
+        """Push outstanding changes once more and wait for the thread to finish."""
+        self._stopping.set()
+        if self.is_alive():
+            self.join()
+
+    def _version(self) -> int:
+        # data_version moves whenever another connection (the app) commits.
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _push(self, checkpoint: str) -> None:
+        # Checkpoint first, so the working copy's files settle before the stamp.
+        self._conn.execute(f"PRAGMA wal_checkpoint({checkpoint})")
+        version = self._version()
+        try:
+            _copy(self.local, self.synced, "DELETE")
+            _sync_archives(self.local, self.synced, replace=True)
+            _write_stamp(self.local, self.synced)
+        except (OSError, sqlite3.Error) as exc:
+            self.error = exc  # retried at the next interval
+            return
+        self.error = None
+        self._pushed_version = version
+        self.pushes += 1
+
+
+def start(synced: str) -> Tuple[Callable[[], str], Optional[BackupThread]]:
+    """The running BackupThread (None when disabled) and a function returning the path to open.
+
+    Returns at once: the thread prepares the working copy in the
+    background, and the function blocks until it is done, so call it on a
+    thread that may wait on I/O.
+    """
+    if not enabled():
+        return lambda: synced, None
+    local = local_path(synced)
+    os.makedirs(os.path.dirname(os.path.abspath(local)), exist_ok=True)
+    thread = BackupThread(local, synced, float(os.environ.get(INTERVAL_ENV) or BACKUP_INTERVAL), prepare=True)
+    thread.start()
+    return thread.ready, thread